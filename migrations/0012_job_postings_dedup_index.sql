@@ -0,0 +1,6 @@
+-- Indexes behind the JobSpy scraper's duplicate checks on job_postings (declared on jobPostings in shared/schema.ts):
+-- the (title, company_name, location) key lookup and the created_at window the key index is loaded from.
+CREATE INDEX IF NOT EXISTS "idx_job_postings_dedup_key" ON job_postings(title, company_name, location);
+CREATE INDEX IF NOT EXISTS "idx_job_postings_created_at" ON job_postings(created_at);
+
+ANALYZE job_postings;
@@ -0,0 +1,20 @@
+
+-- Work queue of sharded JobSpy runs: one row per shard, claimed by workers with FOR UPDATE SKIP LOCKED.
+-- status moves pending -> running -> done | failed; a running shard whose claimed_at lease lapses is claimable again.
+CREATE TABLE IF NOT EXISTS jobspy_shard_queue (
+    id SERIAL PRIMARY KEY,
+    run_id VARCHAR NOT NULL,
+    shard_id VARCHAR NOT NULL,
+    config JSONB NOT NULL,
+    status VARCHAR NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker VARCHAR,
+    result JSONB,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    claimed_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    CONSTRAINT jobspy_shard_queue_run_shard_unique UNIQUE (run_id, shard_id)
+);
+
+CREATE INDEX IF NOT EXISTS "idx_jobspy_shard_queue_claim" ON jobspy_shard_queue(status, id);
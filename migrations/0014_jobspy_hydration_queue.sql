@@ -0,0 +1,14 @@
+
+-- New scraped_jobs rows whose search result carried no description (LinkedIn), waiting for their job page to be fetched.
+-- Rows leave the queue once hydrated; pages that keep failing stay behind with status 'failed'.
+CREATE TABLE IF NOT EXISTS jobspy_hydration_queue (
+    job_id INTEGER PRIMARY KEY REFERENCES scraped_jobs(id) ON DELETE CASCADE,
+    source_platform VARCHAR NOT NULL,
+    status VARCHAR NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    enqueued_at TIMESTAMP DEFAULT NOW(),
+    claimed_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS "idx_jobspy_hydration_queue_claim" ON jobspy_hydration_queue(status, enqueued_at);
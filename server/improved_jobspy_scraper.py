@@ -9,12 +9,20 @@ import sys
 import json
 import time
 import random
-import psycopg2
 import pandas as pd
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from datetime import datetime
 import traceback
 
+from jobspy_cache import ScrapeCache
+from jobspy_state import DEFAULT_OVERLAP_HOURS, DEFAULT_STATE_FILE, ScrapeState, job_key, newest_posted
+from jobspy_db import (
+    DEFAULT_BATCH_SIZE, DEFAULT_QUEUE_SIZE, DatabasePool, StreamingWriter, empty_save_stats, insert_missing_rows,
+    insert_rows
+)
+from jobspy_dedup import DEFAULT_WINDOW_DAYS, ExistingKeyIndex, NearDuplicateIndex
+from jobspy_throttle import SiteHealthMonitor, classify_error
+from jobspy_metrics import ScrapeMetrics
+
 # Import JobSpy with fallback
 try:
     from jobspy import scrape_jobs
@@ -24,6 +32,13 @@ except ImportError:
     JOBSPY_AVAILABLE = False
 
 class ImprovedJobSpyIntegration:
+    JOB_POSTING_COLUMNS = [
+        'title', 'company_name', 'location', 'description', 'date_posted', 'job_url',
+        'site', 'job_type', 'salary_min', 'salary_max', 'is_remote', 'scraped_at', 'category', 'subcategory'
+    ]
+    # Indexed as idx_job_postings_dedup_key (shared/schema.ts)
+    POSTING_KEY_COLUMNS = ('title', 'company_name', 'location')
+    
     def __init__(self):
         self.db_url = os.environ.get('DATABASE_URL')
         if not self.db_url:
@@ -34,66 +49,163 @@ class ImprovedJobSpyIntegration:
         self.max_delay = 5  # Maximum seconds between requests
         self.rate_limit_delay = 10  # Delay when rate limited
         
+        # Rows per INSERT statement and commit
+        self.save_batch_size = DEFAULT_BATCH_SIZE
+        self.pipeline_queue_size = DEFAULT_QUEUE_SIZE
+        
+        # On-disk cache of scrape_jobs results, configured per run (None disables it)
+        self.query_cache = None
+        
+        # Per-query high-water marks for incremental runs (None fetches full windows)
+        self.scrape_state = None
+        self.watermark_overlap_hours = DEFAULT_OVERLAP_HOURS
+        self.succeeded_queries = []
+        self.known_skipped = 0
+        
+        # (title, company_name, location) keys already in job_postings, loaded once per run (None looks them up per batch)
+        self.posting_index = None
+        self.dedup_window_days = DEFAULT_WINDOW_DAYS
+        
+        # MinHash/LSH index of the postings kept so far in a run, for cross-site duplicates
+        self.near_duplicates = None
+        
+        # Per-site circuit breakers and adaptive delays for a run (None keeps the fixed delays)
+        self.site_health = None
+        
+        # Pooled connections, reconnecting with exponential backoff
+        self.db_pool = DatabasePool(self.db_url)
+        
+        # Stage timers, per-site latency histograms and counters, started afresh by every run
+        self.metrics = ScrapeMetrics()
+        
     def get_db_connection(self):
-        """Get database connection with retry logic"""
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                return psycopg2.connect(self.db_url)
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise e
-                time.sleep(2)
+        """Get a pooled database session (connect retries are handled by the pool)"""
+        return self.db_pool.session()
     
-    def smart_delay(self):
-        """Implement smart delay to avoid rate limiting"""
+    def smart_delay(self, sites=()):
+        """Implement smart delay to avoid rate limiting, stretched for sites that are slow or erroring"""
         delay = random.uniform(self.min_delay, self.max_delay)
+        if self.site_health is not None:
+            delay *= self.site_health.delay_factor(sites)
         time.sleep(delay)
     
+    def dispatchable_sites(self, sites):
+        """The sites whose circuit breaker lets a request through now"""
+        if self.site_health is None:
+            return list(sites)
+        allowed = [site for site in sites if self.site_health.can_dispatch(site)]
+        for site in allowed:
+            self.site_health.on_dispatch(site)
+        return allowed
+    
+    def record_site_outcome(self, sites, error, elapsed, jobs_df=None):
+        """Feed a request's outcome to the breakers and metrics; returns (error kind, sites blamed for it)"""
+        kind = classify_error(error) if error is not None else None
+        if error is None:
+            blamed = []
+        else:
+            # A multi-site call fails as a whole; the message usually names the site that failed it
+            message = ''.join(str(error).lower().split())
+            blamed = [site for site in sites if site.replace('_', '') in message] or list(sites)
+        if self.site_health is not None:
+            for site in sites:
+                self.site_health.record(site, error if site in blamed else None, elapsed)
+        
+        if error is None:
+            rows = {}
+            if jobs_df is not None and not jobs_df.empty:
+                rows = jobs_df['site'].value_counts().to_dict() if 'site' in jobs_df.columns else {sites[0]: len(jobs_df)}
+            for site in sites:
+                self.metrics.observe_request(site, elapsed, rows.get(site, 0))
+        else:
+            for site in blamed:
+                self.metrics.observe_request(site, elapsed, outcome=kind)
+        return kind, blamed
+    
     def scrape_with_retries(self, site_name, search_term, location, results_wanted, country=None):
         """Scrape with retry logic and error handling"""
         max_retries = 3
         base_delay = 5
+        hours_old = 168  # 1 week of jobs
+        results_wanted = min(results_wanted, 15)  # Limit to avoid timeouts
+        query = (','.join(sorted(site_name)), search_term, location)
+        
+        # A query that succeeded before only asks for postings since then (plus an overlap)
+        if self.scrape_state is not None:
+            hours_old = self.scrape_state.delta_hours(
+                *query, default_hours=hours_old, overlap_hours=self.watermark_overlap_hours
+            )
+        
+        # Repeat queries inside the cache TTL skip the request and its delays entirely
+        cache_key = None
+        if self.query_cache is not None:
+            cache_key = self.query_cache.key(site_name, search_term, location, hours_old, country, results_wanted)
+            cached = self.query_cache.get(cache_key)
+            if cached is not None:
+                print(f"Cache hit for {search_term} in {location}")
+                for site in site_name:
+                    self.metrics.observe_request(site, 0.0, outcome='cached')
+                self.succeeded_queries.append((query, newest_posted(cached)))
+                return cached
         
+        sites = list(site_name)
         for attempt in range(max_retries):
+            # Sites whose breaker is open are left out, and a query with none left is not sent at all
+            sites = self.dispatchable_sites(sites)
+            if not sites:
+                print(f"All sites for {search_term} in {location} are cooling down, skipping this search")
+                break
+            if attempt:
+                for site in sites:
+                    self.metrics.observe_retry(site)
+            self.smart_delay(sites)  # Rate limiting
+            started = time.monotonic()
             try:
-                self.smart_delay()  # Rate limiting
-                
                 kwargs = {
-                    'site_name': site_name,
+                    'site_name': sites,
                     'search_term': search_term,
                     'location': location,
-                    'results_wanted': min(results_wanted, 15),  # Limit to avoid timeouts
-                    'hours_old': 168,  # 1 week of jobs
+                    'results_wanted': results_wanted,
+                    'hours_old': hours_old,
                 }
                 
                 # Add country parameter only for sites that support it
-                if country and 'indeed' in site_name:
+                if country and 'indeed' in sites:
                     kwargs['country_indeed'] = country
                 
                 jobs_df = scrape_jobs(**kwargs)
+                self.record_site_outcome(sites, None, time.monotonic() - started, jobs_df)
                 
-                if jobs_df is not None and not jobs_df.empty:
-                    return jobs_df
-                else:
+                if jobs_df is None or jobs_df.empty:
                     print(f"No jobs returned for {search_term} in {location}")
-                    return pd.DataFrame()
+                    jobs_df = pd.DataFrame()
+                # Results missing a cut-off site are neither cached nor allowed to advance the watermark
+                if sites == list(site_name):
+                    if cache_key is not None:
+                        self.query_cache.put(cache_key, jobs_df)
+                    self.succeeded_queries.append((query, newest_posted(jobs_df)))
+                return jobs_df
                     
             except Exception as e:
-                error_str = str(e).lower()
                 print(f"Attempt {attempt + 1} failed for {search_term} in {location}: {e}")
+                kind, blamed = self.record_site_outcome(sites, e, time.monotonic() - started)
+                # Waits scale with each site's recent error rate and latency instead of a fixed schedule
+                factor = self.site_health.delay_factor(sites) if self.site_health is not None else 2 ** attempt
                 
                 # Handle specific errors
-                if "429" in error_str or "rate limit" in error_str:
-                    wait_time = base_delay * (2 ** attempt) + self.rate_limit_delay
-                    print(f"Rate limited, waiting {wait_time} seconds...")
+                if kind == 'rate_limited':
+                    wait_time = base_delay * factor + self.rate_limit_delay
+                    print(f"Rate limited, waiting {wait_time:.0f} seconds...")
                     time.sleep(wait_time)
-                elif "403" in error_str or "blocked" in error_str:
-                    print("Blocked by site, skipping this search")
-                    break
-                elif "timeout" in error_str or "connection" in error_str:
-                    wait_time = base_delay * (2 ** attempt)
-                    print(f"Connection issue, waiting {wait_time} seconds...")
+                elif kind == 'blocked':
+                    sites = [site for site in sites if site not in blamed]
+                    if not sites:
+                        print("Blocked by site, skipping this search")
+                        break
+                    print(f"Blocked by {', '.join(blamed)}, retrying with {', '.join(sites)}")
+                elif kind == 'transient':
+                    wait_time = base_delay * factor
+                    print(f"Connection issue, waiting {wait_time:.0f} seconds...")
                     time.sleep(wait_time)
                 else:
                     if attempt < max_retries - 1:
@@ -133,77 +245,125 @@ class ImprovedJobSpyIntegration:
             print(f"Error cleaning data: {e}")
             return df
     
-    def save_jobs_to_db(self, jobs_df):
-        """Save jobs to database with improved error handling"""
+    def job_posting_rows(self, jobs_df):
+        """job_postings row tuples, in JOB_POSTING_COLUMNS order, for a cleaned frame"""
+        scraped_at = datetime.now()
+        rows = []
+        
+        for _, job in jobs_df.iterrows():
+            # LOCATION FALLBACK: Ensure we always have a location
+            raw_location = str(job.get('location', 'Remote')).strip()
+            location = raw_location if raw_location and raw_location.lower() != 'none' else 'Remote'
+            salary_min = job.get('min_amount')
+            salary_max = job.get('max_amount')
+            date_posted = job.get('date_posted')
+            
+            rows.append((
+                str(job.get('title', 'Unknown Position')),
+                str(job.get('company', 'Unknown Company')),
+                location,
+                str(job.get('description', 'No description available'))[:3000],
+                None if pd.isna(date_posted) else date_posted,
+                str(job.get('job_url', '')),
+                str(job.get('site', 'jobspy')),
+                str(job.get('job_type', 'Full-time')),
+                None if pd.isna(salary_min) else salary_min,
+                None if pd.isna(salary_max) else salary_max,
+                'remote' in location.lower(),
+                scraped_at,
+                'tech', 'software-engineering'  # Default category
+            ))
+        
+        return rows
+    
+    def write_job_posting_rows(self, conn, rows, batch_size=None):
+        """Insert job_postings rows on an open connection, skipping (title, company_name, location) already stored"""
+        batch_size = batch_size or self.save_batch_size
+        if self.posting_index is None:
+            return insert_missing_rows(
+                conn, 'job_postings', self.JOB_POSTING_COLUMNS, rows,
+                key_columns=self.POSTING_KEY_COLUMNS, batch_size=batch_size
+            )
+        
+        # Filtered in memory first; only Bloom filter hits still need a keyed lookup
+        key_positions = [self.JOB_POSTING_COLUMNS.index(c) for c in self.POSTING_KEY_COLUMNS]
+        new_rows, maybe_known, known = self.posting_index.split(rows, key_positions)
+        stats = insert_rows(conn, 'job_postings', self.JOB_POSTING_COLUMNS, new_rows, batch_size=batch_size)
+        stats['skipped'] += known
+        if maybe_known:
+            checked = insert_missing_rows(
+                conn, 'job_postings', self.JOB_POSTING_COLUMNS, maybe_known,
+                key_columns=self.POSTING_KEY_COLUMNS, batch_size=batch_size
+            )
+            for name, count in checked.items():
+                stats[name] += count
+        if not stats['failed']:
+            self.posting_index.add([tuple(row[i] for i in key_positions) for row in new_rows + maybe_known])
+        return stats
+    
+    def load_posting_index(self):
+        """Bulk-load the keys of postings created within dedup_window_days, or None if that fails"""
+        conn = None
+        try:
+            conn = self.get_db_connection()
+            index = ExistingKeyIndex.load(
+                conn, 'job_postings', self.POSTING_KEY_COLUMNS,
+                since_column='created_at', window_days=self.dedup_window_days
+            )
+            stats = index.stats()
+            print(f"Loaded {stats['keys']} existing posting keys ({stats['mode']}, {stats['bytes'] // 1024} KiB)")
+            return index
+        except Exception as e:
+            print(f"Could not load posting keys, falling back to per-batch lookups: {e}")
+            return None
+        finally:
+            if conn is not None:
+                conn.close()
+    
+    def posting_key(self, row):
+        """Scrape-state key of a job_postings row, matching the (title, company_name, location) dedup key"""
+        return job_key(row[0], row[1], row[2])
+    
+    def drop_near_duplicate_rows(self, rows):
+        """Leave out rows that repeat a posting already kept this run, e.g. the same job from another site"""
+        if self.near_duplicates is None:
+            return rows
+        return [row for row in rows if self.near_duplicates.match(row[0], row[1], row[2], row[3]) is None]
+    
+    def drop_known_rows(self, rows):
+        """Leave out rows that earlier runs already saved"""
+        if self.scrape_state is None:
+            return rows
+        known = self.scrape_state.known_keys('job_postings', (self.posting_key(row) for row in rows))
+        if known:
+            self.known_skipped += sum(1 for row in rows if self.posting_key(row) in known)
+            rows = [row for row in rows if self.posting_key(row) not in known]
+        return rows
+    
+    def remember_saved_rows(self, rows, batch_stats):
+        """Record the keys of a fully written batch in the scrape state"""
+        if self.scrape_state is not None and not batch_stats.get('failed'):
+            self.scrape_state.remember_keys('job_postings', (self.posting_key(row) for row in rows))
+    
+    def save_jobs_to_db(self, jobs_df, batch_size=None):
+        """Save jobs to database in batches, skipping (title, company_name, location) already stored"""
         if jobs_df.empty:
-            return 0
+            return empty_save_stats()
+        
+        rows = self.job_posting_rows(jobs_df)
         
         try:
             conn = self.get_db_connection()
-            cursor = conn.cursor()
-            
-            saved_count = 0
-            
-            for _, job in jobs_df.iterrows():
-                try:
-                    # Prepare job data
-                    # LOCATION FALLBACK: Ensure we always have a location
-                    raw_location = str(job.get('location', 'Remote')).strip()
-                    location = raw_location if raw_location and raw_location.lower() != 'none' else 'Remote'
-                    
-                    job_data = {
-                        'title': str(job.get('title', 'Unknown Position')),
-                        'company': str(job.get('company', 'Unknown Company')),
-                        'location': location,
-                        'description': str(job.get('description', 'No description available'))[:3000],
-                        'date_posted': job.get('date_posted'),
-                        'job_url': str(job.get('job_url', '')),
-                        'site': str(job.get('site', 'jobspy')),
-                        'job_type': str(job.get('job_type', 'Full-time')),
-                        'salary_min': job.get('min_amount'),
-                        'salary_max': job.get('max_amount'),
-                        'is_remote': 'remote' in location.lower(),
-                        'scraped_at': datetime.now(),
-                    }
-                    
-                    # Check if job already exists
-                    cursor.execute("""
-                        SELECT id FROM job_postings 
-                        WHERE title = %s AND company = %s AND location = %s
-                    """, (job_data['title'], job_data['company'], job_data['location']))
-                    
-                    if cursor.fetchone() is None:
-                        # Insert new job
-                        insert_query = """
-                            INSERT INTO job_postings 
-                            (title, company, location, description, date_posted, job_url, 
-                             site, job_type, salary_min, salary_max, is_remote, scraped_at, category, subcategory)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """
-                        
-                        cursor.execute(insert_query, (
-                            job_data['title'], job_data['company'], job_data['location'],
-                            job_data['description'], job_data['date_posted'], job_data['job_url'],
-                            job_data['site'], job_data['job_type'], job_data['salary_min'],
-                            job_data['salary_max'], job_data['is_remote'], job_data['scraped_at'],
-                            'tech', 'software-engineering'  # Default category
-                        ))
-                        
-                        saved_count += 1
-                    
-                except Exception as e:
-                    print(f"Error saving individual job: {e}")
-                    continue
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
-            return saved_count
+            try:
+                return self.write_job_posting_rows(conn, rows, batch_size)
+            finally:
+                conn.close()
             
         except Exception as e:
             print(f"Database error: {e}")
-            return 0
+            stats = empty_save_stats()
+            stats['failed'] = len(rows)
+            return stats
     
     def scrape_jobs_improved(self, config):
         """Main scraping function with improvements"""
@@ -213,6 +373,22 @@ class ImprovedJobSpyIntegration:
             job_sites = config.get('job_sites', ['indeed'])
             results_wanted = config.get('results_wanted', 20)
             country = config.get('country', 'USA')
+            self.save_batch_size = config.get('save_batch_size', self.save_batch_size)
+            self.pipeline_queue_size = config.get('pipeline_queue_size', self.pipeline_queue_size)
+            self.query_cache = ScrapeCache.from_config(config)
+            self.watermark_overlap_hours = config.get('watermark_overlap_hours', self.watermark_overlap_hours)
+            self.dedup_window_days = config.get('dedup_window_days', self.dedup_window_days)
+            self.succeeded_queries = []
+            self.known_skipped = 0
+            self.metrics = self.db_pool.metrics = ScrapeMetrics()
+            if self.scrape_state is not None:
+                self.scrape_state.close()
+                self.scrape_state = None
+            if config.get('incremental', True):
+                self.scrape_state = ScrapeState(config.get('state_file', DEFAULT_STATE_FILE))
+                if config.get('reset_watermarks'):
+                    self.scrape_state.reset()
+                self.scrape_state.prune()
             
             if not JOBSPY_AVAILABLE:
                 return {
@@ -231,7 +407,12 @@ class ImprovedJobSpyIntegration:
             
             print(f"Starting improved scraping: {len(search_terms)} terms, {len(locations)} locations")
             
-            all_jobs = []
+            # Postings scraped longer than dedup_window_days ago are not checked, so a repost after that is saved again
+            with self.metrics.stage('dedup.index_load'):
+                self.posting_index = self.load_posting_index() if config.get('dedup_index', True) else None
+            self.near_duplicates = NearDuplicateIndex() if config.get('near_dedup', True) else None
+            self.site_health = SiteHealthMonitor.from_config(config)
+            
             total_scraped = 0
             successful_searches = 0
             failed_searches = 0
@@ -239,57 +420,89 @@ class ImprovedJobSpyIntegration:
             # Distribute results across searches
             results_per_search = max(1, results_wanted // (len(search_terms) * len(locations)))
             
-            for search_term in search_terms:
-                for location in locations:
-                    print(f"Scraping: '{search_term}' in '{location}'")
-                    
-                    try:
-                        jobs_df = self.scrape_with_retries(
-                            site_name=job_sites,
-                            search_term=search_term,
-                            location=location,
-                            results_wanted=results_per_search,
-                            country=country
-                        )
+            # Each search's jobs are written in the background while the next search runs;
+            # (title, company) duplicates across searches are dropped by the writer
+            writer = StreamingWriter(
+                self.get_db_connection, self.write_job_posting_rows,
+                key_positions=[self.JOB_POSTING_COLUMNS.index('title'), self.JOB_POSTING_COLUMNS.index('company_name')],
+                batch_size=self.save_batch_size,
+                queue_size=self.pipeline_queue_size,
+                on_flush=self.remember_saved_rows
+            )
+            try:
+                for search_term in search_terms:
+                    for location in locations:
+                        print(f"Scraping: '{search_term}' in '{location}'")
                         
-                        if not jobs_df.empty:
-                            jobs_df = self.clean_job_data(jobs_df)
+                        try:
+                            jobs_df = self.scrape_with_retries(
+                                site_name=job_sites,
+                                search_term=search_term,
+                                location=location,
+                                results_wanted=results_per_search,
+                                country=country
+                            )
+                            
                             if not jobs_df.empty:
-                                all_jobs.append(jobs_df)
-                                total_scraped += len(jobs_df)
-                                successful_searches += 1
-                                print(f"Successfully scraped {len(jobs_df)} jobs")
+                                with self.metrics.stage('enrich.clean', rows=len(jobs_df)):
+                                    jobs_df = self.clean_job_data(jobs_df)
+                                if not jobs_df.empty:
+                                    with self.metrics.stage('enrich.rows', rows=len(jobs_df)):
+                                        rows = self.job_posting_rows(jobs_df)
+                                    with self.metrics.stage('dedup.near', rows=len(rows)):
+                                        rows = self.drop_near_duplicate_rows(rows)
+                                    with self.metrics.stage('dedup.known', rows=len(rows)):
+                                        rows = self.drop_known_rows(rows)
+                                    writer.put(rows)
+                                    total_scraped += len(jobs_df)
+                                    successful_searches += 1
+                                    print(f"Successfully scraped {len(jobs_df)} jobs")
+                                else:
+                                    failed_searches += 1
                             else:
                                 failed_searches += 1
-                        else:
+                                
+                        except Exception as e:
+                            print(f"Failed to scrape {search_term} in {location}: {e}")
                             failed_searches += 1
-                            
-                    except Exception as e:
-                        print(f"Failed to scrape {search_term} in {location}: {e}")
-                        failed_searches += 1
+            finally:
+                save_stats = writer.close()
             
-            # Process and save results
-            saved_count = 0
-            if all_jobs:
-                try:
-                    combined_df = pd.concat(all_jobs, ignore_index=True)
-                    combined_df = self.clean_job_data(combined_df)
-                    saved_count = self.save_jobs_to_db(combined_df)
-                except Exception as e:
-                    print(f"Error processing results: {e}")
+            # Watermarks only advance when every row reached the database
+            if self.scrape_state is not None:
+                if save_stats['failed'] == 0:
+                    for query, newest in self.succeeded_queries:
+                        self.scrape_state.record_success(*query, newest)
+                else:
+                    print(f"{save_stats['failed']} rows failed to save, watermarks left unchanged")
             
             result = {
                 "success": True,
                 "scraped_count": total_scraped,
-                "saved_count": saved_count,
+                "saved_count": save_stats['inserted'],
+                "skipped_count": save_stats['skipped'],
+                "failed_count": save_stats['failed'],
                 "successful_searches": successful_searches,
                 "failed_searches": failed_searches,
+                "query_cache": self.query_cache.stats() if self.query_cache else None,
+                "known_skipped": self.known_skipped,
+                "dedup_index": self.posting_index.stats() if self.posting_index else None,
+                "near_duplicates": self.near_duplicates.stats() if self.near_duplicates else None,
+                "site_health": self.site_health.stats() if self.site_health else None,
+                "db_pool": self.db_pool.stats(),
+                "metrics": self.metrics.snapshot(),
                 "search_terms": search_terms,
                 "locations": locations,
                 "job_sites": job_sites,
                 "timestamp": datetime.now().isoformat()
             }
             
+            if config.get('metrics_file'):
+                try:
+                    self.metrics.write_prometheus(config['metrics_file'])
+                except OSError as e:
+                    print(f"Could not write metrics to {config['metrics_file']}: {e}")
+            
             return result
             
         except Exception as e:
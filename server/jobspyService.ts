@@ -1,4 +1,5 @@
-import { spawn } from 'child_process';
+import { spawn, type ChildProcessWithoutNullStreams } from 'child_process';
+import { createInterface } from 'readline';
 import { promisify } from 'util';
 import path from 'path';
 import { fileURLToPath } from 'url';
@@ -16,19 +17,100 @@ interface JobSpyConfig {
   job_sites?: string[];
   results_wanted?: number;
   country?: string;
+  max_workers?: number;
+  site_rate_limits?: Record<string, { rate?: number; burst?: number }>;
+  cache?: false | { enabled?: boolean; ttl_seconds?: number; max_mb?: number; dir?: string };
+  bypass_cache?: boolean;
+  incremental?: boolean;
+  reset_watermarks?: boolean;
+  watermark_overlap_hours?: number;
+  adaptive_planning?: boolean;
+  query_budget?: number;
+  planner_exploration?: number;
+  near_dedup?: boolean;
+  circuit_breaker?: false | { failure_threshold?: number; cooldown_seconds?: number; max_cooldown_seconds?: number };
+  metrics_file?: string;
+  archive?: false | { enabled?: boolean; dir?: string; flush_rows?: number; retention_days?: number };
+  // Worker scrapes only queue missing descriptions unless this is set (e.g. { max_seconds: 120 } to fetch them in-run)
+  hydrate_descriptions?: false | { enabled?: boolean; max_seconds?: number; max_workers?: number; claim_size?: number; max_attempts?: number };
+  // Passing the run_id of an interrupted run resumes it; checkpoint: false turns run checkpoints off
+  run_id?: string;
+  checkpoint?: boolean;
+}
+
+interface JobSpyStageMetrics {
+  seconds: number;
+  calls: number;
+  rows: number;
+  rows_per_second: number | null;
+}
+
+interface JobSpySiteMetrics {
+  requests: number;
+  outcomes: Record<string, number>;
+  errors: number;
+  retries: number;
+  rows: number;
+  rows_per_second: number | null;
+  latency_seconds: {
+    count: number;
+    sum: number;
+    mean: number | null;
+    p50: number | null;
+    p95: number | null;
+    max: number | null;
+    buckets: Record<string, number>;
+  };
 }
 
 interface JobSpyResult {
   success: boolean;
+  run_id?: string;
   scraped_count?: number;
   saved_count?: number;
   search_terms?: string[];
   locations?: string[];
   job_sites?: string[];
+  wall_clock_seconds?: number;
+  concurrency?: {
+    max_workers: number;
+    peak: number;
+    average: number;
+  };
+  location_cache?: {
+    hits: number;
+    misses: number;
+    size: number;
+    max_size: number;
+  };
+  metrics?: {
+    elapsed_seconds: number;
+    stages: Record<string, JobSpyStageMetrics>;
+    sites: Record<string, JobSpySiteMetrics>;
+    counters: Record<string, number>;
+  };
   error?: string;
   timestamp: string;
 }
 
+// One line of the scraper's NDJSON protocol (--worker / --ndjson)
+type JobSpyEvent =
+  | { type: 'ready'; pid: number }
+  | { type: 'query'; id?: string; site: string; search_term: string; location: string; jobs: number; seconds: number; error: string | null }
+  | { type: 'progress'; id?: string; stage: 'scrape' | 'save' | 'hydrate'; completed?: number; total?: number; jobs?: number }
+  | { type: 'result'; id?: string; result: JobSpyResult };
+
+interface PendingScrape {
+  id: string;
+  config: JobSpyConfig;
+  resolve: (result: JobSpyResult) => void;
+  reject: (error: Error) => void;
+  timeout?: NodeJS.Timeout;
+}
+
+// A scrape's timer only runs once the worker has been handed the request
+const SCRAPE_TIMEOUT_MS = 10 * 60 * 1000;
+
 interface JobScrapingResults {
   totalFound: number;
   newAdded: number;
@@ -52,6 +134,11 @@ interface JobSyncLogEntry {
 export class JobSpyService {
   private pythonPath: string;
   private scriptPath: string;
+  private worker: ChildProcessWithoutNullStreams | null = null;
+  private workerReady: Promise<void> | null = null;
+  private queuedScrapes: PendingScrape[] = [];
+  private activeScrape: PendingScrape | null = null;
+  private nextRequestId = 0;
   private readonly DEFAULT_SEARCH_TERMS = {
     // Technology roles - expanded for international markets
     tech: [
@@ -275,115 +362,187 @@ export class JobSpyService {
   }
 
   /**
-   * Run JobSpy scraping with custom configuration
+   * Start the long-running Python worker, or reuse the one already running
    */
-  async scrapeJobs(config: JobSpyConfig = {}): Promise<JobSpyResult> {
-    return new Promise((resolve, reject) => {
-      const configJson = JSON.stringify(config);
-      
-      console.log('[JOBSPY_SERVICE] Starting JobSpy scraping...');
-      console.log('[JOBSPY_SERVICE] Config:', config);
-
-      const pythonProcess = spawn(this.pythonPath, ['run', 'python', this.scriptPath, configJson], {
-        stdio: ['pipe', 'pipe', 'pipe'],
-        env: {
-          ...process.env,
-          PYTHONPATH: process.env.PYTHONPATH || '',
-          PYTHONUNBUFFERED: '1'
-        }
-      });
-
-      let stdout = '';
-      let stderr = '';
+  private startWorker(): Promise<void> {
+    if (this.workerReady) {
+      return this.workerReady;
+    }
 
-      pythonProcess.stdout.on('data', (data) => {
-        const output = data.toString();
-        stdout += output;
-        // Log real-time output from Python script
-        console.log('[JOBSPY_PYTHON]', output.trim());
-      });
+    console.log('[JOBSPY_SERVICE] Starting JobSpy worker...');
+    const worker = spawn(this.pythonPath, ['run', 'python', this.scriptPath, '--worker'], {
+      stdio: ['pipe', 'pipe', 'pipe'],
+      env: {
+        ...process.env,
+        PYTHONPATH: process.env.PYTHONPATH || '',
+        PYTHONUNBUFFERED: '1'
+      }
+    });
+    this.worker = worker;
+    let ready = false;
 
-      pythonProcess.stderr.on('data', (data) => {
-        const error = data.toString();
-        stderr += error;
-        console.error('[JOBSPY_PYTHON_ERROR]', error.trim());
-      });
+    this.workerReady = new Promise((resolve, reject) => {
+      // stdout carries one typed JSON event per line and is parsed as it streams; logs arrive on stderr
+      const events = createInterface({ input: worker.stdout });
+      events.on('line', (line) => {
+        let event: JobSpyEvent;
+        try {
+          event = JSON.parse(line);
+        } catch {
+          console.log('[JOBSPY_PYTHON]', line.trim());
+          return;
+        }
 
-      pythonProcess.on('close', (code) => {
-        console.log(`[JOBSPY_SERVICE] Python process exited with code ${code}`);
-        
-        if (code === 0) {
-          try {
-            // Parse the JSON result from stdout - find JSON block
-            const lines = stdout.trim().split('\n');
-            let jsonResult = null;
-            
-            // Look for JSON result starting from the end
-            for (let i = lines.length - 1; i >= 0; i--) {
-              const line = lines[i].trim();
-              if (line.startsWith('{')) {
-                // Try to parse potential JSON lines
-                try {
-                  // If it's a single line JSON
-                  if (line.endsWith('}')) {
-                    const parsed = JSON.parse(line);
-                    // Verify it's our expected result structure
-                    if (parsed && typeof parsed === 'object' && ('success' in parsed || 'scraped_count' in parsed)) {
-                      jsonResult = parsed;
-                      break;
-                    }
-                  } else {
-                    // Multi-line JSON - collect all lines from this point
-                    const jsonLines = lines.slice(i);
-                    const jsonString = jsonLines.join('\n');
-                    const parsed = JSON.parse(jsonString);
-                    if (parsed && typeof parsed === 'object' && ('success' in parsed || 'scraped_count' in parsed)) {
-                      jsonResult = parsed;
-                      break;
-                    }
-                  }
-                } catch (e) {
-                  // Continue looking for valid JSON
-                  continue;
-                }
-              }
+        switch (event.type) {
+          case 'ready':
+            console.log(`[JOBSPY_SERVICE] JobSpy worker ${event.pid} ready`);
+            ready = true;
+            resolve();
+            break;
+          case 'query':
+            if (event.error) {
+              console.warn(`[JOBSPY_SERVICE] ${event.site} '${event.search_term}' in '${event.location}' failed: ${event.error}`);
             }
-            
-            if (jsonResult) {
-              console.log('[JOBSPY_SERVICE] Scraping completed successfully');
-              console.log('[JOBSPY_SERVICE] Result:', jsonResult);
-              resolve(jsonResult);
-            } else {
-              console.error('[JOBSPY_SERVICE] No valid JSON found in output');
-              console.error('[JOBSPY_SERVICE] Full stdout:', stdout);
-              reject(new Error('No valid JSON result found in JobSpy output'));
+            break;
+          case 'progress':
+            if (event.stage === 'scrape' && event.completed === event.total) {
+              console.log(`[JOBSPY_SERVICE] Scrape ${event.id}: ${event.total} queries done`);
+            } else if (event.stage === 'save') {
+              console.log(`[JOBSPY_SERVICE] Scrape ${event.id}: saving ${event.jobs} jobs`);
             }
-          } catch (parseError) {
-            console.error('[JOBSPY_SERVICE] Failed to parse result:', parseError instanceof Error ? parseError.message : String(parseError));
-            console.error('[JOBSPY_SERVICE] Full stdout:', stdout);
-            reject(new Error(`Failed to parse JobSpy result: ${parseError instanceof Error ? parseError.message : String(parseError)}`));
+            break;
+          case 'result': {
+            const scrape = this.activeScrape;
+            if (scrape && scrape.id === String(event.id)) {
+              clearTimeout(scrape.timeout);
+              this.activeScrape = null;
+              scrape.resolve(event.result);
+              this.dispatchNextScrape();
+            }
+            break;
           }
-        } else {
-          const errorMessage = stderr || 'JobSpy script failed with unknown error';
-          console.error('[JOBSPY_SERVICE] JobSpy script failed:', errorMessage);
-          reject(new Error(errorMessage));
         }
       });
 
-      pythonProcess.on('error', (error) => {
+      worker.stderr.on('data', (data) => {
+        console.log('[JOBSPY_PYTHON]', data.toString().trim());
+      });
+
+      // A worker that dies after EPIPE must not take the server down with it
+      worker.stdin.on('error', (error) => {
+        console.error('[JOBSPY_SERVICE] JobSpy worker stdin failed:', error);
+        this.resetWorker(worker, new Error(`JobSpy worker stdin failed: ${error.message}`));
+        worker.kill('SIGTERM');
+        this.dispatchNextScrape();
+      });
+
+      worker.on('error', (error) => {
         console.error('[JOBSPY_SERVICE] Failed to start Python process:', error);
-        reject(new Error(`Failed to start JobSpy: ${error.message}`));
+        const failure = new Error(`Failed to start JobSpy: ${error.message}`);
+        this.resetWorker(worker, failure);
+        reject(failure);
+      });
+
+      worker.on('close', (code) => {
+        console.log(`[JOBSPY_SERVICE] JobSpy worker exited with code ${code}`);
+        const failure = new Error(`JobSpy worker exited with code ${code}`);
+        this.resetWorker(worker, failure);
+        reject(failure);
+        // A worker that never came up fails the whole queue in dispatchNextScrape instead
+        if (ready) {
+          this.dispatchNextScrape();
+        }
       });
+    });
 
-      // Set a timeout for long-running scraping operations
-      const timeout = setTimeout(() => {
-        pythonProcess.kill('SIGTERM');
-        reject(new Error('JobSpy scraping timed out after 10 minutes'));
-      }, 10 * 60 * 1000); // 10 minutes timeout
+    return this.workerReady;
+  }
 
-      pythonProcess.on('close', () => {
-        clearTimeout(timeout);
+  /**
+   * Forget a dead worker and fail the scrape it was running; queued scrapes go to a new one
+   */
+  private resetWorker(worker: ChildProcessWithoutNullStreams, error: Error): void {
+    if (this.worker !== worker) {
+      return;
+    }
+    this.worker = null;
+    this.workerReady = null;
+
+    const scrape = this.activeScrape;
+    if (scrape) {
+      clearTimeout(scrape.timeout);
+      this.activeScrape = null;
+      scrape.reject(error);
+    }
+  }
+
+  /**
+   * Hand the next queued scrape to the worker, one at a time, starting its timeout on send
+   */
+  private dispatchNextScrape(): void {
+    if (this.activeScrape || this.queuedScrapes.length === 0) {
+      return;
+    }
+    const scrape = this.queuedScrapes.shift()!;
+    this.activeScrape = scrape;
+
+    this.startWorker().then(() => {
+      const worker = this.worker;
+      if (this.activeScrape !== scrape || !worker) {
+        return;
+      }
+      scrape.timeout = setTimeout(() => {
+        // A job cannot be abandoned midway, so only this scrape fails and the worker is replaced
+        this.resetWorker(worker, new Error('JobSpy scraping timed out after 10 minutes'));
+        worker.kill('SIGTERM');
+        this.dispatchNextScrape();
+      }, SCRAPE_TIMEOUT_MS);
+      worker.stdin.write(JSON.stringify({ id: scrape.id, config: scrape.config }) + '\n');
+    }, (error: Error) => {
+      // The worker could not start, so nothing still queued can run either
+      if (this.activeScrape === scrape) {
+        this.activeScrape = null;
+        scrape.reject(error);
+      }
+      for (const queued of this.queuedScrapes.splice(0)) {
+        queued.reject(error);
+      }
+    });
+  }
+
+  /**
+   * Let the worker finish its current job and exit
+   */
+  stopWorker(): void {
+    this.worker?.stdin.end();
+  }
+
+  /**
+   * Run JobSpy scraping with custom configuration
+   */
+  async scrapeJobs(config: JobSpyConfig = {}): Promise<JobSpyResult> {
+    console.log('[JOBSPY_SERVICE] Starting JobSpy scraping...');
+    console.log('[JOBSPY_SERVICE] Config:', config);
+
+    const id = String(++this.nextRequestId);
+
+    return new Promise((resolve, reject) => {
+      this.queuedScrapes.push({
+        id,
+        config,
+        resolve: (result) => {
+          if (result.success) {
+            console.log('[JOBSPY_SERVICE] Scraping completed successfully');
+            console.log('[JOBSPY_SERVICE] Result:', result);
+            resolve(result);
+          } else {
+            console.error('[JOBSPY_SERVICE] JobSpy scraping failed:', result.error);
+            reject(new Error(result.error || 'JobSpy script failed with unknown error'));
+          }
+        },
+        reject
       });
+      this.dispatchNextScrape();
     });
   }
 
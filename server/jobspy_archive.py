@@ -0,0 +1,203 @@
+"""
+Raw result archive for the JobSpy scraper
+scrape_jobs DataFrames kept as zstd-compressed Parquet files partitioned by date and site, so the
+enrichment and save pipeline can be replayed over past results without touching the job sites
+"""
+
+import os
+import shutil
+import threading
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (pandas' Parquet engine)
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+DEFAULT_ARCHIVE_DIR = os.environ.get(
+    'JOBSPY_ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.jobspy_archive')
+)
+# Rows buffered per site before a Parquet file is written; fewer, larger files read back faster
+DEFAULT_FLUSH_ROWS = 5000
+DEFAULT_RETENTION_DAYS = 180
+COMPRESSION = 'zstd'
+
+
+def _partition_value(directory: str, name: str) -> Optional[str]:
+    prefix = f"{name}="
+    return directory[len(prefix):] if directory.startswith(prefix) else None
+
+
+def _stringify(value: Any) -> Optional[str]:
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, (list, tuple)):
+        return ', '.join(str(item) for item in value)
+    return str(value)
+
+
+class RawArchive:
+    """scrape_jobs results on disk, laid out as <dir>/date=YYYY-MM-DD/site=<site>/<time>-<id>.parquet.
+
+    put() adds one query's frame, with the query columns appended, to its site's buffer;
+    a site's buffer is written as one Parquet file once it holds flush_rows rows, and
+    close() writes the rest. Object columns pyarrow cannot type (mixed values) are
+    stored as text. frames() reads the archive back one file at a time, oldest first,
+    optionally limited to a date range and to some sites. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_ARCHIVE_DIR,
+        flush_rows: int = DEFAULT_FLUSH_ROWS,
+        retention_days: Optional[int] = DEFAULT_RETENTION_DAYS,
+    ):
+        self.directory = directory
+        self.flush_rows = max(1, int(flush_rows))
+        self.retention_days = retention_days
+        self.counters = {'queries': 0, 'rows': 0, 'files': 0, 'bytes': 0, 'write_failures': 0}
+        self._buffers: Dict[str, List[pd.DataFrame]] = {}
+        self._buffered_rows: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional['RawArchive']:
+        """Archive configured by a run's 'archive' option, or None when disabled or pyarrow is missing"""
+        options = config.get('archive', {})
+        if options is False:
+            return None
+        options = options or {}
+        if not options.get('enabled', True):
+            return None
+        if not PARQUET_AVAILABLE:
+            print("[JOBSPY] pyarrow not found, raw results will not be archived. Please install: pip install pyarrow")
+            return None
+        return cls(
+            directory=options.get('dir', DEFAULT_ARCHIVE_DIR),
+            flush_rows=options.get('flush_rows', DEFAULT_FLUSH_ROWS),
+            retention_days=options.get('retention_days', DEFAULT_RETENTION_DAYS),
+        )
+
+    def put(self, site: str, search_term: str, location: str, country: str, jobs_df: pd.DataFrame):
+        if jobs_df is None or jobs_df.empty:
+            return
+        frame = jobs_df.copy()
+        frame['_search_term'] = search_term
+        frame['_location'] = location
+        frame['_country'] = country
+        frame['_fetched_at'] = datetime.now()
+        with self._lock:
+            self._buffers.setdefault(site, []).append(frame)
+            self._buffered_rows[site] = self._buffered_rows.get(site, 0) + len(frame)
+            self.counters['queries'] += 1
+            if self._buffered_rows[site] >= self.flush_rows:
+                self._flush(site)
+
+    def _flush(self, site: str):
+        frames = self._buffers.pop(site, [])
+        rows = self._buffered_rows.pop(site, 0)
+        if not frames:
+            return
+        frame = pd.concat(frames, ignore_index=True)
+        now = datetime.now()
+        partition = os.path.join(self.directory, f"date={now.date().isoformat()}", f"site={site}")
+        path = os.path.join(partition, f"{now.strftime('%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet")
+        # Written under a temporary name, so readers never see a half-written file
+        temp_path = f"{path}.part"
+        try:
+            os.makedirs(partition, exist_ok=True)
+            try:
+                frame.to_parquet(temp_path, compression=COMPRESSION, index=False)
+            except (TypeError, ValueError):
+                # pyarrow refuses object columns holding mixed types (ArrowTypeError, ArrowInvalid); those are kept as text
+                for column in frame.columns[frame.dtypes == object]:
+                    frame[column] = frame[column].map(_stringify)
+                frame.to_parquet(temp_path, compression=COMPRESSION, index=False)
+            os.replace(temp_path, path)
+        except Exception as e:
+            self.counters['write_failures'] += 1
+            print(f"[JOBSPY] Could not archive {rows} raw {site} results: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self.counters['rows'] += rows
+        self.counters['files'] += 1
+        self.counters['bytes'] += os.path.getsize(path)
+
+    def close(self):
+        """Write out every buffered frame"""
+        with self._lock:
+            for site in list(self._buffers):
+                self._flush(site)
+
+    def prune(self) -> int:
+        """Remove date partitions older than retention_days, returns how many were removed"""
+        if not self.retention_days or not os.path.isdir(self.directory):
+            return 0
+        cutoff = date.today() - timedelta(days=self.retention_days)
+        removed = 0
+        for day, path in self.partitions():
+            if day < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def partitions(self) -> List[Tuple[date, str]]:
+        """(date, path) of every date partition, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        partitions = []
+        for entry in os.listdir(self.directory):
+            value = _partition_value(entry, 'date')
+            try:
+                partitions.append((date.fromisoformat(value), os.path.join(self.directory, entry)))
+            except (TypeError, ValueError):
+                continue
+        return sorted(partitions)
+
+    def files(
+        self,
+        since: Optional[date] = None,
+        until: Optional[date] = None,
+        sites: Optional[Iterable[str]] = None,
+    ) -> List[Tuple[date, str, str]]:
+        """(date, site, path) of the archived files in a date range (inclusive), oldest first"""
+        sites = set(sites) if sites else None
+        found = []
+        for day, day_path in self.partitions():
+            if (since and day < since) or (until and day > until):
+                continue
+            for entry in sorted(os.listdir(day_path)):
+                site = _partition_value(entry, 'site')
+                if site is None or (sites is not None and site not in sites):
+                    continue
+                site_path = os.path.join(day_path, entry)
+                found += [
+                    (day, site, os.path.join(site_path, name))
+                    for name in sorted(os.listdir(site_path)) if name.endswith('.parquet')
+                ]
+        return found
+
+    def frames(
+        self,
+        since: Optional[date] = None,
+        until: Optional[date] = None,
+        sites: Optional[Iterable[str]] = None,
+        newest_first: bool = False,
+    ) -> Iterator[Tuple[date, str, pd.DataFrame]]:
+        """(date, site, frame) per archived file, read lazily"""
+        files = self.files(since, until, sites)
+        for day, site, path in (reversed(files) if newest_first else files):
+            try:
+                yield day, site, pd.read_parquet(path)
+            except Exception as e:
+                print(f"[JOBSPY] Could not read archived results {path}: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'dir': self.directory, **self.counters}
@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the JobSpy scrapers
+Runs both scrapers against a synthetic job board and a scratch Postgres, and reports throughput per stage as JSON
+"""
+
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+import psycopg2
+
+BENCH_VERSION = 1
+STAGES = ('fetch', 'enrich', 'dedup', 'save')
+SCENARIOS = ('jobspy_scraper', 'improved_scraper')
+DATABASE_URL_ENV = 'JOBSPY_BENCH_DATABASE_URL'
+
+# Postings shared by every query and site, so duplicate_rate rows repeat across the run
+SHARED_POSTINGS = 500
+# Effectively unthrottled site budgets, so the numbers measure the pipeline and not the pacing
+UNTHROTTLED_BUDGET = {'rate': 1000.0, 'burst': 1000}
+
+BENCH_SEARCH_TERMS = [
+    'software engineer', 'data scientist', 'product manager', 'frontend developer',
+    'backend developer', 'devops engineer', 'marketing manager', 'sales executive',
+    'business analyst', 'ux designer', 'mobile developer', 'data analyst',
+]
+BENCH_LOCATIONS = [
+    'Bangalore, India', 'Mumbai, India', 'New York, NY', 'San Francisco, CA',
+    'London, UK', 'Berlin, Germany', 'Remote', 'Austin, TX',
+]
+BENCH_COMPANIES = [
+    'Acme', 'Globex Inc', 'Initech', 'Umbrella Corp', 'Hooli', 'Stark Industries',
+    'Wayne Enterprises', 'Tyrell Corporation', 'Cyberdyne Systems', 'Soylent Ltd',
+]
+BENCH_LEVELS = ['', '', 'Senior', 'Junior', 'Lead', 'Staff', 'Principal', 'Associate']
+BENCH_WORDS = [
+    'Python', 'React', 'AWS', 'SQL', 'Kubernetes', 'Docker', 'TypeScript', 'Java', 'Excel', 'SEO',
+    'team', 'build', 'customers', 'scalable', 'platform', 'growth', 'design', 'data', 'product',
+    'ownership', 'collaborate', 'deliver', 'roadmap', 'experience', 'years', 'strong', 'communication',
+]
+BENCH_JOB_TYPES = ['fulltime', 'parttime', 'contract', 'internship']
+
+
+class FakeBoardError(Exception):
+    """Raised by FakeJobBoard in the shape of JobSpy's own HTTP errors"""
+
+
+class FakeJobBoard:
+    """Stand-in for jobspy.scrape_jobs that returns synthetic result frames.
+
+    Each call sleeps for about `latency` seconds, fails with a JobSpy-style 429 error
+    with probability error_rate, and otherwise returns up to jobs_per_query rows for
+    every requested site. A duplicate_rate share of the rows is drawn from a fixed pool
+    of postings shared by all queries and sites, which gives the dedup stages repeats
+    to find. Output depends only on the seed, the query and how often it was retried.
+    Counters are thread-safe; seconds is summed over calls, so it includes the latency.
+    """
+
+    def __init__(
+        self,
+        jobs_per_query: int = 15,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        duplicate_rate: float = 0.2,
+        description_words: int = 150,
+        seed: int = 0,
+    ):
+        self.jobs_per_query = jobs_per_query
+        self.latency = latency
+        self.error_rate = error_rate
+        self.duplicate_rate = duplicate_rate
+        self.description_words = description_words
+        self.seed = seed
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self._attempts = Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, site_name=None, search_term: str = '', location: str = '', results_wanted: int = 15, **kwargs) -> pd.DataFrame:
+        sites = [site_name] if isinstance(site_name, str) else list(site_name or ['indeed'])
+        query = f"{self.seed}|{','.join(sites)}|{search_term}|{location}"
+        with self._lock:
+            attempt = self._attempts[query]
+            self._attempts[query] += 1
+        rng = random.Random(f"{query}|{attempt}")
+
+        started = time.perf_counter()
+        try:
+            if self.latency > 0:
+                time.sleep(self.latency * rng.uniform(0.5, 1.5))
+            if rng.random() < self.error_rate:
+                with self._lock:
+                    self.errors += 1
+                raise FakeBoardError(f"{sites[0]} response status code 429")
+            count = max(0, min(self.jobs_per_query, int(results_wanted)))
+            frame = pd.DataFrame([
+                self._posting(rng, site, search_term, location)
+                for site in sites for _ in range(count)
+            ])
+        finally:
+            with self._lock:
+                self.calls += 1
+                self.seconds += time.perf_counter() - started
+        with self._lock:
+            self.rows += len(frame)
+        return frame
+
+    def _posting(self, rng: random.Random, site: str, search_term: str, location: str) -> Dict[str, Any]:
+        if rng.random() < self.duplicate_rate:
+            # The same posting comes back from other queries and, under its own URL, from other sites
+            shared = rng.randrange(SHARED_POSTINGS)
+            source = random.Random(f"{self.seed}|shared|{shared}")
+            key = f"shared-{shared}"
+            role = source.choice(BENCH_SEARCH_TERMS)
+            place = source.choice(BENCH_LOCATIONS)
+        else:
+            source = rng
+            key = f"{rng.getrandbits(48):012x}"
+            role = search_term or rng.choice(BENCH_SEARCH_TERMS)
+            place = location or rng.choice(BENCH_LOCATIONS)
+
+        title = f"{source.choice(BENCH_LEVELS)} {role.title()}".strip()
+        salary = source.choice([None, 40000, 65000, 90000, 120000, 160000])
+        return {
+            'site': site,
+            'job_url': f"https://{site}.example.com/jobs/{key}",
+            'title': title,
+            'company': source.choice(BENCH_COMPANIES),
+            'location': place,
+            'date_posted': date.today() - timedelta(days=source.randint(0, 6)),
+            'job_type': source.choice(BENCH_JOB_TYPES),
+            'interval': 'yearly' if salary else None,
+            'min_amount': salary,
+            'max_amount': salary * 1.3 if salary else None,
+            'currency': 'USD' if salary else None,
+            'is_remote': 'remote' in place.lower(),
+            'description': ' '.join(source.choices(BENCH_WORDS, k=self.description_words)),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'calls': self.calls, 'errors': self.errors, 'rows': self.rows, 'seconds': self.seconds}
+
+
+class StageClock:
+    """Seconds, calls and items per pipeline stage, summed over every thread"""
+
+    def __init__(self):
+        self.stages = {stage: {'seconds': 0.0, 'calls': 0, 'items': 0} for stage in STAGES}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float, items: int = 0, calls: int = 1):
+        with self._lock:
+            entry = self.stages[stage]
+            entry['seconds'] += seconds
+            entry['calls'] += calls
+            entry['items'] += items
+
+    def wrap(self, stage: str, fn: Callable, count: Optional[Callable[[tuple, Any], int]] = None) -> Callable:
+        """fn timed into `stage`; count(args, result) gives the items it handled (none by default)"""
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            result = fn(*args, **kwargs)
+            self.add(stage, time.perf_counter() - started, count(args, result) if count else 0)
+            return result
+        return timed
+
+    def instrument(self, owner: Any, name: str, stage: str, count: Optional[Callable[[tuple, Any], int]] = None):
+        """Replace owner.name (a method on a class or instance) with its timed version"""
+        setattr(owner, name, self.wrap(stage, getattr(owner, name), count))
+
+
+BENCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scraped_jobs (
+    id SERIAL PRIMARY KEY,
+    title VARCHAR NOT NULL,
+    company VARCHAR NOT NULL,
+    description TEXT,
+    location VARCHAR,
+    work_mode VARCHAR,
+    job_type VARCHAR,
+    experience_level VARCHAR,
+    salary_range VARCHAR,
+    skills TEXT[],
+    country_code VARCHAR,
+    region VARCHAR,
+    city VARCHAR,
+    salary_min INTEGER,
+    salary_max INTEGER,
+    currency VARCHAR,
+    salary_period VARCHAR,
+    source_url VARCHAR NOT NULL,
+    source_platform VARCHAR NOT NULL,
+    external_id VARCHAR,
+    language VARCHAR,
+    category VARCHAR,
+    subcategory VARCHAR,
+    tags TEXT[],
+    is_active BOOLEAN DEFAULT true,
+    last_scraped TIMESTAMP DEFAULT now(),
+    expires_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT now(),
+    updated_at TIMESTAMP DEFAULT now(),
+    CONSTRAINT scraped_jobs_source_external_unique UNIQUE (source_platform, external_id)
+);
+CREATE TABLE IF NOT EXISTS job_postings (
+    id SERIAL PRIMARY KEY,
+    title VARCHAR NOT NULL,
+    company_name VARCHAR NOT NULL,
+    location VARCHAR,
+    description TEXT,
+    date_posted TIMESTAMP,
+    job_url TEXT,
+    site VARCHAR,
+    job_type VARCHAR,
+    salary_min NUMERIC,
+    salary_max NUMERIC,
+    is_remote BOOLEAN,
+    scraped_at TIMESTAMP,
+    category VARCHAR,
+    subcategory VARCHAR,
+    created_at TIMESTAMP DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_job_postings_dedup_key ON job_postings (title, company_name, location);
+CREATE INDEX IF NOT EXISTS idx_job_postings_created_at ON job_postings (created_at);
+"""
+
+
+def reset_tables(database_url: str):
+    """Create the scraper tables if missing and empty them; the database must be a scratch one"""
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(BENCH_SCHEMA)
+            cursor.execute('TRUNCATE scraped_jobs, job_postings RESTART IDENTITY')
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@contextmanager
+def scratch_database(database_url: Optional[str] = None) -> Iterator[str]:
+    """The given scratch database, or a temporary Postgres started with testing.postgresql"""
+    database_url = database_url or os.environ.get(DATABASE_URL_ENV)
+    if database_url:
+        yield database_url
+        return
+    try:
+        import testing.postgresql
+    except ImportError:
+        raise RuntimeError(
+            f"No scratch database: set {DATABASE_URL_ENV} (its scraped_jobs and job_postings tables are emptied) "
+            "or install the dev dependency group (uv sync --group dev) to start a temporary Postgres"
+        )
+    with testing.postgresql.Postgresql() as postgresql:
+        yield postgresql.url()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_jobspy_scraper(params: Dict[str, Any], board: FakeJobBoard, clock: StageClock, state_file: str) -> Dict[str, Any]:
+    import jobspy_scraper
+    from jobspy_dedup import NearDuplicateIndex
+    from jobspy_state import ScrapeState
+
+    jobspy_scraper.scrape_jobs = board
+    clock.instrument(NearDuplicateIndex, 'match', 'dedup')
+    clock.instrument(ScrapeState, 'known_keys', 'dedup')
+
+    scraper = jobspy_scraper.JobSpyIntegration()
+    clock.instrument(scraper, 'enrich_jobs', 'enrich', count=lambda args, jobs: len(jobs))
+    clock.instrument(scraper, 'write_job_rows', 'save', count=lambda args, stats: len(args[1]))
+    config = {
+        'search_terms': params['search_terms'],
+        'locations': params['locations'],
+        'job_sites': params['job_sites'],
+        'results_wanted': params['jobs_per_query'] * len(params['search_terms']),
+        'max_workers': params['max_workers'],
+        'site_rate_limits': {site: UNTHROTTLED_BUDGET for site in params['job_sites']},
+        'cache': False,
+        'adaptive_planning': False,
+        # Synthetic postings carry their descriptions; nothing would be fetched from a real site
+        'hydrate_descriptions': False,
+        'archive': False,
+        'state_file': state_file,
+    }
+    try:
+        started = time.perf_counter()
+        result = scraper.run_scraping(config)
+        result['wall_seconds'] = time.perf_counter() - started
+        return result
+    finally:
+        scraper.close()
+
+
+def _run_improved_scraper(params: Dict[str, Any], board: FakeJobBoard, clock: StageClock, state_file: str) -> Dict[str, Any]:
+    import improved_jobspy_scraper
+    from jobspy_dedup import ExistingKeyIndex
+
+    improved_jobspy_scraper.scrape_jobs = board
+    improved_jobspy_scraper.JOBSPY_AVAILABLE = True
+    # The key-index check runs inside write_job_posting_rows, so it is timed as part of saving
+    clock.instrument(ExistingKeyIndex, 'load', 'dedup')
+
+    scraper = improved_jobspy_scraper.ImprovedJobSpyIntegration()
+    scraper.min_delay = scraper.max_delay = 0
+    clock.instrument(scraper, 'clean_job_data', 'enrich', count=lambda args, frame: len(frame))
+    clock.instrument(scraper, 'job_posting_rows', 'enrich')
+    clock.instrument(scraper, 'drop_near_duplicate_rows', 'dedup')
+    clock.instrument(scraper, 'drop_known_rows', 'dedup')
+    clock.instrument(scraper, 'write_job_posting_rows', 'save', count=lambda args, stats: len(args[1]))
+    config = {
+        'search_terms': params['search_terms'],
+        'locations': params['locations'],
+        'job_sites': params['job_sites'],
+        'results_wanted': params['jobs_per_query'] * len(params['search_terms']) * len(params['locations']),
+        'cache': False,
+        'state_file': state_file,
+    }
+    try:
+        started = time.perf_counter()
+        result = scraper.scrape_jobs_improved(config)
+        result['wall_seconds'] = time.perf_counter() - started
+        return result
+    finally:
+        scraper.db_pool.closeall()
+
+
+SCENARIO_RUNNERS = {
+    'jobspy_scraper': _run_jobspy_scraper,
+    'improved_scraper': _run_improved_scraper,
+}
+
+
+def _rate(items: int, seconds: float) -> Optional[float]:
+    return round(items / seconds, 1) if seconds > 0 else None
+
+
+def run_scenario(name: str, params: Dict[str, Any], database_url: str) -> Dict[str, Any]:
+    """One timed run of a scenario; meant to run in a fresh process so peak RSS is its own"""
+    # Scraper logs go to stderr so stdout only carries the report
+    sys.stdout = sys.stderr
+    os.environ['DATABASE_URL'] = database_url
+    reset_tables(database_url)
+
+    board = FakeJobBoard(
+        jobs_per_query=params['jobs_per_query'],
+        latency=params['latency'],
+        error_rate=params['error_rate'],
+        duplicate_rate=params['duplicate_rate'],
+        description_words=params['description_words'],
+        seed=params['seed'],
+    )
+    clock = StageClock()
+    with tempfile.TemporaryDirectory(prefix='jobspy-bench-') as state_dir:
+        result = SCENARIO_RUNNERS[name](params, board, clock, os.path.join(state_dir, 'state.sqlite3'))
+
+    fetched = board.stats()
+    clock.add('fetch', fetched['seconds'], fetched['rows'], calls=fetched['calls'])
+    # Every enriched job passes through dedup, whichever checks are switched on
+    clock.stages['dedup']['items'] = clock.stages['enrich']['items']
+
+    wall = result.get('wall_seconds') or 0.0
+    scraped = result.get('scraped_count', 0)
+    return {
+        'success': bool(result.get('success')),
+        'error': result.get('error'),
+        'wall_seconds': round(wall, 4),
+        'jobs_per_second': _rate(scraped, wall),
+        'jobs': {'fetched': fetched['rows'], 'scraped': scraped, 'saved': result.get('saved_count', 0)},
+        'queries': {'calls': fetched['calls'], 'errors': fetched['errors']},
+        'stages': {
+            stage: {
+                'seconds': round(entry['seconds'], 4),
+                'calls': entry['calls'],
+                'items': entry['items'],
+                'jobs_per_second': _rate(entry['items'], entry['seconds']),
+            }
+            for stage, entry in clock.stages.items()
+        },
+        'db_round_trips': (result.get('db_pool') or {}).get('round_trips'),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def run_benchmark(params: Dict[str, Any], scenarios: List[str], database_url: Optional[str] = None, repeat: int = 1) -> Dict[str, Any]:
+    """Run each scenario `repeat` times in fresh processes and keep the run with the median wall time"""
+    context = multiprocessing.get_context('spawn')
+    reports = {}
+    with scratch_database(database_url) as url:
+        for name in scenarios:
+            runs = []
+            for _ in range(max(1, repeat)):
+                with context.Pool(1) as pool:
+                    runs.append(pool.apply(run_scenario, (name, params, url)))
+            walls = [run['wall_seconds'] for run in runs]
+            median = statistics.median_low(walls)
+            report = next(run for run in runs if run['wall_seconds'] == median)
+            report['runs_wall_seconds'] = walls
+            reports[name] = report
+            print(f"[JOBSPY] Bench {name}: {report['jobs']['scraped']} jobs in {report['wall_seconds']}s ({report['jobs_per_second']} jobs/s)", file=sys.stderr)
+
+    return {
+        'version': BENCH_VERSION,
+        'params': params,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': sys.platform,
+            'cpus': os.cpu_count(),
+        },
+        'scenarios': reports,
+        'timestamp': datetime.now().isoformat(),
+    }
+
+
+def _take(names: List[str], count: int) -> List[str]:
+    """The first `count` names, numbered once the list runs out ("software engineer 2", ...)"""
+    return [
+        names[i % len(names)] + (f" {i // len(names) + 1}" if i >= len(names) else '')
+        for i in range(max(1, count))
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the JobSpy scrapers against a synthetic job board")
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help="scenario to run (repeatable; default: all)")
+    parser.add_argument('--terms', type=int, default=8, help="number of search terms")
+    parser.add_argument('--locations', type=int, default=6, help="number of locations")
+    parser.add_argument('--sites', default='indeed,linkedin', help="comma-separated job sites")
+    parser.add_argument('--jobs-per-query', type=int, default=15)
+    parser.add_argument('--latency', type=float, default=0.05, help="mean seconds per scrape_jobs call")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of calls failing with a 429 (the scrapers' retry backoff is real)")
+    parser.add_argument('--duplicate-rate', type=float, default=0.2, help="share of rows repeating a shared posting")
+    parser.add_argument('--description-words', type=int, default=150)
+    parser.add_argument('--max-workers', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help="runs per scenario; the median run is reported")
+    parser.add_argument('--database-url', help=f"scratch database (default: ${DATABASE_URL_ENV}, else a temporary Postgres)")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    params = {
+        'search_terms': _take(BENCH_SEARCH_TERMS, args.terms),
+        'locations': _take(BENCH_LOCATIONS, args.locations),
+        'job_sites': [site.strip() for site in args.sites.split(',') if site.strip()],
+        'jobs_per_query': args.jobs_per_query,
+        'latency': args.latency,
+        'error_rate': args.error_rate,
+        'duplicate_rate': args.duplicate_rate,
+        'description_words': args.description_words,
+        'max_workers': args.max_workers,
+        'seed': args.seed,
+    }
+
+    try:
+        report = run_benchmark(params, args.scenario or list(SCENARIOS), args.database_url, args.repeat)
+    except (RuntimeError, psycopg2.Error) as e:
+        print(f"[JOBSPY] Benchmark failed: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+    sys.exit(0 if all(scenario['success'] for scenario in report['scenarios'].values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Query cache for the JobSpy scrapers
+Results of scrape_jobs calls kept on disk as compressed pickled DataFrames, with a TTL and LRU size bound
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Union
+
+import pandas as pd
+
+DEFAULT_CACHE_DIR = os.environ.get('JOBSPY_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'jobspy_cache'))
+DEFAULT_TTL_SECONDS = 6 * 3600
+DEFAULT_MAX_MB = 256
+CACHE_SUFFIX = '.pkl.gz'
+
+
+def normalize_query_text(value: Any) -> str:
+    """Lowercased text with whitespace collapsed, so equivalent queries compare equal"""
+    return ' '.join(str(value or '').split()).lower()
+
+
+class ScrapeCache:
+    """Disk cache of scrape_jobs results keyed on the normalized query.
+
+    An entry is fresh for ttl_seconds after it was written (file mtime). Reads refresh the
+    access time (atime), and once the directory grows past max_bytes the least recently
+    used entries are deleted. With bypass set, lookups always miss but results are still
+    stored, so a forced refresh also renews the cache for later runs.
+    """
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_CACHE_DIR,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+        bypass: bool = False,
+    ):
+        self.directory = directory
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_bytes = int(max_bytes)
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional['ScrapeCache']:
+        """Cache configured by a run's 'cache' and 'bypass_cache' options, or None when disabled"""
+        options = config.get('cache', {})
+        if options is False:
+            return None
+        options = options or {}
+        if not options.get('enabled', True):
+            return None
+        return cls(
+            directory=options.get('dir', DEFAULT_CACHE_DIR),
+            ttl_seconds=options.get('ttl_seconds', DEFAULT_TTL_SECONDS),
+            max_bytes=int(options.get('max_mb', DEFAULT_MAX_MB) * 1024 * 1024),
+            bypass=bool(config.get('bypass_cache', options.get('bypass', False))),
+        )
+
+    @staticmethod
+    def key(
+        site: Union[str, Iterable[str]],
+        search_term: str,
+        location: str,
+        hours_old: Optional[int],
+        country: Optional[str] = None,
+        results_wanted: Optional[int] = None,
+    ) -> str:
+        """Cache key for a query; case, spacing and site order do not matter"""
+        sites = [site] if isinstance(site, str) else list(site)
+        query = {
+            'sites': sorted(normalize_query_text(s) for s in sites),
+            'search_term': normalize_query_text(search_term),
+            'location': normalize_query_text(location),
+            'hours_old': hours_old,
+            'country': normalize_query_text(country),
+            'results_wanted': results_wanted,
+        }
+        return hashlib.blake2b(json.dumps(query, sort_keys=True).encode('utf-8'), digest_size=16).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """Cached frame for a key, or None when missing, expired or bypassed"""
+        if self.bypass:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        path = self._path(key)
+        frame = None
+        try:
+            written_at = os.path.getmtime(path)
+            if time.time() - written_at <= self.ttl_seconds:
+                frame = pd.read_pickle(path, compression='gzip')
+                os.utime(path, (time.time(), written_at))
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[JOBSPY] Dropping unreadable cache entry {key}: {str(e)}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+        with self._lock:
+            if frame is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return frame
+
+    def put(self, key: str, frame: Optional[pd.DataFrame]):
+        """Store a frame (None is stored as an empty frame) and evict down to max_bytes"""
+        frame = pd.DataFrame() if frame is None else frame
+        path = self._path(key)
+        # Written under a temporary name and renamed, so readers never see a partial file
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(handle)
+        try:
+            frame.to_pickle(temp_path, compression='gzip')
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"[JOBSPY] Could not cache query {key}: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        with self._lock:
+            self.writes += 1
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as listing:
+            for entry in listing:
+                if not entry.name.endswith(CACHE_SUFFIX):
+                    continue
+                try:
+                    info = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((info.st_atime, info.st_size, entry.path))
+                total += info.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes,
+            'evictions': self.evictions,
+            'bypass': self.bypass,
+        }
@@ -0,0 +1,682 @@
+"""
+Database helpers shared by the JobSpy scrapers
+A retrying connection pool, batched writes built on psycopg2.extras.execute_values,
+and a streaming writer that flushes them as rows arrive
+"""
+
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+from psycopg2.extras import execute_values
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_QUEUE_SIZE = 4
+# Keys per generation of the StreamingWriter duplicate window (it holds at most two generations)
+DEFAULT_SEEN_KEYS = 100000
+
+DEFAULT_POOL_SIZE = int(os.environ.get('JOBSPY_DB_POOL_SIZE', 4))
+DEFAULT_STATEMENT_TIMEOUT_MS = int(os.environ.get('JOBSPY_DB_STATEMENT_TIMEOUT_MS', 120000))
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_CONNECT_RETRIES = 5
+DEFAULT_ACQUIRE_TIMEOUT = 60
+# TCP keepalives make a silently dropped connection fail within about a minute instead of hanging
+KEEPALIVE_OPTIONS = {'keepalives': 1, 'keepalives_idle': 30, 'keepalives_interval': 10, 'keepalives_count': 3}
+
+T = TypeVar('T')
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter for the given (0-based) retry attempt"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def connection_lost(conn) -> bool:
+    """Whether a connection can no longer be used, as opposed to a failed statement on a live one"""
+    return bool(conn.closed) or conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    """Cursor that reports each round trip it makes (statements, and fetches of a named cursor) to its connection"""
+
+    def _count(self):
+        counter = getattr(self.connection, 'count_round_trip', None)
+        if counter is not None:
+            counter()
+
+    def execute(self, query, vars=None):
+        self._count()
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        self._count()
+        return super().executemany(query, vars_list)
+
+    def fetchmany(self, size=None):
+        if self.name is not None:
+            self._count()
+        return super().fetchmany(self.arraysize if size is None else size)
+
+
+class CountingConnection(psycopg2.extensions.connection):
+    """Connection handing out CountingCursors; the pool that opened it sets count_round_trip"""
+
+    count_round_trip: Optional[Callable[[], None]] = None
+
+
+class DatabasePool:
+    """psycopg2 ThreadedConnectionPool with connect retries, keepalives and a statement timeout.
+
+    Connections are opened on demand up to max_connections, and min_idle of them are
+    kept open between uses so a long-lived worker does not reconnect per run. Opening
+    a connection retries with exponential backoff; getconn() waits for a free slot
+    instead of failing when the pool is exhausted. Connections returned dead are
+    discarded. stats() reports the pool counters, including the database round trips
+    made through the pool's connections.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        max_connections: int = DEFAULT_POOL_SIZE,
+        min_idle: int = 1,
+        statement_timeout_ms: int = DEFAULT_STATEMENT_TIMEOUT_MS,
+        connect_timeout: int = DEFAULT_CONNECT_TIMEOUT,
+        retries: int = DEFAULT_CONNECT_RETRIES,
+        acquire_timeout: float = DEFAULT_ACQUIRE_TIMEOUT,
+    ):
+        self.dsn = dsn
+        self.max_connections = max(1, int(max_connections))
+        self.min_idle = max(0, min(int(min_idle), self.max_connections))
+        self.retries = max(0, int(retries))
+        self.acquire_timeout = acquire_timeout
+        self.connect_options = {
+            'connect_timeout': connect_timeout,
+            'options': f'-c statement_timeout={int(statement_timeout_ms)}',
+            'connection_factory': CountingConnection,
+            'cursor_factory': CountingCursor,
+            **KEEPALIVE_OPTIONS,
+        }
+        self.counters = {
+            'connects': 0, 'reuses': 0, 'discarded': 0, 'connect_failures': 0,
+            'batch_retries': 0, 'waits': 0, 'wait_seconds': 0.0, 'round_trips': 0,
+        }
+        self.in_use = 0
+        # ScrapeMetrics of the current run, if any; every batch run through a session is timed into it
+        self.metrics = None
+        self._pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+        self._open = set()  # id() of every connection the pool has handed out and not closed
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._lock = threading.Lock()
+
+    def getconn(self):
+        """A live connection from the pool, retrying with backoff while the database is unreachable"""
+        started = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            if not self._slots.acquire(timeout=self.acquire_timeout):
+                raise psycopg2.pool.PoolError(f"no database connection free after {self.acquire_timeout}s")
+            with self._lock:
+                self.counters['waits'] += 1
+                self.counters['wait_seconds'] += time.monotonic() - started
+
+        try:
+            conn = self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_use += 1
+        return conn
+
+    def _connect(self):
+        attempt = 0
+        while True:
+            try:
+                with self._lock:
+                    if self._pool is None:
+                        # The pool opens its min_idle connections right away, so it is created on first use
+                        self._pool = psycopg2.pool.ThreadedConnectionPool(
+                            self.min_idle, self.max_connections, self.dsn, **self.connect_options
+                        )
+                    pool = self._pool
+                conn = pool.getconn()
+            except psycopg2.OperationalError as e:
+                with self._lock:
+                    self.counters['connect_failures'] += 1
+                if attempt >= self.retries:
+                    raise
+                delay = backoff_delay(attempt)
+                print(f"[JOBSPY] Database connection failed ({str(e).strip()}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            with self._lock:
+                if connection_lost(conn):
+                    pool.putconn(conn, close=True)
+                    self._open.discard(id(conn))
+                    self.counters['discarded'] += 1
+                    continue
+                if id(conn) in self._open:
+                    self.counters['reuses'] += 1
+                else:
+                    self._open.add(id(conn))
+                    self.counters['connects'] += 1
+                    conn.count_round_trip = self._count_round_trip
+            return conn
+
+    def putconn(self, conn):
+        """Return a connection; open transactions are rolled back and dead connections dropped"""
+        with self._lock:
+            try:
+                if self._pool is None:
+                    conn.close()
+                elif connection_lost(conn):
+                    self.counters['discarded'] += 1
+                    self._pool.putconn(conn, close=True)
+                else:
+                    self._pool.putconn(conn)
+            except psycopg2.Error:
+                # Rolling back failed, so the connection is unusable after all
+                self.counters['discarded'] += 1
+                self._pool.putconn(conn, close=True)
+            if conn.closed:
+                self._open.discard(id(conn))
+            self.in_use -= 1
+        self._slots.release()
+
+    def session(self) -> 'DatabaseSession':
+        return DatabaseSession(self)
+
+    def _count_round_trip(self):
+        with self._lock:
+            self.counters['round_trips'] += 1
+
+    def count_batch_retry(self):
+        with self._lock:
+            self.counters['batch_retries'] += 1
+
+    def closeall(self):
+        with self._lock:
+            if self._pool is not None and not self._pool.closed:
+                self._pool.closeall()
+            self._pool = None
+            self._open.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.counters,
+                'wait_seconds': round(self.counters['wait_seconds'], 3),
+                'in_use': self.in_use,
+                'idle': len(self._open) - self.in_use,
+                'max_connections': self.max_connections,
+            }
+
+
+class DatabaseSession:
+    """One connection checked out of a DatabasePool, replaced when the server side goes away.
+
+    Exposes the cursor/commit/rollback/close subset of a psycopg2 connection, so the
+    batch helpers below and StreamingWriter accept either. run_batch() is where the
+    recovery happens: each batch runs under a savepoint, a failing statement only
+    rolls back its own batch, and a batch interrupted by a dropped connection is
+    retried on a fresh connection. close() hands the connection back to the pool.
+    Wrapping a plain connection (pool=None) gives savepoints but no reconnection.
+    """
+
+    def __init__(self, pool: Optional[DatabasePool], connection=None):
+        self.pool = pool
+        self.closed = False
+        self._conn = connection if connection is not None else pool.getconn()
+
+    @property
+    def connection(self):
+        if self.closed:
+            raise psycopg2.InterfaceError("database session is closed")
+        if self._conn is None or (self.pool is not None and connection_lost(self._conn)):
+            self._replace()
+        return self._conn
+
+    def _replace(self):
+        if self._conn is not None:
+            self.pool.putconn(self._conn)
+            self._conn = None
+        self._conn = self.pool.getconn()
+
+    def cursor(self, *args, **kwargs):
+        return self.connection.cursor(*args, **kwargs)
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        if self._conn is not None and not self._conn.closed:
+            self._conn.rollback()
+
+    @staticmethod
+    def _undo_batch(conn, cursor):
+        """Undo only this batch; the connection stays usable for the next one"""
+        try:
+            cursor.execute('ROLLBACK TO SAVEPOINT jobspy_batch')
+            conn.commit()
+        except psycopg2.Error:
+            # The savepoint is gone when the failure was the commit itself
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+
+    def run_batch(self, work: Callable[[Any], T], rows: int = 0) -> T:
+        """Run work(cursor) as one committed batch of `rows` rows, retrying it on a new connection if the old one drops"""
+        metrics = self.pool.metrics if self.pool is not None else None
+        attempt = 0
+        while True:
+            conn = self.connection
+            cursor = conn.cursor()
+            started = time.perf_counter()
+            try:
+                cursor.execute('SAVEPOINT jobspy_batch')
+                result = work(cursor)
+                cursor.execute('RELEASE SAVEPOINT jobspy_batch')
+                conn.commit()
+                if metrics is not None:
+                    metrics.observe_stage('db_batch', time.perf_counter() - started, rows)
+                return result
+            except psycopg2.Error:
+                if metrics is not None:
+                    metrics.count('db_batch_failures')
+                if not connection_lost(conn):
+                    self._undo_batch(conn, cursor)
+                    raise
+                if self.pool is None or attempt >= self.pool.retries:
+                    raise
+                delay = backoff_delay(attempt)
+                print(f"[JOBSPY] Database connection lost mid-batch, retrying in {delay:.1f}s")
+                self.pool.count_batch_retry()
+                time.sleep(delay)
+                attempt += 1
+            except BaseException:
+                # A bug in work() or an interrupt must not leave the batch half-applied on a pooled connection
+                if metrics is not None:
+                    metrics.count('db_batch_failures')
+                if not conn.closed:
+                    self._undo_batch(conn, cursor)
+                raise
+            finally:
+                if not cursor.closed:
+                    try:
+                        cursor.close()
+                    except psycopg2.Error:
+                        pass
+
+    def close(self):
+        """Return the connection to the pool (a wrapped plain connection is left to its owner)"""
+        if self.closed:
+            return
+        self.closed = True
+        if self.pool is not None and self._conn is not None:
+            self.pool.putconn(self._conn)
+        self._conn = None
+
+
+def as_session(conn) -> DatabaseSession:
+    return conn if isinstance(conn, DatabaseSession) else DatabaseSession(None, conn)
+
+
+def chunked(items: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    """Split a sequence into consecutive slices of at most `size` items"""
+    size = max(1, int(size))
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def empty_save_stats() -> Dict[str, int]:
+    return {'inserted': 0, 'updated': 0, 'skipped': 0, 'failed': 0}
+
+
+def _dedupe_by_key(rows: Sequence[Tuple], key_positions: List[int]) -> Tuple[List[Tuple], int]:
+    """Keep the first row per key; ON CONFLICT DO UPDATE cannot touch a row twice in one statement"""
+    seen = set()
+    unique_rows = []
+    for row in rows:
+        key = tuple(row[i] for i in key_positions)
+        if key in seen:
+            continue
+        seen.add(key)
+        unique_rows.append(row)
+    return unique_rows, len(rows) - len(unique_rows)
+
+
+def upsert_rows(
+    conn,
+    table: str,
+    columns: Sequence[str],
+    rows: Sequence[Tuple],
+    conflict_columns: Sequence[str],
+    update_columns: Optional[Sequence[str]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    returning: Sequence[str] = (),
+    on_inserted: Optional[Callable[[Any, List[Tuple]], None]] = None,
+) -> Dict[str, int]:
+    """Insert rows in chunks with ON CONFLICT DO NOTHING (or DO UPDATE when update_columns is given).
+
+    Each chunk is one INSERT statement and one commit, run through DatabaseSession.run_batch.
+    A failing chunk is rolled back and counted as failed without losing the chunks
+    already committed. on_inserted(cursor, rows) runs inside each chunk's transaction
+    with the `returning` columns of the rows the chunk newly inserted.
+    """
+    stats = empty_save_stats()
+    rows, duplicates = _dedupe_by_key(rows, [list(columns).index(c) for c in conflict_columns])
+    stats['skipped'] += duplicates
+
+    if update_columns:
+        assignments = ', '.join(f"{col} = EXCLUDED.{col}" for col in update_columns)
+        conflict_action = f"DO UPDATE SET {assignments}"
+    else:
+        conflict_action = "DO NOTHING"
+
+    # xmax is 0 only for freshly inserted tuples, which separates inserts from updates
+    query = f"""
+        INSERT INTO {table} ({', '.join(columns)})
+        VALUES %s
+        ON CONFLICT ({', '.join(conflict_columns)}) {conflict_action}
+        RETURNING {', '.join(['(xmax = 0) AS inserted', *returning])}
+    """
+
+    def write_chunk(cursor, chunk):
+        results = execute_values(cursor, query, chunk, page_size=len(chunk), fetch=True)
+        new_rows = [tuple(result[1:]) for result in results if result[0]]
+        if on_inserted is not None and new_rows:
+            on_inserted(cursor, new_rows)
+        return results
+
+    session = as_session(conn)
+    for chunk in chunked(rows, batch_size):
+        try:
+            results = session.run_batch(lambda cursor: write_chunk(cursor, chunk), rows=len(chunk))
+        except psycopg2.Error as e:
+            print(f"[JOBSPY] Batch write to {table} failed ({len(chunk)} rows): {str(e)}")
+            stats['failed'] += len(chunk)
+            continue
+
+        inserted = sum(1 for result in results if result[0])
+        stats['inserted'] += inserted
+        stats['updated'] += len(results) - inserted
+        stats['skipped'] += len(chunk) - len(results)
+
+    return stats
+
+
+def insert_rows(
+    conn,
+    table: str,
+    columns: Sequence[str],
+    rows: Sequence[Tuple],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Dict[str, int]:
+    """Plain multi-row INSERT in chunks, for rows already known not to be stored"""
+    stats = empty_save_stats()
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s"
+
+    session = as_session(conn)
+    for chunk in chunked(rows, batch_size):
+        try:
+            session.run_batch(lambda cursor: execute_values(cursor, query, chunk, page_size=len(chunk)), rows=len(chunk))
+        except psycopg2.Error as e:
+            print(f"[JOBSPY] Batch write to {table} failed ({len(chunk)} rows): {str(e)}")
+            stats['failed'] += len(chunk)
+            continue
+        stats['inserted'] += len(chunk)
+
+    return stats
+
+
+def insert_missing_rows(
+    conn,
+    table: str,
+    columns: Sequence[str],
+    rows: Sequence[Tuple],
+    key_columns: Sequence[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Dict[str, int]:
+    """Insert rows whose key is not yet in the table, for tables without a unique constraint.
+
+    Costs two round trips per chunk: one keyed lookup and one multi-row INSERT.
+    """
+    stats = empty_save_stats()
+    key_positions = [list(columns).index(c) for c in key_columns]
+    rows, duplicates = _dedupe_by_key(rows, key_positions)
+    stats['skipped'] += duplicates
+
+    key_list = ', '.join(key_columns)
+    lookup_query = f"SELECT {key_list} FROM {table} WHERE ({key_list}) IN (VALUES %s)"
+    insert_query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s"
+
+    def write_chunk(cursor, chunk):
+        keys = [tuple(row[i] for i in key_positions) for row in chunk]
+        existing = set(execute_values(cursor, lookup_query, keys, page_size=len(keys), fetch=True))
+        new_rows = [row for row, key in zip(chunk, keys) if key not in existing]
+        if new_rows:
+            execute_values(cursor, insert_query, new_rows, page_size=len(new_rows))
+        return len(new_rows)
+
+    session = as_session(conn)
+    for chunk in chunked(rows, batch_size):
+        try:
+            inserted = session.run_batch(lambda cursor: write_chunk(cursor, chunk), rows=len(chunk))
+        except psycopg2.Error as e:
+            print(f"[JOBSPY] Batch write to {table} failed ({len(chunk)} rows): {str(e)}")
+            stats['failed'] += len(chunk)
+            continue
+
+        stats['inserted'] += inserted
+        stats['skipped'] += len(chunk) - inserted
+
+    return stats
+
+
+def update_rows(
+    conn,
+    table: str,
+    key_column: str,
+    columns: Sequence[str],
+    rows: Sequence[Tuple],
+    column_types: Optional[Dict[str, str]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Dict[str, int]:
+    """Apply per-row updates in chunks with UPDATE ... FROM (VALUES ...).
+
+    Each row is (key, value_for_columns[0], value_for_columns[1], ...). column_types adds
+    casts to the VALUES list, which Postgres needs for NULLs, arrays and timestamps.
+    """
+    stats = {'updated': 0, 'failed': 0}
+    column_types = column_types or {}
+    all_columns = [key_column] + list(columns)
+    template = '(' + ', '.join(
+        f"%s::{column_types[col]}" if col in column_types else '%s' for col in all_columns
+    ) + ')'
+    assignments = ', '.join(f"{col} = v.{col}" for col in columns)
+    query = f"""
+        UPDATE {table} AS t SET {assignments}
+        FROM (VALUES %s) AS v({', '.join(all_columns)})
+        WHERE t.{key_column} = v.{key_column}
+    """
+
+    def update_chunk(cursor, chunk):
+        execute_values(cursor, query, chunk, template=template, page_size=len(chunk))
+        return cursor.rowcount
+
+    session = as_session(conn)
+    for chunk in chunked(rows, batch_size):
+        try:
+            stats['updated'] += session.run_batch(lambda cursor: update_chunk(cursor, chunk), rows=len(chunk))
+        except psycopg2.Error as e:
+            print(f"[JOBSPY] Batch update of {table} failed ({len(chunk)} rows): {str(e)}")
+            stats['failed'] += len(chunk)
+
+    return stats
+
+
+_END_OF_STREAM = object()
+# How long put() waits on a full queue before checking that the writer thread is still alive
+_PUT_POLL_SECONDS = 1.0
+
+
+class StreamingWriter:
+    """Writes rows to the database on a background thread while they are still being scraped.
+
+    put() hands over a batch of row tuples through a bounded queue, so a slow database
+    makes the producer wait instead of letting rows pile up in memory. Rows are
+    deduplicated on key_positions against the last seen_limit to 2 * seen_limit keys, so
+    the key set stays bounded too; an older duplicate is left to write_batch, whose
+    ON CONFLICT or key lookup handles it. A batch never holds the same key twice, as
+    seen_limit is at least batch_size. Rows are flushed every batch_size
+    rows through write_batch(conn, rows), which commits on its own; whatever was
+    flushed before a crash stays written. close() flushes the remainder and returns
+    the combined save stats. on_flush(rows, batch_stats) runs on the writer thread after
+    every flush, e.g. to record which rows are now stored. Rows put() with a tag are
+    tracked together: once the last of them has been flushed, on_stored(tag, written, failed)
+    runs on the writer thread, also for a tagged put with no rows left to write.
+    If the writer thread dies, the next put() or close() re-raises its exception
+    instead of blocking on a queue nobody drains.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        write_batch: Callable[[Any, List[Tuple]], Dict[str, int]],
+        key_positions: Sequence[int],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        release: Optional[Callable[[Any], None]] = None,
+        on_flush: Optional[Callable[[List[Tuple], Dict[str, int]], None]] = None,
+        on_stored: Optional[Callable[[Any, int, bool], None]] = None,
+        seen_limit: int = DEFAULT_SEEN_KEYS,
+    ):
+        self.connect = connect
+        self.write_batch = write_batch
+        self.release = release or (lambda conn: conn.close())
+        self.on_flush = on_flush
+        self.on_stored = on_stored
+        self.key_positions = list(key_positions)
+        self.batch_size = max(1, int(batch_size))
+        self.stats = empty_save_stats()
+        self.flushes = 0
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.seen_limit = max(self.batch_size, int(seen_limit))
+        self._seen = set()
+        self._seen_before = set()
+        self._conn = None
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name='jobspy-writer', daemon=True)
+        self._thread.start()
+
+    def put(self, rows: Iterable[Tuple], tag: Any = None):
+        """Queue rows for writing, blocking while the queue is full"""
+        rows = list(rows)
+        if rows or tag is not None:
+            self._offer((rows, tag))
+
+    def close(self) -> Dict[str, int]:
+        """Flush everything still queued, close the connection and return the save stats"""
+        if self._thread.is_alive():
+            self._offer(_END_OF_STREAM)
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self.stats
+
+    def _offer(self, item):
+        while True:
+            if not self._thread.is_alive():
+                if self._error is not None:
+                    raise self._error
+                raise RuntimeError("streaming writer is closed")
+            try:
+                self._queue.put(item, timeout=_PUT_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def _run(self):
+        buffer: List[Tuple] = []
+        # The tag entry of each buffered row (None for untagged rows)
+        owners: List[Optional[Dict[str, Any]]] = []
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _END_OF_STREAM:
+                    break
+                rows, tag = item
+                entry = {'tag': tag, 'pending': 0, 'written': 0, 'failed': False} if tag is not None else None
+                for row in rows:
+                    key = tuple(row[i] for i in self.key_positions)
+                    if key in self._seen or key in self._seen_before:
+                        self.stats['skipped'] += 1
+                        continue
+                    if len(self._seen) >= self.seen_limit:
+                        self._seen_before = self._seen
+                        self._seen = set()
+                    self._seen.add(key)
+                    buffer.append(row)
+                    owners.append(entry)
+                    if entry is not None:
+                        entry['pending'] += 1
+                if entry is not None and not entry['pending']:
+                    self._stored(entry)
+                while len(buffer) >= self.batch_size:
+                    self._flush(buffer[:self.batch_size], owners[:self.batch_size])
+                    buffer = buffer[self.batch_size:]
+                    owners = owners[self.batch_size:]
+            if buffer:
+                self._flush(buffer, owners)
+        except BaseException as e:
+            self._error = e
+        finally:
+            if self._conn is not None:
+                self.release(self._conn)
+                self._conn = None
+
+    def _flush(self, rows: List[Tuple], owners: List[Optional[Dict[str, Any]]]):
+        try:
+            if self._conn is None or self._conn.closed:
+                self._conn = self.connect()
+            batch_stats = self.write_batch(self._conn, rows)
+        except Exception as e:
+            print(f"[JOBSPY] Streaming write failed ({len(rows)} rows): {str(e)}")
+            batch_stats = {'failed': len(rows)}
+            if self._conn is not None and self._conn.closed:
+                self._conn = None
+        for name, count in batch_stats.items():
+            self.stats[name] = self.stats.get(name, 0) + count
+        self.flushes += 1
+        if self.on_flush is not None:
+            try:
+                self.on_flush(rows, batch_stats)
+            except Exception as e:
+                print(f"[JOBSPY] Flush callback failed: {str(e)}")
+        # A failed batch counts against every tag that had rows in it
+        failed = bool(batch_stats.get('failed'))
+        for entry in owners:
+            if entry is None:
+                continue
+            entry['pending'] -= 1
+            entry['failed'] = entry['failed'] or failed
+            entry['written'] += 0 if failed else 1
+            if not entry['pending']:
+                self._stored(entry)
+
+    def _stored(self, entry: Dict[str, Any]):
+        if self.on_stored is None:
+            return
+        try:
+            self.on_stored(entry['tag'], entry['written'], entry['failed'])
+        except Exception as e:
+            print(f"[JOBSPY] Stored callback failed: {str(e)}")
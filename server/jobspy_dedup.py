@@ -0,0 +1,319 @@
+"""
+Duplicate detection for the JobSpy scrapers
+An in-memory index of the keys a table already holds, loaded in one streamed query,
+and a MinHash/LSH index that catches the same posting scraped from different sites
+"""
+
+import hashlib
+import math
+import re
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_WINDOW_DAYS = 60
+# Past this many keys the exact index (8 bytes per key) gives way to a Bloom filter (~1.2 bytes per key at 1%)
+BLOOM_THRESHOLD = 2_000_000
+DEFAULT_FALSE_POSITIVE_RATE = 0.01
+LOAD_CHUNK_SIZE = 50_000
+
+# 64 permutations split into 16 bands of 4 rows: pairs at 0.7 similarity share a band ~99% of the time
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+DEFAULT_HEADLINE_THRESHOLD = 0.7
+DEFAULT_DESCRIPTION_THRESHOLD = 0.5
+# Descriptions shorter than this (after normalization) are placeholders or teasers and are not compared
+MIN_DESCRIPTION_CHARS = 200
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+_HEADLINE_ABBREVIATIONS = {'sr': 'senior', 'jr': 'junior', 'mgr': 'manager', 'eng': 'engineer', 'dev': 'developer'}
+# Titles that differ in level ("Engineer II" vs "Engineer III", "Senior" vs "Staff") are different jobs
+_LEVEL_WORDS = {
+    'intern', 'junior', 'associate', 'senior', 'lead', 'principal', 'staff', 'head', 'chief',
+    'i', 'ii', 'iii', 'iv', 'v', '1', '2', '3', '4', '5',
+}
+_COMPANY_SUFFIXES = {'the', 'inc', 'llc', 'ltd', 'limited', 'corp', 'corporation', 'co', 'gmbh', 'pvt', 'private', 'plc', 'sa', 'ag'}
+
+
+def key_digests(keys: Sequence[Tuple]) -> Tuple[np.ndarray, np.ndarray]:
+    """Two independent 64-bit hashes per key tuple; the first doubles as the exact-index fingerprint"""
+    raw = b''.join(
+        hashlib.blake2b('\x1f'.join('' if part is None else str(part) for part in key).encode('utf-8'), digest_size=16).digest()
+        for key in keys
+    )
+    pairs = np.frombuffer(raw, dtype=np.uint64).reshape(-1, 2) if raw else np.empty((0, 2), dtype=np.uint64)
+    return pairs[:, 0], pairs[:, 1]
+
+
+class BloomFilter:
+    """Bloom filter over key_digests() pairs, probed with double hashing (h1 + i * h2)"""
+
+    def __init__(self, capacity: int, false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE):
+        capacity = max(1, int(capacity))
+        self.size = max(64, int(math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2))))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, h1: np.ndarray, h2: np.ndarray) -> np.ndarray:
+        steps = np.arange(self.hash_count, dtype=np.uint64)
+        # uint64 arithmetic wraps around, which is fine for hashing
+        return (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.size)
+
+    def add(self, h1: np.ndarray, h2: np.ndarray):
+        positions = self._positions(h1, h2).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3), np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+
+    def contains(self, h1: np.ndarray, h2: np.ndarray) -> np.ndarray:
+        positions = self._positions(h1, h2)
+        present = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return present.all(axis=1) if len(positions) else np.zeros(0, dtype=bool)
+
+
+class ExistingKeyIndex:
+    """Keys already stored in a table, for filtering rows in memory before a bulk insert.
+
+    Up to bloom_threshold keys are kept exactly as a sorted array of 64-bit fingerprints
+    (a fingerprint collision between two different postings is around 1 in 10^7 at a
+    million keys). Larger tables use a Bloom filter instead, whose hits are only
+    "maybe stored" and must be confirmed against the database. Misses are always
+    definitely new.
+    """
+
+    def __init__(
+        self,
+        expected_keys: int = 0,
+        bloom_threshold: int = BLOOM_THRESHOLD,
+        false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE,
+    ):
+        self.exact = expected_keys <= bloom_threshold
+        self.key_count = 0
+        self.known_hits = 0
+        self.maybe_hits = 0
+        self.misses = 0
+        self._sorted = np.empty(0, dtype=np.uint64)
+        self._pending: List[np.ndarray] = []
+        # Headroom so keys added during the run do not push the false positive rate up
+        self._bloom = None if self.exact else BloomFilter(int(expected_keys * 1.25), false_positive_rate)
+
+    @classmethod
+    def load(
+        cls,
+        conn,
+        table: str,
+        key_columns: Sequence[str],
+        since_column: Optional[str] = None,
+        window_days: Optional[float] = DEFAULT_WINDOW_DAYS,
+        bloom_threshold: int = BLOOM_THRESHOLD,
+    ) -> 'ExistingKeyIndex':
+        """Index the keys of rows whose since_column falls within window_days (all rows when no window)"""
+        where, params = '', ()
+        if since_column and window_days:
+            where, params = f"WHERE {since_column} >= %s", (datetime.now() - timedelta(days=window_days),)
+
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT count(*) FROM {table} {where}", params)
+        (expected,) = cursor.fetchone()
+        cursor.close()
+
+        index = cls(expected, bloom_threshold=bloom_threshold)
+        # Streamed through a server-side cursor so only one chunk of raw keys is in memory at a time
+        cursor = conn.cursor(name='jobspy_key_index')
+        cursor.itersize = LOAD_CHUNK_SIZE
+        try:
+            cursor.execute(f"SELECT {', '.join(key_columns)} FROM {table} {where}", params)
+            while True:
+                chunk = cursor.fetchmany(LOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                index.add(chunk)
+        finally:
+            cursor.close()
+            conn.commit()
+        index.compact()
+        return index
+
+    def add(self, keys: Sequence[Tuple]):
+        h1, h2 = key_digests(keys)
+        if self.exact:
+            self._pending.append(h1)
+        else:
+            self._bloom.add(h1, h2)
+        self.key_count += len(keys)
+
+    def compact(self):
+        """Merge keys added since the last lookup into the sorted fingerprint array"""
+        if self._pending:
+            self._sorted = np.unique(np.concatenate([self._sorted, *self._pending]))
+            self._pending = []
+
+    def split(self, rows: Sequence[Tuple], key_positions: Sequence[int]) -> Tuple[List[Tuple], List[Tuple], int]:
+        """(definitely new rows, rows that may already be stored, count of rows known to be stored)"""
+        if not rows:
+            return [], [], 0
+        h1, h2 = key_digests([tuple(row[i] for i in key_positions) for row in rows])
+        if self.exact:
+            self.compact()
+            present = np.isin(h1, self._sorted, assume_unique=False)
+        else:
+            present = self._bloom.contains(h1, h2)
+
+        new_rows = [row for row, hit in zip(rows, present) if not hit]
+        hit_rows = [row for row, hit in zip(rows, present) if hit]
+        self.misses += len(new_rows)
+        if self.exact:
+            self.known_hits += len(hit_rows)
+            return new_rows, [], len(hit_rows)
+        self.maybe_hits += len(hit_rows)
+        return new_rows, hit_rows, 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'mode': 'exact' if self.exact else 'bloom',
+            'keys': self.key_count,
+            'bytes': int(self._sorted.nbytes + sum(p.nbytes for p in self._pending)) if self.exact else int(self._bloom.bits.nbytes),
+            'known_hits': self.known_hits,
+            'maybe_hits': self.maybe_hits,
+            'misses': self.misses,
+        }
+
+
+def normalize_words(text: Any) -> List[str]:
+    """Lowercased alphanumeric words of a text, with HTML tags removed"""
+    return _NON_WORD_RE.sub(' ', _TAG_RE.sub(' ', str(text or '')).lower()).split()
+
+
+class MinHasher:
+    """MinHash signatures of shingle sets, using multiply-shift hashing over 32-bit shingle hashes"""
+
+    def __init__(self, permutations: int = MINHASH_PERMUTATIONS, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        # Odd multipliers keep multiply-shift a proper universal hash; uint64 products wrap around by design
+        self.a = rng.integers(1, 2 ** 63, size=permutations, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, size=permutations, dtype=np.uint64)
+        self.permutations = permutations
+
+    def signature(self, shingles: Sequence[str]) -> Optional[np.ndarray]:
+        if not shingles:
+            return None
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in set(shingles)), dtype=np.uint64)
+        return ((hashes[:, None] * self.a[None, :] + self.b[None, :]) >> np.uint64(32)).min(axis=0)
+
+
+class NearDuplicateIndex:
+    """Streaming near-duplicate detection for postings of one run, in roughly linear time.
+
+    Each posting gets two MinHash signatures: one over character 3-grams of its title and
+    company (with common abbreviations and company suffixes normalized), and one over
+    word 3-shingles of its description. Headline signatures are banded into an LSH
+    table keyed together with the location, the company's first significant word and
+    the title's seniority words, so only postings of the same employer and level in the
+    same place that share a band are ever compared. A candidate is a duplicate when the estimated
+    headline similarity reaches headline_threshold and, if both postings have a real
+    description, the description similarity reaches description_threshold.
+
+    match() returns the id of the earlier posting a new one duplicates, or None after
+    adding it to the index, so the first copy seen is the one kept.
+    """
+
+    def __init__(
+        self,
+        headline_threshold: float = DEFAULT_HEADLINE_THRESHOLD,
+        description_threshold: float = DEFAULT_DESCRIPTION_THRESHOLD,
+        permutations: int = MINHASH_PERMUTATIONS,
+        bands: int = LSH_BANDS,
+    ):
+        self.headline_threshold = headline_threshold
+        self.description_threshold = description_threshold
+        self.hasher = MinHasher(permutations)
+        self.bands = bands
+        self.rows_per_band = permutations // bands
+        self._buckets: Dict[Tuple, List[int]] = defaultdict(list)
+        self._headlines: List[np.ndarray] = []
+        self._descriptions: List[Optional[np.ndarray]] = []
+        self._labels: List[Any] = []
+        self.checked = 0
+        self.comparisons = 0
+        self.duplicates = 0
+
+    @staticmethod
+    def headline_shingles(title: Any, company: Any) -> List[str]:
+        words = [_HEADLINE_ABBREVIATIONS.get(w, w) for w in normalize_words(title)]
+        words += [w for w in normalize_words(company) if w not in _COMPANY_SUFFIXES]
+        text = ' '.join(words)
+        return [text[i:i + 3] for i in range(max(1, len(text) - 2))] if text else []
+
+    @staticmethod
+    def description_shingles(description: Any) -> List[str]:
+        words = normalize_words(description)
+        if sum(len(w) + 1 for w in words) < MIN_DESCRIPTION_CHARS:
+            return []
+        return [' '.join(words[i:i + 3]) for i in range(len(words) - 2)]
+
+    @staticmethod
+    def company_key(company: Any) -> str:
+        """First significant word of a company name ("The Acme Corp." -> "acme")"""
+        words = [w for w in normalize_words(company) if w not in _COMPANY_SUFFIXES]
+        return words[0] if words else ''
+
+    @staticmethod
+    def level_key(title: Any) -> Tuple[str, ...]:
+        """Seniority words of a title ("Sr. Engineer II" -> ('ii', 'senior'))"""
+        words = (_HEADLINE_ABBREVIATIONS.get(w, w) for w in normalize_words(title))
+        return tuple(sorted({w for w in words if w in _LEVEL_WORDS}))
+
+    @staticmethod
+    def location_key(location: Any) -> str:
+        """First part of a location ("Austin, TX, US" -> "austin"), or 'remote'"""
+        text = str(location or '').lower()
+        if 'remote' in text:
+            return 'remote'
+        return ' '.join(normalize_words(text.split(',')[0]))
+
+    def _similarity(self, left: np.ndarray, right: np.ndarray) -> float:
+        return float(np.count_nonzero(left == right)) / len(left)
+
+    def match(self, title: Any, company: Any, location: Any, description: Any = None, label: Any = None) -> Optional[Any]:
+        """Label of the earlier posting this one duplicates, or None once it has been indexed"""
+        self.checked += 1
+        headline = self.hasher.signature(self.headline_shingles(title, company))
+        if headline is None:
+            return None
+        body = self.hasher.signature(self.description_shingles(description))
+        place = self.location_key(location)
+        employer = self.company_key(company)
+        level = self.level_key(title)
+        band_keys = [
+            (band, place, employer, level, headline[band * self.rows_per_band:(band + 1) * self.rows_per_band].tobytes())
+            for band in range(self.bands)
+        ]
+
+        candidates = {doc for key in band_keys for doc in self._buckets.get(key, ())}
+        for doc in sorted(candidates):
+            self.comparisons += 1
+            if self._similarity(headline, self._headlines[doc]) < self.headline_threshold:
+                continue
+            other_body = self._descriptions[doc]
+            if body is not None and other_body is not None and self._similarity(body, other_body) < self.description_threshold:
+                continue
+            self.duplicates += 1
+            return self._labels[doc]
+
+        doc = len(self._headlines)
+        self._headlines.append(headline)
+        self._descriptions.append(body)
+        self._labels.append(doc if label is None else label)
+        for key in band_keys:
+            self._buckets[key].append(doc)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'checked': self.checked,
+            'indexed': len(self._headlines),
+            'duplicates': self.duplicates,
+            'comparisons': self.comparisons,
+        }
@@ -0,0 +1,570 @@
+"""
+Enrichment engines for JobSpy results
+Skill matching, rule-table classification, location resolution and salary cleaning shared by the per-row helpers
+on JobSpyIntegration and the columnar path that processes a whole DataFrame at once
+"""
+
+import hashlib
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobspy_data')
+SKILLS_FILE = os.environ.get('JOBSPY_SKILLS_FILE', os.path.join(DATA_DIR, 'skills.json'))
+RULES_FILE = os.environ.get('JOBSPY_RULES_FILE', os.path.join(DATA_DIR, 'classification_rules.json'))
+GAZETTEER_FILE = os.environ.get('JOBSPY_GAZETTEER_FILE', os.path.join(DATA_DIR, 'gazetteer.json'))
+MAX_SKILLS = 15
+LOCATION_CACHE_SIZE = 4096
+
+CURRENCY_MAP = {
+    'US': 'USD', 'IN': 'INR', 'GB': 'GBP', 'DE': 'EUR', 'FR': 'EUR',
+    'ES': 'EUR', 'IT': 'EUR', 'NL': 'EUR', 'AU': 'AUD', 'AE': 'AED',
+    'CA': 'CAD', 'CH': 'CHF', 'SE': 'SEK', 'NO': 'NOK', 'DK': 'DKK',
+    'IE': 'EUR', 'AT': 'EUR', 'BE': 'EUR', 'FI': 'EUR', 'PT': 'EUR',
+    'PL': 'PLN', 'CZ': 'CZK', 'SG': 'SGD'
+}
+EUROPE_COUNTRY_CODES = frozenset([
+    'GB', 'DE', 'FR', 'ES', 'IT', 'NL', 'IE', 'SE', 'DK', 'NO', 'FI', 'CH', 'AT', 'BE', 'CZ', 'PL', 'PT'
+])
+CURRENCY_SYMBOLS = {'USD': '$', 'INR': '₹', 'GBP': '£', 'EUR': '€'}
+# scraped_jobs.salary_min/salary_max are Postgres integer columns
+MAX_SALARY_AMOUNT = 2 ** 31 - 1
+# JobSpy's country_indeed value for every country in the gazetteer
+INDEED_COUNTRIES = {
+    'US': 'usa', 'IN': 'india', 'GB': 'uk', 'DE': 'germany', 'FR': 'france', 'ES': 'spain',
+    'IT': 'italy', 'NL': 'netherlands', 'AU': 'australia', 'AE': 'united arab emirates',
+    'CA': 'canada', 'CH': 'switzerland', 'SE': 'sweden', 'NO': 'norway', 'DK': 'denmark',
+    'IE': 'ireland', 'AT': 'austria', 'BE': 'belgium', 'FI': 'finland', 'PT': 'portugal',
+    'PL': 'poland', 'CZ': 'czech republic', 'SG': 'singapore', 'HK': 'hong kong', 'ID': 'indonesia',
+    'JP': 'japan', 'KR': 'south korea', 'MY': 'malaysia', 'PH': 'philippines', 'TH': 'thailand'
+}
+
+
+def text_column(frame: pd.DataFrame, column: str, default: str) -> pd.Series:
+    """Same values as str(row.get(column, default)) for every row, as an object Series"""
+    if column not in frame.columns:
+        return pd.Series([default] * len(frame), index=frame.index, dtype=object)
+    return frame[column].map(str).astype(object)
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """Regex for a set of literals shaped as a character trie, so matching cost
+    depends on the text length rather than on how many terms there are"""
+    trie: Dict[str, dict] = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            # Longer terms are tried first because the optional group is greedy
+            return f"(?:{body})?" if len(branches) == 1 else f"{body}?"
+        return body
+
+    return build(trie)
+
+
+class SkillMatcher:
+    """Finds taxonomy skills in text with one compiled regex scan.
+
+    Terms only match as whole words, so 'Go' no longer fires on "good" or 'AI' on
+    "maintain". case_sensitive applies to an entry's name; aliases always ignore case.
+    """
+
+    def __init__(self, taxonomy: Dict[str, List[Dict]]):
+        self.skills: List[str] = []
+        self._rank: Dict[str, int] = {}
+        self._exact: Dict[str, str] = {}
+        self._folded: Dict[str, str] = {}
+
+        for entries in taxonomy.values():
+            for entry in entries:
+                name = entry['name']
+                if name in self._rank:
+                    continue
+                self._rank[name] = len(self.skills)
+                self.skills.append(name)
+                if entry.get('case_sensitive'):
+                    self._exact[name] = name
+                else:
+                    self._folded.setdefault(name.lower(), name)
+                for alias in entry.get('aliases', []):
+                    self._folded.setdefault(alias.lower(), name)
+
+        alternatives = []
+        if self._folded:
+            alternatives.append(f"(?i:{_trie_pattern(self._folded)})")
+        if self._exact:
+            alternatives.append(_trie_pattern(self._exact))
+        pattern = '(?<!\\w)(?:' + '|'.join(alternatives) + ')(?!\\w)' if alternatives else '(?!)'
+        self.pattern = re.compile(pattern)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'SkillMatcher':
+        with open(path, encoding='utf-8') as handle:
+            return cls(json.load(handle))
+
+    def find(self, text: str, limit: int = MAX_SKILLS) -> List[str]:
+        """Distinct skills mentioned in text, in taxonomy order"""
+        found = set()
+        for match in self.pattern.finditer(text):
+            term = match.group(0)
+            skill = self._exact.get(term) or self._folded.get(term.lower())
+            if skill:
+                found.add(skill)
+        return sorted(found, key=self._rank.__getitem__)[:limit]
+
+    def find_frame(self, text: pd.Series, limit: int = MAX_SKILLS) -> List[List[str]]:
+        """find() for a whole column: one str.findall pass, then matches are ranked and deduplicated with NumPy"""
+        text = text.fillna('').astype(str).reset_index(drop=True)
+        found = text.str.findall(self.pattern).explode().dropna()
+        skill = found.map(self._exact).fillna(found.str.lower().map(self._folded)).dropna()
+
+        # One sorted, deduplicated key per (row, skill), ordered by row and then taxonomy rank
+        ranks = skill.map(self._rank).to_numpy(dtype=np.int64)
+        keys = np.unique(skill.index.to_numpy(dtype=np.int64) * len(self.skills) + ranks)
+        rows, ranks = np.divmod(keys, max(len(self.skills), 1))
+        keep = np.arange(len(rows)) - np.searchsorted(rows, rows) < limit
+        rows, names = rows[keep], np.array(self.skills, dtype=object)[ranks[keep]]
+
+        result: List[List[str]] = [[] for _ in range(len(text))]
+        boundaries = np.flatnonzero(np.diff(rows)) + 1
+        for row, group in zip(rows[np.r_[0, boundaries]] if len(rows) else [], np.split(names, boundaries)):
+            result[row] = group.tolist()
+        return result
+
+
+@lru_cache(maxsize=None)
+def get_skill_matcher(path: str = SKILLS_FILE) -> SkillMatcher:
+    """Process-wide matcher, compiled on first use"""
+    return SkillMatcher.from_file(path)
+
+
+def extract_skills_frame(text: pd.Series) -> List[List[str]]:
+    """Skills per row for title + description text, matched column-wise"""
+    return get_skill_matcher().find_frame(text)
+
+
+class _Rule:
+    __slots__ = ('label', 'priority', 'requires', 'keywords', 'skills')
+
+    def __init__(self, label, priority, requires, keywords, skills):
+        self.label = label
+        self.priority = priority
+        self.requires = frozenset(requires)
+        self.keywords = frozenset(keywords)
+        self.skills = frozenset(skills)
+
+    def matches(self, hits, skills=frozenset()) -> bool:
+        if self.requires and not (self.requires & hits):
+            return False
+        if (self.keywords or self.skills) and not (self.keywords & hits or self.skills & skills):
+            return False
+        return True
+
+
+class RuleClassifier:
+    """Category, subcategory and experience level from one declarative rule table.
+
+    All rule keywords are compiled into a single whole-word regex (plural s/es allowed),
+    so each text is scanned once no matter how many rules exist. Only rules indexed under
+    a keyword that was actually hit are evaluated.
+
+    The category comes from the highest-priority rule satisfied by the title alone, or by
+    title + description if none is. Within that category, rules whose keywords hit the
+    title win, then rules whose keywords or skills hit anywhere, and keyword-less
+    fallback rules last; each tier is ordered by priority. Experience levels likewise
+    prefer the title over the description.
+
+    Matches do not overlap and the longest keyword wins, so "data engineer" is one hit,
+    not also "engineer": a rule that should fire on part of a phrase must list the phrase.
+    """
+
+    def __init__(self, table: Dict):
+        self.category_rules = sorted(
+            (
+                _Rule((rule['category'], rule['subcategory']), rule['priority'],
+                      [k.lower() for k in rule.get('requires', [])],
+                      [k.lower() for k in rule.get('keywords', [])],
+                      rule.get('skills', []))
+                for rule in table['categories']
+            ),
+            key=lambda rule: -rule.priority
+        )
+        self.level_rules = sorted(
+            (
+                _Rule(rule['level'], rule['priority'], [], [k.lower() for k in rule['keywords']], [])
+                for rule in table['experience_levels']
+            ),
+            key=lambda rule: -rule.priority
+        )
+        self.default_category = tuple(table.get('default_category', ('general', 'other')))
+        self.default_level = table.get('default_experience_level', 'mid')
+
+        self._index: Dict[str, List[_Rule]] = {}
+        for rule in self.category_rules + self.level_rules:
+            for key in rule.requires | rule.keywords:
+                self._index.setdefault(key, []).append(rule)
+            for skill in rule.skills:
+                self._index.setdefault(f"skill:{skill}", []).append(rule)
+
+        keywords = [key for key in self._index if not key.startswith('skill:')]
+        self.pattern = re.compile('(?<!\\w)(?:' + _trie_pattern(keywords) + ')(?:e?s)?(?!\\w)', re.IGNORECASE)
+        # Column of each keyword and rule skill in classify_frame's hit matrices
+        self._keyword_columns = {key: i for i, key in enumerate(keywords)}
+        self._skill_columns = {
+            skill: i for i, skill in enumerate(sorted({skill for rule in self.category_rules for skill in rule.skills}))
+        }
+
+    @classmethod
+    def from_file(cls, path: str) -> 'RuleClassifier':
+        with open(path, encoding='utf-8') as handle:
+            return cls(json.load(handle))
+
+    def _hits(self, text: str) -> set:
+        hits = set()
+        for match in self.pattern.finditer(text):
+            term = match.group(0).lower()
+            if term not in self._index:
+                term = term[:-2] if term.endswith('es') and term[:-2] in self._index else term[:-1]
+            hits.add(term)
+        return hits
+
+    @staticmethod
+    def _best(rules: List[_Rule], title_hits: set, all_hits: set, skills: frozenset):
+        """Highest-priority rule satisfied by the title, else by title + description"""
+        best = None
+        for rule in rules:
+            if rule.matches(title_hits):
+                return rule
+            if best is None and rule.matches(all_hits, skills):
+                best = rule
+        return best
+
+    def classify(self, title: str, description: str = '', skills: Iterable[str] = ()) -> Dict[str, str]:
+        """Every classification for one job: category, subcategory and experience_level"""
+        title_hits = self._hits(title or '')
+        all_hits = title_hits | self._hits(description or '')
+        skill_set = frozenset(skills or ())
+
+        candidates = set()
+        for key in all_hits:
+            candidates.update(self._index.get(key, ()))
+        for skill in skill_set:
+            candidates.update(self._index.get(f"skill:{skill}", ()))
+
+        category, subcategory = self.default_category
+        matched = [
+            rule for rule in self.category_rules
+            if rule in candidates and rule.matches(all_hits, skill_set)
+        ]
+        if matched:
+            lead = next((rule for rule in matched if rule.matches(title_hits)), matched[0])
+            pool = [rule for rule in matched if rule.label[0] == lead.label[0]]
+            category, subcategory = (
+                next((rule for rule in pool if rule.keywords and rule.matches(title_hits)), None)
+                or next((rule for rule in pool if rule.keywords or rule.skills), None)
+                or pool[0]
+            ).label
+
+        level_rule = self._best(
+            [rule for rule in self.level_rules if rule in candidates], title_hits, all_hits, skill_set
+        )
+        return {
+            'category': category,
+            'subcategory': subcategory,
+            'experience_level': level_rule.label if level_rule else self.default_level
+        }
+
+    def _hit_matrix(self, text: pd.Series) -> np.ndarray:
+        """Rows x keywords: which keywords each text hits, normalized like _hits()"""
+        hits = np.zeros((len(text), len(self._keyword_columns)), dtype=bool)
+        found = text.str.findall(self.pattern).explode().dropna().str.lower()
+        known = found.isin(self._keyword_columns)
+        stem = found.str[:-2]
+        plural_es = found.str.endswith('es') & stem.isin(self._keyword_columns)
+        term = found.where(known, stem.where(plural_es, found.str[:-1]))
+        columns = term.map(self._keyword_columns)
+        matched = columns.notna().to_numpy()
+        hits[found.index.to_numpy()[matched], columns[matched].astype(int).to_numpy()] = True
+        return hits
+
+    def _skill_matrix(self, skills: List[List[str]]) -> np.ndarray:
+        """Rows x rule skills: which of the skills named by rules each row has"""
+        matrix = np.zeros((len(skills), len(self._skill_columns)), dtype=bool)
+        exploded = pd.Series(list(skills), dtype=object).explode()
+        columns = exploded.map(self._skill_columns)
+        matched = columns.notna().to_numpy()
+        matrix[exploded.index[matched], columns[matched].astype(int).to_numpy()] = True
+        return matrix
+
+    def _rule_masks(self, rules: List[_Rule], title_hits, all_hits, skill_hits):
+        """Rows x rules masks: (candidate and satisfied by title + description, satisfied by the title alone)"""
+        rows = title_hits.shape[0]
+
+        def any_of(matrix, keys, columns):
+            positions = [columns[key] for key in keys if key in columns]
+            return matrix[:, positions].any(axis=1) if positions else np.zeros(rows, dtype=bool)
+
+        matched = np.zeros((rows, len(rules)), dtype=bool)
+        by_title = np.zeros((rows, len(rules)), dtype=bool)
+        for position, rule in enumerate(rules):
+            in_skills = any_of(skill_hits, rule.skills, self._skill_columns)
+            candidate = any_of(all_hits, rule.requires | rule.keywords, self._keyword_columns) | in_skills
+            for target, hits, skill_match in ((matched, all_hits, in_skills), (by_title, title_hits, None)):
+                ok = any_of(hits, rule.requires, self._keyword_columns) if rule.requires else np.ones(rows, dtype=bool)
+                if rule.keywords or rule.skills:
+                    keyword_match = any_of(hits, rule.keywords, self._keyword_columns)
+                    ok &= keyword_match | skill_match if skill_match is not None else keyword_match
+                target[:, position] = ok
+            matched[:, position] &= candidate
+        return matched, by_title
+
+    @staticmethod
+    def _first(mask: np.ndarray) -> np.ndarray:
+        """Per row, the position of the first True (rules are in priority order), or -1"""
+        return np.where(mask.any(axis=1), mask.argmax(axis=1), -1)
+
+    def classify_frame(self, title: pd.Series, description: pd.Series, skills: List[List[str]]) -> pd.DataFrame:
+        """classify() for whole columns: hit matrices from str.findall, rule tiers picked with np.select"""
+        index = title.index
+        title = title.fillna('').astype(str).reset_index(drop=True)
+        description = description.fillna('').astype(str).reset_index(drop=True)
+        title_hits = self._hit_matrix(title)
+        all_hits = title_hits | self._hit_matrix(description)
+        skill_hits = self._skill_matrix(skills)
+
+        matched, by_title = self._rule_masks(self.category_rules, title_hits, all_hits, skill_hits)
+        lead = self._first(matched & by_title)
+        lead = np.where(lead >= 0, lead, self._first(matched))
+        categories = np.array([rule.label[0] for rule in self.category_rules] + [None], dtype=object)
+        pool = matched & (categories[None, :-1] == categories[lead][:, None])
+        has_keywords = np.array([bool(rule.keywords) for rule in self.category_rules], dtype=bool)
+        has_skills = np.array([bool(rule.skills) for rule in self.category_rules], dtype=bool)
+        tiers = [
+            self._first(pool & has_keywords & by_title),
+            self._first(pool & (has_keywords | has_skills)),
+            self._first(pool),
+        ]
+        chosen = np.select([tier >= 0 for tier in tiers], tiers, -1)
+        # Position -1 (no rule matched) picks the default appended last
+        labels = np.array([rule.label for rule in self.category_rules] + [tuple(self.default_category)], dtype=object)
+
+        level_matched, level_by_title = self._rule_masks(self.level_rules, title_hits, all_hits, skill_hits)
+        level = self._first(level_by_title)
+        level = np.where(level >= 0, level, self._first(level_matched))
+        levels = np.array([rule.label for rule in self.level_rules] + [self.default_level], dtype=object)
+
+        return pd.DataFrame(
+            {
+                'category': labels[chosen, 0] if len(title) else [],
+                'subcategory': labels[chosen, 1] if len(title) else [],
+                'experience_level': levels[level],
+            },
+            index=index,
+            columns=['category', 'subcategory', 'experience_level']
+        )
+
+
+@lru_cache(maxsize=None)
+def get_rule_classifier(path: str = RULES_FILE) -> RuleClassifier:
+    """Process-wide classifier, compiled on first use"""
+    return RuleClassifier.from_file(path)
+
+
+class LocationResolver:
+    """Country, region and city for free-text job locations, from a precompiled gazetteer.
+
+    Names are looked up as whole comma-separated parts or whole words, never as substrings,
+    so 'IN' no longer matches inside "Indianapolis". Two-letter codes only count when written
+    in upper case. A code that is both a country and a US state (CA, IN, DE) is read as the
+    state in "City, CA" unless the city is known elsewhere ("Berlin, DE") or a province
+    or state precedes it ("Toronto, ON, CA").
+
+    parse() is memoized per (location, country_code) in a bounded LRU cache; stats() reports it.
+    """
+
+    def __init__(self, gazetteer: Dict, cache_size: int = LOCATION_CACHE_SIZE):
+        self._names: Dict[str, str] = {}
+        self._codes: Dict[str, str] = {}
+        self._cities: Dict[str, str] = {}
+        self._regions: Dict[str, str] = {}
+        self._region_codes: Dict[str, str] = {}
+
+        for code, entry in gazetteer['countries'].items():
+            for name in entry.get('names', []):
+                self._names.setdefault(name.lower(), code)
+            for alias in entry.get('codes', []):
+                self._codes.setdefault(alias, code)
+            for city in entry.get('cities', []):
+                self._cities.setdefault(city.lower(), code)
+            for abbreviation, name in entry.get('regions', {}).items():
+                self._region_codes.setdefault(abbreviation, code)
+                self._regions.setdefault(name.lower(), code)
+
+        # Free-text fallback: country names win over regions, regions over cities
+        self._phrases: Dict[str, str] = {}
+        for index in (self._names, self._regions, self._cities):
+            for phrase, code in index.items():
+                self._phrases.setdefault(phrase, code)
+        self._max_words = max((len(phrase.split()) for phrase in self._phrases), default=1)
+
+        self.parse = lru_cache(maxsize=cache_size)(self._parse)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'LocationResolver':
+        with open(path, encoding='utf-8') as handle:
+            return cls(json.load(handle))
+
+    def _scan(self, text: str) -> Optional[str]:
+        """First country named anywhere in the text, longest phrase first at each word"""
+        words = text.split()
+        folded = [word.strip('()[]-–/').lower() for word in words]
+        for start, word in enumerate(words):
+            for length in range(min(self._max_words, len(words) - start), 0, -1):
+                code = self._phrases.get(' '.join(folded[start:start + length]))
+                if code:
+                    return code
+            word = word.strip('()[]-–/')
+            if word in self._codes and word not in self._region_codes:
+                return self._codes[word]
+        return None
+
+    def detect_country(self, location_str: str) -> Optional[str]:
+        """ISO country code named by the location, or None when nothing is recognised"""
+        parts = [part.strip() for part in location_str.split(',') if part.strip()]
+        if not parts:
+            return None
+
+        for part in reversed(parts):
+            code = self._names.get(part.lower())
+            if code:
+                return code
+            if part in self._codes and part not in self._region_codes:
+                return self._codes[part]
+
+        city_country = self._cities.get(parts[0].lower())
+        for position, part in enumerate(parts[1:], start=1):
+            code = self._region_codes.get(part) or self._regions.get(part.lower())
+            if not code:
+                continue
+            if part in self._codes and code != self._codes[part]:
+                if city_country:
+                    return city_country
+                if position >= 2 and position == len(parts) - 1:
+                    return self._codes[part]
+            return code
+
+        return city_country or self._scan(location_str)
+
+    def _parse(self, location_str: str, country_code: str = '') -> Tuple[str, str, str, str]:
+        location_str = location_str.strip()
+        parts = [part.strip() for part in location_str.split(',')]
+        detected_country_code = self.detect_country(location_str) or country_code or 'US'
+
+        if 'remote' in location_str.lower():
+            return detected_country_code, 'Remote', 'Remote', 'Remote'
+
+        city = parts[0].replace(' Area', '').replace(' Metropolitan', '').strip()
+        region = parts[1].replace(' Area', '').replace(' Metropolitan', '').strip() if len(parts) > 1 else ''
+        normalized_location = f"{city}, {region}" if region and city != region else city
+        return detected_country_code, region, city, normalized_location
+
+    def stats(self) -> Dict[str, int]:
+        info = self.parse.cache_info()
+        return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
+
+
+def rules_fingerprint(paths: Iterable[str] = (SKILLS_FILE, RULES_FILE)) -> str:
+    """Short digest of the skill and classification tables, which changes whenever the heuristics do"""
+    digest = hashlib.blake2b(digest_size=8)
+    for path in paths:
+        with open(path, 'rb') as handle:
+            digest.update(handle.read())
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def get_location_resolver(path: str = GAZETTEER_FILE) -> LocationResolver:
+    """Process-wide resolver, indexed on first use"""
+    return LocationResolver.from_file(path)
+
+
+def _format_amount(symbol: str, amount: int) -> str:
+    return f"{symbol}{amount:,}"
+
+
+def salary_amount(value) -> Optional[int]:
+    """Whole amount from a number or numeric string; None when missing or not positive.
+
+    Raises ValueError for text that is not a number and OverflowError for amounts the
+    database column cannot hold, either of which voids the whole salary.
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    amount = float(value)
+    if np.isnan(amount) or amount <= 0:
+        return None
+    if amount > MAX_SALARY_AMOUNT:
+        raise OverflowError(f"salary amount {value!r} out of range")
+    return int(amount)
+
+
+def clean_salary_frame(min_amount: pd.Series, max_amount: pd.Series, country_codes: pd.Series):
+    """Columnar JobSpyIntegration.clean_salary: (salary_range, salary_min, salary_max, currency) lists"""
+    currency = country_codes.map(lambda code: CURRENCY_MAP.get(code, 'USD'))
+    symbol = currency.map(lambda code: CURRENCY_SYMBOLS.get(code, '$'))
+
+    def parse(value):
+        try:
+            return salary_amount(value), False
+        except (ValueError, TypeError, OverflowError):
+            return None, True
+
+    def amounts(raw: pd.Series):
+        if raw.dtype == object:
+            # Text amounts are rare; salary_amount parses them so both paths agree
+            parsed = [parse(value) for value in raw]
+            valid = np.array([amount is not None for amount, _ in parsed], dtype=bool)
+            invalid = np.array([bad for _, bad in parsed], dtype=bool)
+            values = np.array([amount or 0 for amount, _ in parsed], dtype=np.int64)
+            return values, valid, invalid
+        numeric = raw.astype(float)
+        # Amounts past the column's range (including +inf) void the salary, as they do per row
+        invalid = numeric > MAX_SALARY_AMOUNT
+        valid = (numeric > 0) & ~invalid
+        return np.trunc(numeric.where(valid, 0)).astype(np.int64), valid.to_numpy(), invalid.to_numpy()
+
+    mins, has_min, bad_min = amounts(min_amount)
+    maxs, has_max, bad_max = amounts(max_amount)
+    bad = bad_min | bad_max
+    has_min = has_min & ~bad
+    has_max = has_max & ~bad
+
+    salary_range, salary_min, salary_max = [], [], []
+    for sym, lo, hi, ok_lo, ok_hi in zip(symbol, mins, maxs, has_min, has_max):
+        lo = int(lo) if ok_lo else None
+        hi = int(hi) if ok_hi else None
+        if lo and hi:
+            salary_range.append(f"{_format_amount(sym, lo)} - {_format_amount(sym, hi)}")
+        elif lo:
+            salary_range.append(f"{_format_amount(sym, lo)}+")
+        elif hi:
+            salary_range.append(f"Up to {_format_amount(sym, hi)}")
+        else:
+            salary_range.append(None)
+        salary_min.append(lo)
+        salary_max.append(hi)
+
+    return salary_range, salary_min, salary_max, currency.tolist()
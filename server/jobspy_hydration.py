@@ -0,0 +1,304 @@
+"""
+Description hydration for the JobSpy scraper
+Search results from some sites (LinkedIn) carry no description. Newly inserted scraped_jobs rows
+without one are queued, and their job pages are fetched later, concurrently and under the per-site
+rate limits, then re-enriched and written back in batched UPDATEs
+"""
+
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+import psycopg2
+from psycopg2.extras import execute_values
+
+from jobspy_db import DEFAULT_BATCH_SIZE, update_rows
+from jobspy_throttle import SiteRateLimiter
+
+QUEUE_TABLE = 'jobspy_hydration_queue'
+# Stored descriptions shorter than this (or the enrichment placeholder) count as missing
+MIN_DESCRIPTION_CHARS = 40
+PLACEHOLDER_DESCRIPTIONS = frozenset(['', 'no description available', 'nan', 'none'])
+DEFAULT_HYDRATION_SECONDS = 120
+DEFAULT_CLAIM_SIZE = 20
+DEFAULT_MAX_ATTEMPTS = 3
+# A claimed row not finished within this long (the process died) is claimable again
+DEFAULT_LEASE_SECONDS = 900
+
+# Columns rewritten from the fetched page; salary only fills rows that had none
+HYDRATED_COLUMNS = [
+    'description', 'skills', 'tags', 'experience_level', 'category', 'subcategory',
+    'salary_range', 'salary_min', 'salary_max', 'currency', 'updated_at',
+]
+HYDRATED_COLUMN_TYPES = {
+    'id': 'integer', 'description': 'text', 'skills': 'text[]', 'tags': 'text[]', 'experience_level': 'varchar',
+    'category': 'varchar', 'subcategory': 'varchar', 'salary_range': 'varchar', 'salary_min': 'integer',
+    'salary_max': 'integer', 'currency': 'varchar', 'updated_at': 'timestamp',
+}
+
+LINKEDIN_JOB_ID = re.compile(r'/jobs/view/(?:[^/?#]*-)?(\d+)')
+
+
+def description_missing(description: Optional[str]) -> bool:
+    text = (description or '').strip()
+    return text.lower() in PLACEHOLDER_DESCRIPTIONS or len(text) < MIN_DESCRIPTION_CHARS
+
+
+class LinkedInDetails:
+    """Job page details (description, pay) of a LinkedIn posting, via jobspy's LinkedIn scraper.
+
+    jobspy only fetches these inline with a search; the page parser is reused here on its
+    own, with one scraper (and so one HTTP session) per thread.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _scraper(self):
+        scraper = getattr(self._local, 'scraper', None)
+        if scraper is None:
+            from jobspy.linkedin import LinkedIn
+            from jobspy.model import DescriptionFormat, ScraperInput
+            scraper = LinkedIn()
+            # Same format as the search results the rows came from
+            scraper.scraper_input = ScraperInput(description_format=DescriptionFormat.HTML)
+            self._local.scraper = scraper
+        return scraper
+
+    def __call__(self, source_url: str) -> Dict[str, Any]:
+        match = LINKEDIN_JOB_ID.search(source_url or '')
+        if not match:
+            return {}
+        return self._scraper()._fetch_details(match.group(1)) or {}
+
+
+# Sites whose rows are queued for hydration, with the fetcher of their job pages
+DESCRIPTION_FETCHERS: Dict[str, Callable[[], Callable[[str], Dict[str, Any]]]] = {
+    'linkedin': LinkedInDetails,
+}
+
+
+def enqueue_for_hydration(cursor, inserted: Sequence[Tuple[int, str, Optional[str]]]) -> int:
+    """Queue newly inserted (id, source_platform, description) rows that lack a description.
+
+    Runs inside the insert's transaction under its own savepoint, so a missing queue table
+    (migration 0014 not applied yet) costs the queue entries and never the inserted rows.
+    """
+    rows = [
+        (job_id, site) for job_id, site, description in inserted
+        if site in DESCRIPTION_FETCHERS and description_missing(description)
+    ]
+    if not rows:
+        return 0
+    cursor.execute('SAVEPOINT jobspy_hydration')
+    try:
+        execute_values(cursor, f"""
+            INSERT INTO {QUEUE_TABLE} (job_id, source_platform) VALUES %s
+            ON CONFLICT (job_id) DO NOTHING
+        """, rows, page_size=len(rows))
+    except psycopg2.Error as e:
+        cursor.execute('ROLLBACK TO SAVEPOINT jobspy_hydration')
+        print(f"[JOBSPY] Could not queue {len(rows)} jobs for description hydration: {str(e).strip()}")
+        return 0
+    cursor.execute('RELEASE SAVEPOINT jobspy_hydration')
+    return len(rows)
+
+
+class DescriptionHydrator:
+    """Fetches the descriptions of queued jobs and re-enriches them.
+
+    Rows are claimed claim_size at a time with FOR UPDATE SKIP LOCKED, so several
+    hydrating processes can share the queue. Each claimed batch is fetched on up to
+    max_workers threads, every request waiting for a token of its site's rate budget.
+    Hydrated rows go through the scraper's columnar enrichment and are written back
+    with one UPDATE ... FROM (VALUES ...) per batch, then leave the queue. A row whose
+    page could not be read goes back to the queue until it has had max_attempts tries.
+    run() stops claiming once max_seconds have passed, or early when a whole batch
+    fails (the site is most likely blocking us), and leaves the rest for the next run.
+    """
+
+    def __init__(
+        self,
+        scraper,
+        rate_limits: Optional[Dict[str, Dict[str, float]]] = None,
+        max_workers: int = 4,
+        max_seconds: float = DEFAULT_HYDRATION_SECONDS,
+        claim_size: int = DEFAULT_CLAIM_SIZE,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        lease_seconds: int = DEFAULT_LEASE_SECONDS,
+    ):
+        self.scraper = scraper
+        self.limiter = SiteRateLimiter(rate_limits)
+        self.max_workers = max(1, int(max_workers))
+        self.max_seconds = max_seconds
+        self.claim_size = max(1, int(claim_size))
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.fetchers = {site: factory() for site, factory in DESCRIPTION_FETCHERS.items()}
+
+    @classmethod
+    def from_config(cls, scraper, config: Dict[str, Any]) -> Optional['DescriptionHydrator']:
+        """Hydrator configured by a run's 'hydrate_descriptions' option, or None when disabled.
+
+        max_seconds 0 keeps queueing new rows but leaves every fetch to a later run.
+        """
+        options = config.get('hydrate_descriptions', {})
+        if options is False:
+            return None
+        options = options if isinstance(options, dict) else {}
+        if not options.get('enabled', True):
+            return None
+        return cls(
+            scraper,
+            rate_limits=config.get('site_rate_limits'),
+            max_workers=options.get('max_workers', config.get('max_workers', 4)),
+            max_seconds=options.get('max_seconds', DEFAULT_HYDRATION_SECONDS),
+            claim_size=options.get('claim_size', DEFAULT_CLAIM_SIZE),
+            max_attempts=options.get('max_attempts', DEFAULT_MAX_ATTEMPTS),
+        )
+
+    def claim(self, session, limit: int) -> List[Dict[str, Any]]:
+        def claim_rows(cursor):
+            cursor.execute(f"""
+                WITH claimed AS (
+                    UPDATE {QUEUE_TABLE} q
+                    SET status = 'running', attempts = q.attempts + 1, claimed_at = NOW()
+                    WHERE q.job_id IN (
+                        SELECT job_id FROM {QUEUE_TABLE}
+                        WHERE (status = 'pending'
+                               OR (status = 'running' AND claimed_at < NOW() - make_interval(secs => %s)))
+                          AND attempts < %s
+                        ORDER BY enqueued_at
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING q.job_id, q.attempts
+                )
+                SELECT j.id, j.source_platform, j.source_url, j.title, j.company, j.location,
+                       j.salary_range, j.salary_min, j.salary_max, j.currency, c.attempts
+                FROM claimed c JOIN scraped_jobs j ON j.id = c.job_id
+            """, (self.lease_seconds, self.max_attempts, limit))
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        return session.run_batch(claim_rows)
+
+    def fetch(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        fetcher = self.fetchers.get(job['source_platform'])
+        if fetcher is None:
+            return {}
+        self.limiter.bucket(job['source_platform']).acquire()
+        try:
+            return fetcher(job['source_url'])
+        except Exception as e:
+            print(f"[JOBSPY] Could not fetch the description of job {job['id']}: {str(e)}")
+            return {}
+
+    def hydrated_rows(self, jobs: List[Dict[str, Any]], details: List[Dict[str, Any]]) -> List[tuple]:
+        """update_rows() tuples (id, *HYDRATED_COLUMNS) for jobs whose details were fetched"""
+        compensation = [detail.get('compensation') for detail in details]
+        frame = pd.DataFrame({
+            'title': [job['title'] for job in jobs],
+            'company': [job['company'] for job in jobs],
+            'location': [job['location'] for job in jobs],
+            'site': [job['source_platform'] for job in jobs],
+            'job_url': [job['source_url'] for job in jobs],
+            'description': [detail['description'] for detail in details],
+            'min_amount': [pay.min_amount if pay else None for pay in compensation],
+            'max_amount': [pay.max_amount if pay else None for pay in compensation],
+        })
+        records = self.scraper.enrich_jobs_frame(frame)
+
+        now = pd.Timestamp.now().to_pydatetime()
+        rows = []
+        for job, record in zip(jobs, records):
+            salary = (record['salary_range'], record['salary_min'], record['salary_max'], record['currency'])
+            if job['salary_min'] is not None or record['salary_min'] is None:
+                salary = (job['salary_range'], job['salary_min'], job['salary_max'], job['currency'])
+            rows.append((
+                job['id'], record['description'], record['skills'], record['tags'], record['experience_level'],
+                record['category'], record['subcategory'], *salary, now,
+            ))
+        return rows
+
+    def finish(self, session, hydrated: List[int], failed: List[int]):
+        def finish_rows(cursor):
+            if hydrated:
+                cursor.execute(f"DELETE FROM {QUEUE_TABLE} WHERE job_id = ANY(%s)", (hydrated,))
+            if failed:
+                cursor.execute(f"""
+                    UPDATE {QUEUE_TABLE}
+                    SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'pending' END,
+                        error = 'job page could not be read'
+                    WHERE job_id = ANY(%s)
+                """, (self.max_attempts, failed))
+
+        session.run_batch(finish_rows)
+
+    def pending(self, session) -> Optional[int]:
+        def count(cursor):
+            cursor.execute(f"SELECT COUNT(*) FROM {QUEUE_TABLE} WHERE status = 'pending'")
+            return cursor.fetchone()[0]
+
+        try:
+            return session.run_batch(count)
+        except psycopg2.Error:
+            return None
+
+    def run(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Hydrate queued jobs until the queue is empty, limit jobs are claimed or max_seconds have passed"""
+        metrics = self.scraper.metrics
+        stats = {'claimed': 0, 'hydrated': 0, 'failed': 0, 'update_failed': 0}
+        started = time.monotonic()
+        session = self.scraper.get_db_connection()
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='jobspy-hydrate') as pool:
+                while time.monotonic() - started < self.max_seconds:
+                    size = self.claim_size if limit is None else min(self.claim_size, limit - stats['claimed'])
+                    if size <= 0:
+                        break
+                    try:
+                        jobs = self.claim(session, size)
+                    except psycopg2.Error as e:
+                        print(f"[JOBSPY] Description hydration queue unavailable: {str(e).strip()}")
+                        break
+                    if not jobs:
+                        break
+                    stats['claimed'] += len(jobs)
+
+                    with metrics.stage('hydrate.fetch', rows=len(jobs)):
+                        details = list(pool.map(self.fetch, jobs))
+                    fetched = [(job, detail) for job, detail in zip(jobs, details) if detail.get('description')]
+                    failed = [job['id'] for job, detail in zip(jobs, details) if not detail.get('description')]
+
+                    hydrated = []
+                    if fetched:
+                        with metrics.stage('hydrate.enrich', rows=len(fetched)):
+                            rows = self.hydrated_rows([job for job, _ in fetched], [detail for _, detail in fetched])
+                        update_stats = update_rows(
+                            session, 'scraped_jobs', 'id', HYDRATED_COLUMNS, rows,
+                            column_types=HYDRATED_COLUMN_TYPES, batch_size=DEFAULT_BATCH_SIZE
+                        )
+                        if update_stats['failed']:
+                            # Left claimed; the lease brings them back for another try
+                            stats['update_failed'] += len(rows)
+                        else:
+                            hydrated = [job['id'] for job, _ in fetched]
+                    self.finish(session, hydrated, failed)
+                    stats['hydrated'] += len(hydrated)
+                    stats['failed'] += len(failed)
+                    print(f"[JOBSPY] Description hydration: {stats['hydrated']} hydrated, {stats['failed']} failed of {stats['claimed']} claimed")
+
+                    if not fetched:
+                        print("[JOBSPY] No job page in the batch could be read, leaving the rest of the queue for later")
+                        break
+
+            stats['pending'] = self.pending(session)
+        finally:
+            self.scraper.release_db_connection(session)
+        metrics.count('descriptions_hydrated', stats['hydrated'])
+        stats['seconds'] = round(time.monotonic() - started, 2)
+        return stats
@@ -0,0 +1,285 @@
+"""
+Run metrics for the JobSpy scrapers
+Stage timers, per-site request latency histograms and counters, reported as JSON or in Prometheus text format
+"""
+
+import math
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+METRIC_PREFIX = 'jobspy'
+
+
+def _format_bound(bound: float) -> str:
+    return '+Inf' if math.isinf(bound) else f"{bound:g}"
+
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels: Any) -> str:
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in labels.items()) + '}' if labels else ''
+
+
+class LatencyHistogram:
+    """Request latencies in fixed buckets, laid out like a Prometheus histogram"""
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(bounds) + (math.inf,)
+        self.counts = [0] * len(self.bounds)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    @classmethod
+    def from_stats(cls, stats: Dict[str, Any]) -> 'LatencyHistogram':
+        """Rebuild a histogram from its stats() form"""
+        cumulative = [(math.inf if bound == '+Inf' else float(bound), running) for bound, running in stats['buckets'].items()]
+        histogram = cls([bound for bound, _ in cumulative if not math.isinf(bound)])
+        previous = 0
+        for i, (_, running) in enumerate(cumulative):
+            histogram.counts[i] = running - previous
+            previous = running
+        histogram.count = stats['count']
+        histogram.sum = stats.get('sum') or 0.0
+        histogram.max = stats.get('max') or 0.0
+        return histogram
+
+    def merge(self, other: 'LatencyHistogram'):
+        """Add another histogram with the same buckets into this one"""
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """(upper bound, observations at or below it) per bucket, ending with +Inf"""
+        running = 0
+        buckets = []
+        for bound, count in zip(self.bounds, self.counts):
+            running += count
+            buckets.append((bound, running))
+        return buckets
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (the maximum seen, past the last bound)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, running in self.cumulative():
+            if running >= rank:
+                return self.max if math.isinf(bound) else bound
+        return self.max
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 3) if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': round(self.max, 3) if self.count else None,
+            'buckets': {_format_bound(bound): running for bound, running in self.cumulative()},
+        }
+
+
+class ScrapeMetrics:
+    """Timers and counters of one scrape run; thread-safe.
+
+    stage() times a block of work (an enrichment step, a dedup pass, a database batch)
+    and the rows it handled. observe_request() records one call to a job site: its
+    latency goes into the site's histogram and the 'fetch' stage, and its outcome
+    ('ok', an error kind from classify_error, or 'cached'/'skipped' for calls that never
+    reached the site) is counted. snapshot() is the JSON form returned with a run,
+    to_prometheus() the text exposition format.
+    """
+
+    def __init__(self, latency_buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.latency_buckets = tuple(latency_buckets)
+        self.started = time.monotonic()
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._sites: Dict[str, Dict[str, Any]] = {}
+        self._counters: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(name, time.perf_counter() - started, rows)
+
+    def observe_stage(self, name: str, seconds: float, rows: int = 0):
+        with self._lock:
+            self._observe_stage(name, seconds, rows)
+
+    def _observe_stage(self, name: str, seconds: float, rows: int):
+        entry = self._stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'rows': 0})
+        entry['seconds'] += seconds
+        entry['calls'] += 1
+        entry['rows'] += rows
+
+    def _site(self, site: str) -> Dict[str, Any]:
+        if site not in self._sites:
+            self._sites[site] = {
+                'outcomes': Counter(), 'rows': 0, 'retries': 0, 'latency': LatencyHistogram(self.latency_buckets),
+            }
+        return self._sites[site]
+
+    def observe_request(self, site: str, seconds: float, rows: int = 0, outcome: str = 'ok'):
+        """One scrape_jobs call for a site; 'cached' and 'skipped' calls carry no latency"""
+        with self._lock:
+            entry = self._site(site)
+            entry['outcomes'][outcome] += 1
+            if outcome not in ('cached', 'skipped'):
+                entry['rows'] += rows
+                entry['latency'].observe(seconds)
+                self._observe_stage('fetch', seconds, rows)
+
+    def observe_retry(self, site: str):
+        with self._lock:
+            self._site(site)['retries'] += 1
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {
+                name: {
+                    'seconds': round(entry['seconds'], 4),
+                    'calls': entry['calls'],
+                    'rows': entry['rows'],
+                    'rows_per_second': round(entry['rows'] / entry['seconds'], 1) if entry['seconds'] > 0 else None,
+                }
+                for name, entry in sorted(self._stages.items())
+            }
+            sites = {}
+            for site, entry in sorted(self._sites.items()):
+                latency = entry['latency']
+                outcomes = entry['outcomes']
+                sites[site] = {
+                    'requests': sum(outcomes.values()),
+                    'outcomes': dict(sorted(outcomes.items())),
+                    'errors': sum(count for outcome, count in outcomes.items() if outcome not in ('ok', 'cached', 'skipped')),
+                    'retries': entry['retries'],
+                    'rows': entry['rows'],
+                    'rows_per_second': round(entry['rows'] / latency.sum, 1) if latency.sum > 0 else None,
+                    'latency_seconds': latency.stats(),
+                }
+            return {
+                'elapsed_seconds': round(time.monotonic() - self.started, 3),
+                'stages': stages,
+                'sites': sites,
+                'counters': dict(sorted(self._counters.items())),
+            }
+
+    @classmethod
+    def merged(cls, snapshots: Iterable[Dict[str, Any]]) -> 'ScrapeMetrics':
+        """Metrics of several runs that went on side by side (the shards of a sharded run), from their snapshot()s"""
+        stages: Dict[str, Dict[str, float]] = {}
+        sites: Dict[str, Dict[str, Any]] = {}
+        counters: Counter = Counter()
+        elapsed = 0.0
+        for snapshot in snapshots:
+            elapsed = max(elapsed, snapshot.get('elapsed_seconds') or 0.0)
+            counters.update(snapshot.get('counters', {}))
+            for name, stage in snapshot.get('stages', {}).items():
+                entry = stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'rows': 0})
+                for field in ('seconds', 'calls', 'rows'):
+                    entry[field] += stage[field]
+            for site, stats in snapshot.get('sites', {}).items():
+                latency = LatencyHistogram.from_stats(stats['latency_seconds'])
+                if site not in sites:
+                    sites[site] = {'outcomes': Counter(), 'retries': 0, 'rows': 0, 'latency': latency}
+                else:
+                    sites[site]['latency'].merge(latency)
+                sites[site]['outcomes'].update(stats['outcomes'])
+                sites[site]['retries'] += stats['retries']
+                sites[site]['rows'] += stats['rows']
+
+        merged = cls()
+        merged._stages = stages
+        merged._sites = sites
+        merged._counters = counters
+        merged.started = time.monotonic() - elapsed
+        return merged
+
+    def to_prometheus(self, prefix: str = METRIC_PREFIX) -> str:
+        """The run's metrics in the Prometheus text exposition format"""
+        lines = []
+
+        def family(name: str, kind: str, help_text: str, samples: List[Tuple[str, Dict[str, Any], float]]):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{prefix}_{name}{suffix}{_labels(**labels)} {value!r}")
+
+        with self._lock:
+            stages = sorted(self._stages.items())
+            sites = sorted(self._sites.items())
+            counters = sorted(self._counters.items())
+            elapsed = time.monotonic() - self.started
+
+            family('run_duration_seconds', 'gauge', "Wall-clock duration of the last scrape run",
+                   [('', {}, float(round(elapsed, 3)))])
+            family('stage_seconds_total', 'counter', "Time spent in each pipeline stage, summed over threads",
+                   [('', {'stage': name}, float(round(entry['seconds'], 6))) for name, entry in stages])
+            family('stage_calls_total', 'counter', "Calls of each pipeline stage",
+                   [('', {'stage': name}, entry['calls']) for name, entry in stages])
+            family('stage_rows_total', 'counter', "Rows handled by each pipeline stage",
+                   [('', {'stage': name}, entry['rows']) for name, entry in stages])
+            family('requests_total', 'counter', "scrape_jobs calls per site and outcome",
+                   [('', {'site': site, 'outcome': outcome}, count)
+                    for site, entry in sites for outcome, count in sorted(entry['outcomes'].items())])
+            family('request_rows_total', 'counter', "Rows returned per site",
+                   [('', {'site': site}, entry['rows']) for site, entry in sites])
+            family('retries_total', 'counter', "Retried scrape_jobs calls per site",
+                   [('', {'site': site}, entry['retries']) for site, entry in sites])
+
+            histogram = []
+            for site, entry in sites:
+                latency = entry['latency']
+                histogram += [('_bucket', {'site': site, 'le': _format_bound(bound)}, running)
+                              for bound, running in latency.cumulative()]
+                histogram.append(('_sum', {'site': site}, float(round(latency.sum, 6))))
+                histogram.append(('_count', {'site': site}, latency.count))
+            family('request_duration_seconds', 'histogram', "scrape_jobs call latency per site", histogram)
+
+            for name, value in counters:
+                family(f"{name}_total", 'counter', f"Run counter {name}", [('', {}, value)])
+
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str, prefix: str = METRIC_PREFIX):
+        """Write to_prometheus() to path atomically, e.g. for node_exporter's textfile collector"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=directory, prefix='.jobspy-metrics-')
+        try:
+            with os.fdopen(handle, 'w') as stream:
+                stream.write(self.to_prometheus(prefix))
+            # mkstemp creates the file private to this user; the collector reading it may not be
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
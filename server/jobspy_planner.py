@@ -0,0 +1,96 @@
+"""
+Adaptive query planning for the JobSpy scrapers
+Spends a run's request budget on the (site, search_term, location) queries expected to find the most new jobs
+"""
+
+import math
+import random
+from typing import Dict, List, Optional, Sequence, Tuple
+
+Query = Tuple[str, str, str]
+
+DEFAULT_EXPLORATION = 0.5
+DEFAULT_EXPLORE_SHARE = 0.15
+MAX_RESULTS_PER_QUERY = 15
+
+
+class QueryPlanner:
+    """Upper-confidence-bound planner over (site, search_term, location) queries.
+
+    A query's expected yield is its decayed mean of new jobs per run, discounted by its
+    error rate. Queries that have run rarely get a UCB1 bonus, never-run queries are tried
+    before any bonus is compared, and a small share of the budget always goes to the
+    least-tried queries so stale estimates get refreshed. Results per query are then
+    shared out in proportion to expected yield, never above MAX_RESULTS_PER_QUERY.
+    """
+
+    def __init__(
+        self,
+        stats: Dict[Query, Dict[str, float]],
+        exploration: float = DEFAULT_EXPLORATION,
+        explore_share: float = DEFAULT_EXPLORE_SHARE,
+        rng: Optional[random.Random] = None,
+    ):
+        self.stats = stats
+        self.exploration = exploration
+        self.explore_share = explore_share
+        self.rng = rng or random.Random()
+        self.total_runs = sum(entry['runs'] for entry in stats.values())
+
+    def expected_yield(self, query: Query) -> Optional[float]:
+        """Mean new jobs per run times the success rate, or None for a query with no history"""
+        entry = self.stats.get(query)
+        if not entry or entry['runs'] <= 0:
+            return None
+        success_rate = max(0.0, 1.0 - entry['errors'] / entry['runs'])
+        return entry['new_jobs'] / entry['runs'] * success_rate
+
+    def score(self, query: Query, scale: float) -> float:
+        expected = self.expected_yield(query)
+        if expected is None:
+            return math.inf
+        bonus = self.exploration * scale * math.sqrt(math.log(self.total_runs + 1) / self.stats[query]['runs'])
+        return expected + bonus
+
+    def plan(self, candidates: Sequence[Query], budget: int, results_per_query: int) -> List[Tuple[Query, int]]:
+        """Pick up to `budget` queries, best first, each with its share of the results budget"""
+        candidates = list(dict.fromkeys(candidates))
+        budget = max(0, min(int(budget), len(candidates)))
+        if not budget:
+            return []
+
+        # The bonus is scaled to the best known yield so it stays comparable to the yields themselves
+        yields = [y for y in (self.expected_yield(q) for q in candidates) if y is not None]
+        scale = max(yields + [1.0])
+
+        # Random tie-breaking so equally scored queries (e.g. all unseen) rotate between runs
+        shuffled = candidates[:]
+        self.rng.shuffle(shuffled)
+        ranked = sorted(shuffled, key=lambda q: self.score(q, scale), reverse=True)
+
+        explore_slots = min(budget - 1, int(round(budget * self.explore_share))) if budget > 1 else 0
+        chosen = ranked[:budget - explore_slots]
+        if explore_slots:
+            rest = sorted(ranked[budget - explore_slots:], key=lambda q: self.stats.get(q, {}).get('runs', 0))
+            chosen += rest[:explore_slots]
+
+        return list(zip(chosen, self._allocate(chosen, results_per_query)))
+
+    def _allocate(self, chosen: List[Query], results_per_query: int) -> List[int]:
+        """Split len(chosen) * results_per_query results by expected yield; untried queries get the flat share"""
+        if results_per_query <= 0:
+            return [results_per_query] * len(chosen)
+
+        expected = [self.expected_yield(q) for q in chosen]
+        known = [y for y in expected if y is not None]
+        mean = sum(known) / len(known) if known else 0.0
+        floor = max(1, results_per_query // 3)
+        ceiling = max(results_per_query, min(MAX_RESULTS_PER_QUERY, results_per_query * 2))
+
+        allocation = []
+        for y in expected:
+            if y is None or mean <= 0:
+                allocation.append(results_per_query)
+            else:
+                allocation.append(int(min(ceiling, max(floor, round(results_per_query * y / mean)))))
+        return allocation
@@ -0,0 +1,386 @@
+"""
+Freshness-driven scheduling for the JobSpy scraper
+The full ENHANCED_SEARCH_TERMS x ENHANCED_LOCATIONS grid is split into (category, region, site) segments,
+each with a freshness SLA and a priority. A daemon keeps dispatching the stalest queries of the most
+overdue segment within a global request-rate budget, so the whole grid is refreshed continuously.
+"""
+
+import heapq
+import json
+import signal
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from jobspy_enrichment import get_location_resolver
+from jobspy_scraper import JobSpyIntegration
+from jobspy_state import DEFAULT_STATE_FILE, ScrapeState, new_run_id
+from jobspy_throttle import TokenBucket
+
+Query = Tuple[str, str, str]
+
+DEFAULT_SLA_HOURS = {'tech': 24, 'business': 48, 'entry_level': 72}
+DEFAULT_PRIORITY = {'tech': 3.0, 'business': 2.0, 'entry_level': 1.0}
+FALLBACK_SLA_HOURS = 48
+FALLBACK_PRIORITY = 1.0
+DEFAULT_REQUESTS_PER_HOUR = 600
+DEFAULT_QUERIES_PER_DISPATCH = 10
+DEFAULT_RESULTS_PER_QUERY = 15
+DEFAULT_POLL_SECONDS = 300
+# A segment's demand follows its new-job yield relative to the whole grid, within these factors of its priority
+DEMAND_BOUNDS = (0.5, 2.0)
+# Country a region's locations are scraped with when the location names none ('Remote Europe')
+REGION_COUNTRIES = {'india': 'IN', 'usa': 'US', 'europe': 'GB', 'global': 'US'}
+CHECKPOINT_PREFIX = 'schedule:'
+# Run id of the dispatch in progress, resumed when the daemon restarts after being killed mid-run
+INFLIGHT_CHECKPOINT = 'schedule:inflight'
+# Key of the segment that dispatch belongs to, so its schedule moves on once the resumed run finishes
+INFLIGHT_SEGMENT_CHECKPOINT = 'schedule:inflight_segment'
+SCHEDULER_OPTIONS = (
+    'categories', 'regions', 'segments', 'requests_per_hour', 'queries_per_dispatch',
+    'results_per_query', 'poll_seconds', 'max_dispatches',
+)
+
+
+class Segment:
+    """One (category, region, site) slice of the query grid with its freshness SLA and priority.
+
+    The SLA asks for every query of the segment to be scraped again within sla_hours, so
+    a segment of n queries needs a dispatch of per_dispatch queries every
+    sla_hours * per_dispatch / n. lag() is the time since the last dispatch in those
+    intervals: at 1 the segment is due, and it keeps growing while the segment waits.
+    """
+
+    def __init__(
+        self, category: str, region: str, site: str, queries: List[Tuple[str, str]], sla_hours: float, priority: float
+    ):
+        self.category = category
+        self.region = region
+        self.site = site
+        self.queries = queries
+        self.sla_hours = float(sla_hours)
+        self.priority = float(priority)
+        self.demand = self.priority
+        self.last_dispatched_at: Optional[datetime] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.category}:{self.region}:{self.site}"
+
+    def units(self) -> List[Query]:
+        return [(self.site, search_term, location) for search_term, location in self.queries]
+
+    def interval_seconds(self, per_dispatch: int) -> float:
+        return self.sla_hours * 3600 * min(1.0, per_dispatch / max(len(self.queries), 1))
+
+    def lag(self, now: datetime, per_dispatch: int) -> float:
+        """Dispatch intervals since the last dispatch; inf for a segment never dispatched"""
+        if self.last_dispatched_at is None:
+            return float('inf')
+        return (now - self.last_dispatched_at).total_seconds() / self.interval_seconds(per_dispatch)
+
+
+def build_segments(scraper: JobSpyIntegration, config: Dict[str, Any]) -> List[Segment]:
+    """Every (category, region, site) segment of the grid, with its SLA and priority.
+
+    'categories', 'regions' and 'job_sites' narrow the grid. 'segments' overrides
+    sla_hours and priority per 'category', 'category:region' or 'category:region:site',
+    the most specific key winning.
+    """
+    overrides = config.get('segments', {})
+    categories = config.get('categories') or list(scraper.ENHANCED_SEARCH_TERMS)
+    regions = config.get('regions') or list(scraper.ENHANCED_LOCATIONS)
+    unknown = [name for name in categories if name not in scraper.ENHANCED_SEARCH_TERMS]
+    unknown += [name for name in regions if name not in scraper.ENHANCED_LOCATIONS]
+    if unknown:
+        raise ValueError(f"Unknown categories or regions: {', '.join(unknown)}")
+
+    segments = []
+    for category in categories:
+        for region in regions:
+            queries = [
+                (search_term, location)
+                for search_term in scraper.ENHANCED_SEARCH_TERMS[category]
+                for location in scraper.ENHANCED_LOCATIONS[region]
+            ]
+            job_sites = config.get('job_sites') or scraper.COUNTRY_JOB_SITES.get(region, scraper.COUNTRY_JOB_SITES['global'])
+            for site in job_sites:
+                options = {
+                    'sla_hours': DEFAULT_SLA_HOURS.get(category, FALLBACK_SLA_HOURS),
+                    'priority': DEFAULT_PRIORITY.get(category, FALLBACK_PRIORITY),
+                }
+                for key in (category, f"{category}:{region}", f"{category}:{region}:{site}"):
+                    options.update(overrides.get(key, {}))
+                segments.append(Segment(category, region, site, queries, options['sla_hours'], options['priority']))
+    return segments
+
+
+class FreshnessScheduler:
+    """Keeps the segments of the grid within their freshness SLAs, most overdue first.
+
+    Each tick the segments go into a priority queue keyed on demand x lag, where demand is
+    the segment's priority scaled by how many new jobs its queries find compared with the
+    rest of the grid. The top segment, if due, gets one dispatch: a run_scraping() of its
+    queries_per_dispatch stalest queries (by watermark, never-scraped ones first) that
+    share a country. Dispatches draw one token per query from a global requests_per_hour
+    bucket. Dispatch times are checkpointed in the scrape state, so a restarted daemon
+    keeps its schedule, and a dispatch cut short is resumed from its run checkpoint.
+    """
+
+    def __init__(self, scraper: JobSpyIntegration, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.scraper = scraper
+        self.state_file = config.get('state_file', DEFAULT_STATE_FILE)
+        self.state = ScrapeState(self.state_file)
+        self.segments = build_segments(scraper, config)
+        self.queries_per_dispatch = max(1, int(config.get('queries_per_dispatch', DEFAULT_QUERIES_PER_DISPATCH)))
+        self.results_per_query = int(config.get('results_per_query', DEFAULT_RESULTS_PER_QUERY))
+        self.poll_seconds = float(config.get('poll_seconds', DEFAULT_POLL_SECONDS))
+        requests_per_hour = float(config.get('requests_per_hour', DEFAULT_REQUESTS_PER_HOUR))
+        self.budget = TokenBucket(requests_per_hour / 3600, burst=self.queries_per_dispatch)
+        # Everything else is passed through to every dispatched run
+        self.run_config = {key: value for key, value in config.items() if key not in SCHEDULER_OPTIONS}
+        self.attempted: Dict[Query, datetime] = {}
+        self.counters = Counter()
+        self.stopping = threading.Event()
+
+        for segment in self.segments:
+            stamp = self.state.checkpoint(CHECKPOINT_PREFIX + segment.key)
+            segment.last_dispatched_at = datetime.fromisoformat(stamp) if stamp else None
+
+    def stop(self):
+        """Finish the dispatch in progress, then return from run()"""
+        self.stopping.set()
+
+    def close(self):
+        self.state.close()
+
+    def refresh_demand(self):
+        """Scale each segment's priority by its new jobs per query run relative to the whole grid"""
+        stats = self.state.yield_stats(unit for segment in self.segments for unit in segment.units())
+        totals = {}
+        for segment in self.segments:
+            entries = [stats[unit] for unit in segment.units() if unit in stats]
+            totals[segment.key] = (sum(entry['new_jobs'] for entry in entries), sum(entry['runs'] for entry in entries))
+        grid_new = sum(new_jobs for new_jobs, _ in totals.values())
+        grid_runs = sum(runs for _, runs in totals.values())
+        low, high = DEMAND_BOUNDS
+        for segment in self.segments:
+            new_jobs, runs = totals[segment.key]
+            if runs <= 0 or grid_new <= 0:
+                segment.demand = segment.priority
+                continue
+            relative_yield = (new_jobs / runs) / (grid_new / grid_runs)
+            segment.demand = segment.priority * min(high, max(low, relative_yield))
+
+    def queue(self, now: Optional[datetime] = None) -> List[Segment]:
+        """Segments by demand x lag, most overdue first (never-dispatched ones first of all, by demand)"""
+        now = now or datetime.now()
+        heap = [
+            (-segment.demand * segment.lag(now, self.queries_per_dispatch), -segment.demand, segment.key, segment)
+            for segment in self.segments
+        ]
+        heapq.heapify(heap)
+        return [heapq.heappop(heap)[-1] for _ in range(len(heap))]
+
+    def next_due(self, now: Optional[datetime] = None) -> Optional[Segment]:
+        now = now or datetime.now()
+        # Ordered by demand x lag, a segment that is not yet due can come before one that is
+        for segment in self.queue(now):
+            if segment.lag(now, self.queries_per_dispatch) >= 1:
+                return segment
+        return None
+
+    def seconds_until_due(self, now: Optional[datetime] = None) -> float:
+        now = now or datetime.now()
+        waits = [
+            segment.interval_seconds(self.queries_per_dispatch) - (now - segment.last_dispatched_at).total_seconds()
+            if segment.last_dispatched_at else 0.0
+            for segment in self.segments
+        ]
+        return max(0.0, min(waits, default=self.poll_seconds))
+
+    def country_for(self, segment: Segment, location: str) -> str:
+        return get_location_resolver().detect_country(location) or REGION_COUNTRIES.get(segment.region, 'US')
+
+    def stalest(self, segment: Segment) -> Tuple[List[Query], str]:
+        """The segment's least recently scraped queries that share a country, and that country.
+
+        A query that was tried but failed to refresh counts as refreshed at the attempt, so a
+        query that keeps failing goes to the back of the segment instead of blocking it.
+        """
+        marks = self.state.watermarks(segment.units())
+
+        def refreshed_at(unit: Query) -> datetime:
+            times = [stamp for stamp in (marks.get(unit, {}).get('last_success_at'), self.attempted.get(unit)) if stamp]
+            return max(times) if times else datetime.min
+
+        ordered = sorted(segment.units(), key=refreshed_at)
+        country = self.country_for(segment, ordered[0][2])
+        picked = [unit for unit in ordered if self.country_for(segment, unit[2]) == country]
+        return picked[:self.queries_per_dispatch], country
+
+    def wait_for_budget(self, requests: int) -> bool:
+        """Take one token per request from the global budget, False if stopped while waiting"""
+        taken = 0
+        while taken < requests:
+            if self.budget.try_acquire():
+                taken += 1
+            elif self.stopping.wait(self.budget.time_until_available()):
+                return False
+        return True
+
+    def dispatch(self, segment: Segment, units: List[Query], country: str) -> Dict[str, Any]:
+        """Scrape the given queries of a segment as one run and move the segment's schedule on"""
+        run_id = new_run_id()
+        search_terms = list(dict.fromkeys(search_term for _, search_term, _ in units))
+        run_config = {
+            **self.run_config,
+            'run_id': run_id,
+            'search_terms': search_terms,
+            'locations': list(dict.fromkeys(location for _, _, location in units)),
+            'queries': [[search_term, location] for _, search_term, location in units],
+            'job_sites': [segment.site],
+            'country': country,
+            'results_wanted': self.results_per_query * len(search_terms),
+            # The scheduler has chosen the queries, and their watermarks are what it schedules by
+            'adaptive_planning': False,
+            'incremental': True,
+        }
+        lag = segment.lag(datetime.now(), self.queries_per_dispatch)
+        print(f"[JOBSPY] Scheduler: {segment.key} (lag {lag:.1f}, demand {segment.demand:.2f}), {len(units)} queries in {country}, run {run_id}")
+
+        self.state.save_checkpoint(INFLIGHT_SEGMENT_CHECKPOINT, segment.key)
+        self.state.save_checkpoint(INFLIGHT_CHECKPOINT, run_id)
+        result = self.scraper.run_scraping(run_config)
+        now = datetime.now()
+        for unit in units:
+            self.attempted[unit] = now
+        self.dispatched(segment, now)
+
+        self.counters['dispatches'] += 1
+        self.counters['queries'] += len(units)
+        self.counters['failed_dispatches'] += 0 if result.get('success') else 1
+        self.counters['scraped_count'] += result.get('scraped_count') or 0
+        self.counters['saved_count'] += result.get('saved_count') or 0
+        return result
+
+    def dispatched(self, segment: Segment, now: datetime):
+        """Stamp a segment's dispatch time and clear the in-flight checkpoint"""
+        # The schedule moves on even after a failed run; its queries stay stale and come round again
+        segment.last_dispatched_at = now
+        self.state.save_checkpoint(CHECKPOINT_PREFIX + segment.key, now.isoformat())
+        self.state.clear_checkpoint(INFLIGHT_CHECKPOINT)
+        self.state.clear_checkpoint(INFLIGHT_SEGMENT_CHECKPOINT)
+
+    def resume_inflight(self) -> Optional[Dict[str, Any]]:
+        """Finish the dispatch the daemon was running when it was stopped, if any"""
+        run_id = self.state.checkpoint(INFLIGHT_CHECKPOINT)
+        if not run_id:
+            return None
+        segment_key = self.state.checkpoint(INFLIGHT_SEGMENT_CHECKPOINT)
+        print(f"[JOBSPY] Scheduler: resuming interrupted dispatch {run_id}")
+        result = self.scraper.resume_scraping(run_id, {'state_file': self.state_file})
+        segment = next((segment for segment in self.segments if segment.key == segment_key), None)
+        if segment is not None:
+            self.dispatched(segment, datetime.now())
+        else:
+            self.state.clear_checkpoint(INFLIGHT_CHECKPOINT)
+            self.state.clear_checkpoint(INFLIGHT_SEGMENT_CHECKPOINT)
+        return result
+
+    def run(self, max_dispatches: Optional[int] = None, until_idle: bool = False) -> Dict[str, Any]:
+        """Dispatch overdue segments until stopped; until_idle returns once nothing is due"""
+        self.resume_inflight()
+        while not self.stopping.is_set():
+            if max_dispatches is not None and self.counters['dispatches'] >= max_dispatches:
+                break
+            self.refresh_demand()
+            segment = self.next_due()
+            if segment is None:
+                if until_idle:
+                    break
+                self.stopping.wait(min(self.poll_seconds, self.seconds_until_due()))
+                continue
+            units, country = self.stalest(segment)
+            if not self.wait_for_budget(len(units)):
+                break
+            self.dispatch(segment, units, country)
+
+        return {
+            'success': self.counters['failed_dispatches'] == 0,
+            **{name: self.counters[name] for name in ('dispatches', 'queries', 'failed_dispatches', 'scraped_count', 'saved_count')},
+            **self.status(),
+        }
+
+    def status(self) -> Dict[str, Any]:
+        """Per segment: SLA, demand, lag and the share of its queries scraped within the SLA"""
+        now = datetime.now()
+        self.refresh_demand()
+        marks = self.state.watermarks(unit for segment in self.segments for unit in segment.units())
+        segments = []
+        fresh_total = 0
+        for segment in self.queue(now):
+            ages = [(now - marks[unit]['last_success_at']).total_seconds() / 3600 for unit in segment.units() if unit in marks]
+            fresh = sum(1 for age in ages if age <= segment.sla_hours)
+            fresh_total += fresh
+            lag = segment.lag(now, self.queries_per_dispatch)
+            segments.append({
+                'segment': segment.key,
+                'queries': len(segment.queries),
+                'sla_hours': segment.sla_hours,
+                'priority': segment.priority,
+                'demand': round(segment.demand, 3),
+                'lag': None if lag == float('inf') else round(lag, 2),
+                'fresh_share': round(fresh / len(segment.queries), 4) if segment.queries else 1.0,
+                'never_scraped': len(segment.queries) - len(ages),
+                'oldest_hours': round(max(ages), 1) if len(ages) == len(segment.queries) and ages else None,
+                'last_dispatched_at': segment.last_dispatched_at.isoformat() if segment.last_dispatched_at else None,
+            })
+        total = sum(len(segment.queries) for segment in self.segments)
+        return {
+            'grid_queries': total,
+            'fresh_share': round(fresh_total / total, 4) if total else 1.0,
+            'segments': segments,
+            'timestamp': now.isoformat(),
+        }
+
+
+def main():
+    """CLI: --run '<config json>' (daemon), --once '<config json>' (until nothing is due), --status '<config json>'"""
+    try:
+        command = sys.argv[1] if len(sys.argv) > 1 else '--run'
+        config = json.loads(sys.argv[2]) if len(sys.argv) > 2 else {}
+        if command not in ('--run', '--once', '--status'):
+            raise ValueError(f"Unknown command {command!r}; use --run, --once or --status")
+
+        scraper = JobSpyIntegration()
+        scheduler = FreshnessScheduler(scraper, config)
+        try:
+            if command == '--status':
+                result = {'success': True, **scheduler.status()}
+            else:
+                # SIGTERM (PM2, systemd) and Ctrl-C let the current dispatch finish before exiting
+                for signum in (signal.SIGTERM, signal.SIGINT):
+                    signal.signal(signum, lambda *_: scheduler.stop())
+                result = scheduler.run(max_dispatches=config.get('max_dispatches'), until_idle=command == '--once')
+        finally:
+            scheduler.close()
+            scraper.close()
+
+        print(json.dumps(result, indent=2, default=str))
+        sys.exit(0 if result['success'] else 1)
+
+    except Exception as e:
+        print(json.dumps({
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }, indent=2))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
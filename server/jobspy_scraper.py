@@ -8,14 +8,35 @@ Enhanced for international job scraping from India, USA, and Europe
 import os
 import sys
 import json
+import re
+import hashlib
 import psycopg2
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Any, Optional, Callable, Iterator, TextIO, Tuple
+from urllib.parse import urlsplit, parse_qsl, urlencode
 import traceback
 import time
 import random
+from collections import Counter
+
+from jobspy_enrichment import (
+    CURRENCY_MAP, CURRENCY_SYMBOLS, EUROPE_COUNTRY_CODES, INDEED_COUNTRIES, clean_salary_frame, extract_skills_frame,
+    get_location_resolver, get_rule_classifier, get_skill_matcher, rules_fingerprint, salary_amount, text_column
+)
+from jobspy_db import (
+    DEFAULT_BATCH_SIZE, DEFAULT_QUEUE_SIZE, DatabasePool, DatabaseSession, StreamingWriter, empty_save_stats,
+    update_rows, upsert_rows
+)
+from jobspy_throttle import CircuitOpenError, SiteHealthMonitor, SiteRateLimiter, SiteScrapeExecutor, classify_error
+from jobspy_cache import ScrapeCache
+from jobspy_state import DEFAULT_OVERLAP_HOURS, DEFAULT_STATE_FILE, ScrapeState, new_run_id, newest_posted
+from jobspy_planner import DEFAULT_EXPLORATION, QueryPlanner
+from jobspy_dedup import NearDuplicateIndex
+from jobspy_metrics import ScrapeMetrics
+from jobspy_hydration import DescriptionHydrator, description_missing, enqueue_for_hydration
+from jobspy_archive import DEFAULT_ARCHIVE_DIR, PARQUET_AVAILABLE, RawArchive
 
 # Import JobSpy
 try:
@@ -24,7 +45,60 @@ except ImportError:
     print("Error: jobspy not found. Please install: pip install python-jobspy")
     sys.exit(1)
 
+# Query parameters that only track the visitor and never identify the posting
+TRACKING_PARAM_PREFIXES = ('utm_', 'trk', 'tracking', 'refid', 'ref', 'src', 'from', 'campaign', 'gclid', 'fbclid')
+
+def normalize_job_url(url: str) -> str:
+    """Reduce a job URL to host + path + identifying query params, ignoring scheme, www and tracking"""
+    if not url or str(url).lower() in ('nan', 'none'):
+        return ''
+    parts = urlsplit(str(url).strip())
+    if not parts.netloc:
+        return ''
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    path = parts.path.rstrip('/')
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query)
+        if not key.lower().startswith(TRACKING_PARAM_PREFIXES)
+    )
+    return f"{host}{path}?{urlencode(query)}" if query else f"{host}{path}"
+
+def stable_external_id(site: str, job_url: str, title: str = '', company: str = '', location: str = '') -> str:
+    """Deterministic external_id: blake2b of the normalized URL, or of title+company+location without one.
+
+    Unlike hash(), the digest does not depend on PYTHONHASHSEED, so the same posting gets the
+    same id in every scraper process and the unique (source_platform, external_id) index dedups it.
+    """
+    normalized_url = normalize_job_url(job_url)
+    if normalized_url:
+        basis = f"url:{normalized_url}"
+    else:
+        basis = 'job:' + '|'.join(re.sub(r'\s+', ' ', str(part or '')).strip().lower() for part in (title, company, location))
+    digest = hashlib.blake2b(basis.encode('utf-8'), digest_size=12).hexdigest()
+    return f"{site}_{digest}"
+
 class JobSpyIntegration:
+    SCRAPED_JOB_COLUMNS = [
+        'title', 'company', 'description', 'location', 'work_mode', 'job_type',
+        'experience_level', 'salary_range', 'skills',
+        'country_code', 'region', 'city',
+        'salary_min', 'salary_max', 'currency', 'salary_period',
+        'source_url', 'source_platform', 'external_id', 'language',
+        'category', 'subcategory', 'tags', 'last_scraped', 'expires_at',
+        'created_at', 'updated_at', 'is_active'
+    ]
+    # Refreshed on conflict when on_conflict == 'update' (created_at is kept)
+    SCRAPED_JOB_UPDATE_COLUMNS = [
+        'title', 'company', 'description', 'location', 'work_mode', 'job_type',
+        'experience_level', 'salary_range', 'skills',
+        'country_code', 'region', 'city',
+        'salary_min', 'salary_max', 'currency', 'salary_period',
+        'source_url', 'language', 'category', 'subcategory', 'tags',
+        'last_scraped', 'expires_at', 'updated_at', 'is_active'
+    ]
+    
     def __init__(self):
         self.db_url = os.environ.get('DATABASE_URL')
         if not self.db_url:
@@ -97,100 +171,105 @@ class JobSpyIntegration:
             'europe': ['indeed', 'linkedin'],
             'global': ['indeed', 'linkedin']
         }
+        
+        # Concurrent scraping settings (overridable per run via config)
+        self.max_workers = 6
+        self.site_rate_limits: Dict[str, Dict[str, float]] = {}
+        # Per-site circuit breakers and pacing shared by a run's workers (None disables them)
+        self.site_health: Optional[SiteHealthMonitor] = None
+        self.execution_stats: Dict[str, Any] = {}
+        
+        # Database write settings (overridable per run via config)
+        self.save_batch_size = DEFAULT_BATCH_SIZE
+        self.on_conflict = 'nothing'  # 'nothing' keeps existing rows, 'update' refreshes them
+        self.pipeline_queue_size = DEFAULT_QUEUE_SIZE  # query batches buffered ahead of the database writer
+        
+        # On-disk cache of scrape_jobs results, configured per run (None disables it)
+        self.query_cache: Optional[ScrapeCache] = None
+        
+        # Per-query high-water marks and yield history (None fetches full windows on the fixed rotation)
+        self.scrape_state: Optional[ScrapeState] = None
+        self.incremental = True
+        self.watermark_overlap_hours = DEFAULT_OVERLAP_HOURS
+        self.succeeded_queries: List[tuple] = []
+        self.known_skipped = 0
+        
+        # Every run gets an id; its plan and saved units are checkpointed in the scrape state so it can be resumed
+        self.run_id: Optional[str] = None
+        self.checkpoint_runs = True
+        self.resumed_units: Dict[tuple, Dict[str, Any]] = {}
+        
+        # Adaptive planning spends query_budget queries (default: as many as the fixed rotation) on the best yielding pairs
+        self.adaptive_planning = True
+        self.query_budget: Optional[int] = None
+        self.planner_exploration = DEFAULT_EXPLORATION
+        self.plan_stats: Dict[str, Any] = {}
+        
+        # MinHash/LSH index of the postings kept so far in a run, for cross-site duplicates
+        self.near_dedup = True
+        self.near_duplicates: Optional[NearDuplicateIndex] = None
+        
+        # Pooled connections with retries; an idle one stays open across worker runs
+        self.db_pool = DatabasePool(self.db_url)
+        
+        # Raw scrape_jobs results kept as Parquet for replay_archive() (None disables it)
+        self.archive: Optional[RawArchive] = None
+        
+        # New rows without a description (LinkedIn) are queued and hydrated after the scrape (None disables both)
+        self.hydration: Optional[DescriptionHydrator] = None
+        
+        # Stage timers, per-site latency histograms and counters, started afresh by every run
+        self.metrics = ScrapeMetrics()
+        
+        # Receives structured progress events ({'type': ..., ...}) when running under --ndjson or --worker
+        self.event_sink: Optional[Callable[[Dict[str, Any]], None]] = None
+    
+    def get_db_connection(self) -> DatabaseSession:
+        """Get a pooled database session"""
+        return self.db_pool.session()
+    
+    def release_db_connection(self, conn: DatabaseSession):
+        """Hand a session from get_db_connection back to the pool"""
+        conn.close()
     
-    def get_db_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(self.db_url)
+    def emit_event(self, event_type: str, **fields):
+        """Pass a structured event to the event sink, if one is attached"""
+        if self.event_sink is not None:
+            self.event_sink({'type': event_type, **fields})
+    
+    def close(self):
+        """Close the pooled connections and the scrape state, if any"""
+        self.db_pool.closeall()
+        if self.scrape_state is not None:
+            self.scrape_state.close()
+            self.scrape_state = None
     
     def smart_delay(self, min_delay=2, max_delay=5):
         """Implement smart delay to avoid rate limiting"""
         delay = random.uniform(min_delay, max_delay)
         time.sleep(delay)
     
+    def classify_job(self, title: str, description: str = '', skills: Optional[List[str]] = None) -> Dict[str, str]:
+        """Category, subcategory and experience level in one pass over the rule table"""
+        return get_rule_classifier().classify(title, description, skills or [])
+    
     def categorize_job(self, title: str, skills: List[str], description: str = '') -> tuple:
         """Enhanced job categorization"""
-        title_lower = title.lower()
-        description_lower = description.lower() if description else ''
-        skills_str = ' '.join(skills).lower() if skills else ''
-        text = f"{title_lower} {description_lower} {skills_str}"
-        
-        # Technology roles
-        if any(keyword in text for keyword in ['engineer', 'developer', 'programmer', 'software']):
-            if 'frontend' in text or 'front-end' in text or any(skill in skills_str for skill in ['react', 'vue', 'angular']):
-                return 'tech', 'frontend'
-            elif 'backend' in text or 'back-end' in text:
-                return 'tech', 'backend'
-            elif 'full stack' in text or 'fullstack' in text:
-                return 'tech', 'fullstack'
-            elif 'devops' in text or 'site reliability' in text:
-                return 'tech', 'devops'
-            elif 'mobile' in text or any(skill in skills_str for skill in ['ios', 'android', 'react native', 'flutter']):
-                return 'tech', 'mobile'
-            else:
-                return 'tech', 'software-engineering'
-        
-        elif any(keyword in text for keyword in ['data scientist', 'data engineer', 'data analyst', 'machine learning', 'ai engineer']):
-            if 'scientist' in text:
-                return 'tech', 'data-science'
-            elif 'engineer' in text:
-                return 'tech', 'data-engineering'
-            else:
-                return 'tech', 'data-analytics'
-        
-        elif any(keyword in text for keyword in ['designer', 'ux', 'ui', 'design']):
-            if 'ux' in text or 'user experience' in text:
-                return 'design', 'ux'
-            elif 'ui' in text or 'user interface' in text:
-                return 'design', 'ui'
-            elif 'product design' in text:
-                return 'design', 'product-design'
-            else:
-                return 'design', 'visual-design'
-        
-        elif any(keyword in text for keyword in ['product manager', 'pm', 'product owner']):
-            return 'product', 'product-management'
-        
-        elif any(keyword in text for keyword in ['marketing', 'growth', 'content', 'social media']):
-            return 'marketing', 'digital-marketing'
-        
-        elif any(keyword in text for keyword in ['sales', 'account manager', 'business development']):
-            return 'sales', 'business-development'
-        
-        else:
-            return 'general', 'other'
+        classification = self.classify_job(title, description, skills)
+        return classification['category'], classification['subcategory']
     
     def determine_experience_level(self, title: str, description: str = '') -> str:
         """Determine experience level from title and description"""
-        text = f"{title} {description}".lower()
-        
-        if any(keyword in text for keyword in ['senior', 'sr.', 'lead', 'principal', 'staff', 'architect']):
-            return 'senior'
-        elif any(keyword in text for keyword in ['junior', 'jr.', 'entry', 'entry-level', 'graduate', 'intern', 'fresher', 'trainee']):
-            return 'entry'
-        elif any(keyword in text for keyword in ['mid', 'mid-level', 'intermediate']):
-            return 'mid'
-        else:
-            return 'mid'
+        return self.classify_job(title, description)['experience_level']
     
     def clean_salary(self, salary_min: Optional[float], salary_max: Optional[float], country_code: str = 'US', salary_text: str = '') -> tuple[Optional[str], Optional[int], Optional[int], str]:
         """Enhanced salary cleaning with international currency support"""
         try:
-            currency_map = {
-                'US': 'USD', 'IN': 'INR', 'GB': 'GBP', 'DE': 'EUR', 'FR': 'EUR', 
-                'ES': 'EUR', 'IT': 'EUR', 'NL': 'EUR', 'AU': 'AUD', 'AE': 'AED', 
-                'CA': 'CAD', 'CH': 'CHF', 'SE': 'SEK', 'NO': 'NOK', 'DK': 'DKK'
-            }
-            currency = currency_map.get(country_code, 'USD')
-            currency_symbol = '$' if currency == 'USD' else '₹' if currency == 'INR' else '£' if currency == 'GBP' else '€' if currency in ['EUR'] else '$'
+            currency = CURRENCY_MAP.get(country_code, 'USD')
+            currency_symbol = CURRENCY_SYMBOLS.get(currency, '$')
             
-            clean_min = None
-            clean_max = None
-            
-            if salary_min is not None and not pd.isna(salary_min) and salary_min > 0:
-                clean_min = int(float(salary_min))
-                
-            if salary_max is not None and not pd.isna(salary_max) and salary_max > 0:
-                clean_max = int(float(salary_max))
+            clean_min = salary_amount(salary_min)
+            clean_max = salary_amount(salary_max)
             
             salary_range = None
             if clean_min and clean_max:
@@ -203,83 +282,16 @@ class JobSpyIntegration:
             return salary_range, clean_min, clean_max, currency
             
         except (ValueError, TypeError, OverflowError):
-            return None, None, None, currency_map.get(country_code, 'USD')
+            return None, None, None, CURRENCY_MAP.get(country_code, 'USD')
     
     def extract_skills(self, title: str, description: str, category: str = '') -> List[str]:
         """Enhanced skill extraction with international focus"""
-        tech_skills = [
-            'Python', 'JavaScript', 'Java', 'C++', 'C#', 'Go', 'Rust', 'PHP', 'Ruby', 'Swift', 'Kotlin',
-            'React', 'Vue', 'Angular', 'Node.js', 'Express', 'Django', 'Flask', 'Spring', 'Laravel',
-            'AWS', 'Azure', 'GCP', 'Docker', 'Kubernetes', 'Jenkins', 'Git', 'Linux', 'SQL', 'NoSQL',
-            'MongoDB', 'PostgreSQL', 'MySQL', 'Redis', 'Elasticsearch', 'Kafka', 'RabbitMQ',
-            'TensorFlow', 'PyTorch', 'Scikit-learn', 'Pandas', 'NumPy', 'Machine Learning', 'AI',
-            'Figma', 'Sketch', 'Adobe XD', 'Photoshop', 'Illustrator',
-            'Agile', 'Scrum', 'Kanban', 'JIRA', 'Confluence'
-        ]
-        
-        business_skills = [
-            'Salesforce', 'HubSpot', 'CRM', 'Google Analytics', 'SEO', 'SEM', 'Excel',
-            'PowerBI', 'Tableau', 'SAP', 'QuickBooks', 'Financial Modeling'
-        ]
-        
-        all_skills = tech_skills + business_skills
-        text = f"{title} {description}".lower()
-        found_skills = []
-        
-        for skill in all_skills:
-            if skill.lower() in text:
-                found_skills.append(skill)
-        
-        return found_skills[:15]
+        return get_skill_matcher().find(f"{title} {description}")
     
     def parse_location(self, location_str: str, country_code: str = '') -> tuple[str, str, str, str]:
         """Enhanced location parsing for international locations"""
         try:
-            location_str = location_str.strip()
-            parts = [part.strip() for part in location_str.split(',')]
-            
-            city = ''
-            region = ''
-            detected_country_code = country_code or 'US'
-            
-            if 'remote' in location_str.lower():
-                return detected_country_code, 'Remote', 'Remote', 'Remote'
-            
-            # Enhanced country detection
-            country_patterns = {
-                'US': ['USA', 'United States', 'US', 'NY', 'CA', 'TX', 'FL', 'IL', 'WA', 'MA'],
-                'IN': ['India', 'IN', 'Mumbai', 'Bangalore', 'Delhi', 'Hyderabad', 'Chennai', 'Pune'],
-                'GB': ['UK', 'United Kingdom', 'England', 'London', 'Manchester', 'Birmingham'],
-                'DE': ['Germany', 'DE', 'Berlin', 'Munich', 'Hamburg', 'Cologne', 'Frankfurt'],
-                'FR': ['France', 'FR', 'Paris', 'Lyon', 'Marseille', 'Toulouse', 'Nice'],
-                'ES': ['Spain', 'ES', 'Madrid', 'Barcelona', 'Valencia', 'Seville'],
-                'IT': ['Italy', 'IT', 'Milan', 'Rome', 'Naples', 'Turin'],
-                'NL': ['Netherlands', 'NL', 'Amsterdam', 'Rotterdam', 'The Hague'],
-                'AU': ['Australia', 'AU', 'Sydney', 'Melbourne', 'Brisbane', 'Perth'],
-                'CA': ['Canada', 'CA', 'Toronto', 'Vancouver', 'Montreal', 'Calgary']
-            }
-            
-            for code, keywords in country_patterns.items():
-                if any(keyword in location_str for keyword in keywords):
-                    detected_country_code = code
-                    break
-            
-            if len(parts) == 1:
-                city = parts[0]
-            elif len(parts) >= 2:
-                city = parts[0]
-                region = parts[1] if len(parts) > 1 else ''
-                
-            city = city.replace(' Area', '').replace(' Metropolitan', '').strip()
-            region = region.replace(' Area', '').replace(' Metropolitan', '').strip()
-            
-            if region and city != region:
-                normalized_location = f"{city}, {region}"
-            else:
-                normalized_location = city
-            
-            return detected_country_code, region, city, normalized_location
-            
+            return get_location_resolver().parse(location_str, country_code)
         except Exception as e:
             print(f"[JOBSPY] Error parsing location '{location_str}': {str(e)}")
             return country_code or 'US', '', location_str, location_str
@@ -293,6 +305,29 @@ class JobSpyIntegration:
         country: str = 'USA'
     ) -> List[Dict[str, Any]]:
         """Enhanced job scraping with better international coverage"""
+        all_jobs = []
+        for jobs in self.iter_job_batches(search_terms, locations, job_sites, results_wanted, country):
+            all_jobs.extend(jobs)
+        return all_jobs
+    
+    def iter_job_batches(
+        self, 
+        search_terms: List[str] = None, 
+        locations: List[str] = None,
+        job_sites: List[str] = None,
+        results_wanted: int = 100,
+        country: str = 'USA',
+        with_units: bool = False,
+        queries: Optional[List[Tuple[str, str]]] = None
+    ) -> Iterator[Any]:
+        """Yield the enriched jobs of each site query as soon as it completes.
+        
+        Work is pulled on demand: while the consumer is busy with one batch no further
+        queries are dispatched, so at most max_workers results are held at a time.
+        With with_units, ((site, search_term, location), newest_posted, jobs) is yielded
+        for every query that succeeded, including those that found nothing new. Explicit
+        (search_term, location) queries replace the rotation over the term/location grid.
+        """
         
         # Use comprehensive search terms if none provided
         if search_terms is None:
@@ -321,261 +356,1109 @@ class JobSpyIntegration:
             else:
                 job_sites = self.COUNTRY_JOB_SITES['global']
         
-        all_jobs = []
+        jobs_found = 0
         successful_searches = 0
         failed_searches = 0
+        self.succeeded_queries = []
+        self.known_skipped = 0
         
         # Reduce results per search to avoid rate limiting
         results_per_search = min(15, results_wanted // len(search_terms))
         
+        # Map country for JobSpy
+        country_mapping = {
+            'USA': 'us', 'INDIA': 'india', 'UK': 'uk', 'GERMANY': 'germany',
+            'FRANCE': 'france', 'SPAIN': 'spain', 'ITALY': 'italy', 'NETHERLANDS': 'netherlands'
+        }
+        # ISO country codes (as sharded runs pass them) are accepted as well as the names above
+        valid_country = country_mapping.get(country.upper()) or INDEED_COUNTRIES.get(country.upper(), 'us')
+        
+        # One unit per (site, term, location) so each site is throttled by its own budget
+        rotation = []
+        if queries:
+            rotation = [(site, search_term, location) for search_term, location in queries for site in job_sites]
+        else:
+            for i, search_term in enumerate(search_terms):
+                # Rotate through locations to distribute load
+                location_batch = locations[i % len(locations):i % len(locations) + 3]  # Use 3 locations per search term
+                for location in location_batch:
+                    for site in job_sites:
+                        rotation.append((site, search_term, location))
+        
+        state = self.scrape_state
+        candidates = list(rotation) if queries else [
+            (site, search_term, location)
+            for search_term in search_terms for location in locations for site in job_sites
+        ]
+        # A resumed run repeats the plan it started with, minus the units it already saved
+        run = state.run(self.run_id) if self.run_id is not None and state is not None and self.checkpoint_runs else None
+        checkpointed = run is not None and run['status'] == 'running'
+        saved_plan = run['plan'] if checkpointed else None
+        if saved_plan is not None:
+            units = [unit for unit, _ in saved_plan]
+            results_for = dict(saved_plan)
+            reserve = [unit for unit in candidates if unit not in results_for and unit not in self.resumed_units]
+            self.plan_stats = {
+                'enabled': self.adaptive_planning,
+                'resumed': True,
+                'planned': len(units),
+                'results_planned': sum(results_for.values())
+            }
+        elif self.adaptive_planning and state is not None:
+            # Choose from every (site, term, location) by the new jobs each query found on earlier runs
+            stats = state.yield_stats(candidates)
+            budget = self.query_budget or len(rotation)
+            planner = QueryPlanner(stats, exploration=self.planner_exploration)
+            plan = planner.plan(candidates, budget, results_per_search)
+            units = [unit for unit, _ in plan]
+            results_for = dict(plan)
+            reserve = sorted(
+                (unit for unit in candidates if unit not in results_for),
+                key=lambda unit: planner.expected_yield(unit) or 0.0, reverse=True
+            )
+            self.plan_stats = {
+                'enabled': True,
+                'candidates': len(candidates),
+                'budget': budget,
+                'planned': len(units),
+                'unexplored': sum(1 for unit in units if unit not in stats),
+                'results_planned': sum(results_for.values())
+            }
+            print(f"[JOBSPY] Planner: {len(units)}/{len(candidates)} queries chosen, {self.plan_stats['unexplored']} without history")
+        else:
+            units = rotation
+            results_for = {unit: results_per_search for unit in units}
+            reserve = [unit for unit in candidates if unit not in results_for]
+            self.plan_stats = {'enabled': False, 'planned': len(units), 'results_planned': results_per_search * len(units)}
+        
+        if checkpointed and saved_plan is None:
+            state.save_run_plan(self.run_id, [(unit, results_for[unit]) for unit in units])
+        if checkpointed and self.resumed_units:
+            units = [unit for unit in units if unit not in self.resumed_units]
+            print(f"[JOBSPY] Resuming run {self.run_id}: {len(self.resumed_units)} queries already saved, {len(units)} left")
+        
         print(f"[JOBSPY] Enhanced scraping: {len(search_terms)} terms, {len(locations)} locations, {results_per_search} results each")
         
-        for i, search_term in enumerate(search_terms):
-            # Rotate through locations to distribute load
-            location_batch = locations[i % len(locations):i % len(locations) + 3]  # Use 3 locations per search term
+        hours_old = 72
+        cache = self.query_cache
+        
+        # Queries that succeeded before only ask for postings since then (plus an overlap)
+        def window_for(unit) -> int:
+            if state is None or not self.incremental:
+                return hours_old
+            return state.delta_hours(*unit, default_hours=hours_old, overlap_hours=self.watermark_overlap_hours)
+        
+        windows = {unit: window_for(unit) for unit in units}
+        if state is not None and self.incremental:
+            narrowed = sum(1 for window in windows.values() if window < hours_old)
+            print(f"[JOBSPY] Incremental: {narrowed}/{len(units)} queries narrowed below {hours_old}h by their watermarks")
+        
+        def cache_key(site: str, search_term: str, location: str) -> str:
+            window = windows[(site, search_term, location)]
+            return cache.key(site, search_term, location, window, valid_country, results_for[(site, search_term, location)])
+        
+        def fetch(site: str, search_term: str, location: str) -> pd.DataFrame:
+            jobs_df = scrape_jobs(
+                site_name=[site],
+                search_term=search_term,
+                location=location,
+                results_wanted=results_for[(site, search_term, location)],
+                hours_old=windows[(site, search_term, location)],
+                country_indeed=valid_country,
+                hyperlinks=True,
+                verbose=0,
+                description_format="html",
+                linkedin_fetch_description=False,
+                enforce_annual_salary=False,
+                easy_apply=False,
+                is_remote=('remote' in location.lower())
+            )
+            if cache is not None:
+                cache.put(cache_key(site, search_term, location), jobs_df)
+            return jobs_df
+        
+        def reroute(unit):
+            # A unit of a cut-off site hands its results budget to the best unplanned query on a healthy site
+            for i, candidate in enumerate(reserve):
+                if not self.site_health.is_open(candidate[0]):
+                    del reserve[i]
+                    results_for[candidate] = results_for[unit]
+                    windows[candidate] = window_for(candidate)
+                    return candidate
+            return None
+        
+        executor = SiteScrapeExecutor(
+            SiteRateLimiter(self.site_rate_limits), max_workers=self.max_workers,
+            health=self.site_health, reroute=reroute
+        )
+        cached_units = set()
+        near_dupes = self.near_duplicates = NearDuplicateIndex() if self.near_dedup else None
+        
+        def record_yield(unit, found: int = 0, new_jobs: int = 0, error: bool = False):
+            # Cached results say nothing new about a query, so only real requests update its history
+            if state is not None and unit not in cached_units:
+                state.record_yield(*unit, found=found, new_jobs=new_jobs, duplicates=found - new_jobs, error=error)
+        
+        def cached_then_fetched():
+            # Cache hits are served first and never touch a site's rate-limit budget
+            misses = []
+            for unit in units:
+                jobs_df = cache.get(cache_key(*unit)) if cache is not None else None
+                if jobs_df is None:
+                    misses.append(unit)
+                else:
+                    cached_units.add(unit)
+                    yield unit, jobs_df, None, 0.0
+            print(f"[JOBSPY] Dispatching {len(misses)} site queries across {self.max_workers} workers ({len(units) - len(misses)} served from cache)")
+            yield from executor.run(misses, fetch)
+        
+        for (site, search_term, location), jobs_df, error, elapsed in cached_then_fetched():
+            completed = successful_searches + failed_searches + 1
+            found = 0 if jobs_df is None else len(jobs_df)
+            self.emit_event(
+                'query', site=site, search_term=search_term, location=location,
+                jobs=found, seconds=round(elapsed, 2), error=str(error) if error is not None else None
+            )
+            self.emit_event('progress', stage='scrape', completed=completed, total=len(units))
             
-            for location in location_batch:
-                try:
-                    print(f"[JOBSPY] Scraping: '{search_term}' in '{location}' ({successful_searches + failed_searches + 1}/{len(search_terms) * 3})")
-                    
-                    # Smart delay to avoid rate limiting
-                    self.smart_delay(2, 4)
-                    
-                    # Map country for JobSpy
-                    country_mapping = {
-                        'USA': 'us', 'INDIA': 'india', 'UK': 'uk', 'GERMANY': 'germany',
-                        'FRANCE': 'france', 'SPAIN': 'spain', 'ITALY': 'italy', 'NETHERLANDS': 'netherlands'
-                    }
-                    valid_country = country_mapping.get(country.upper(), 'us')
-                    
-                    # Enhanced scraping parameters
-                    jobs_df = scrape_jobs(
-                        site_name=job_sites,
-                        search_term=search_term,
-                        location=location,
-                        results_wanted=results_per_search,
-                        hours_old=72,
-                        country_indeed=valid_country,
-                        hyperlinks=True,
-                        verbose=0,
-                        description_format="html",
-                        linkedin_fetch_description=False,
-                        enforce_annual_salary=False,
-                        easy_apply=False,
-                        is_remote=('remote' in location.lower())
-                    )
-                    
-                    if jobs_df is not None and not jobs_df.empty:
-                        print(f"[JOBSPY] Found {len(jobs_df)} jobs for '{search_term}' in '{location}'")
-                        
-                        for _, job in jobs_df.iterrows():
-                            try:
-                                title = str(job.get('title', 'Unknown Position'))
-                                description = str(job.get('description', 'No description available'))
-                                raw_job_location = str(job.get('location', 'Remote')).strip()
-                                job_location = raw_job_location if raw_job_location and raw_job_location.lower() != 'none' else 'Remote'
-                                
-                                # Enhanced data processing
-                                country_code, region, city, normalized_location = self.parse_location(job_location)
-                                basic_skills = self.extract_skills(title, description, '')
-                                category, subcategory = self.categorize_job(title, basic_skills, description)
-                                skills = self.extract_skills(title, description, category)
-                                experience_level = self.determine_experience_level(title, description)
-                                
-                                salary_range, salary_min, salary_max, currency = self.clean_salary(
-                                    job.get('min_amount'), 
-                                    job.get('max_amount'),
-                                    country_code
-                                )
-                                
-                                work_mode = 'remote' if 'remote' in job_location.lower() else 'onsite'
-                                
-                                job_data = {
-                                    'title': title[:255],
-                                    'company': str(job.get('company', 'Unknown Company'))[:255],
-                                    'description': description[:3000],
-                                    'location': normalized_location[:255],
-                                    'work_mode': work_mode,
-                                    'job_type': 'full-time',
-                                    'experience_level': experience_level,
-                                    'salary_range': salary_range,
-                                    'skills': skills,
-                                    'country_code': country_code,
-                                    'region': region[:100],
-                                    'city': city[:100],
-                                    'salary_min': salary_min,
-                                    'salary_max': salary_max,
-                                    'currency': currency,
-                                    'salary_period': 'yearly',
-                                    'source_url': str(job.get('job_url', ''))[:500],
-                                    'source_platform': str(job.get('site', 'unknown'))[:50],
-                                    'external_id': f"{job.get('site', 'unknown')}_{hash(str(job.get('job_url', '')))}",
-                                    'language': 'en',
-                                    'category': category,
-                                    'subcategory': subcategory,
-                                    'tags': skills[:5],
-                                    'scraped_at': datetime.now()
-                                }
-                                all_jobs.append(job_data)
-                                
-                            except Exception as job_error:
-                                print(f"[JOBSPY] Error processing job: {str(job_error)}")
-                                continue
-                        
-                        successful_searches += 1
-                    else:
-                        print(f"[JOBSPY] No jobs found for '{search_term}' in '{location}'")
-                        failed_searches += 1
-                    
-                except Exception as e:
-                    print(f"[JOBSPY] Error scraping '{search_term}' in '{location}': {str(e)}")
-                    failed_searches += 1
-                    continue
+            if isinstance(error, CircuitOpenError):
+                print(f"[JOBSPY] Skipped '{search_term}' in '{location}': {str(error)}")
+                self.metrics.observe_request(site, elapsed, outcome='skipped')
+                failed_searches += 1
+                continue
+            
+            if (site, search_term, location) in cached_units:
+                self.metrics.observe_request(site, elapsed, found, outcome='cached')
+            else:
+                self.metrics.observe_request(site, elapsed, found, outcome=classify_error(error) if error is not None else 'ok')
+            
+            if error is not None:
+                print(f"[JOBSPY] Error scraping '{search_term}' in '{location}' on {site}: {str(error)}")
+                failed_searches += 1
+                record_yield((site, search_term, location), error=True)
+                continue
+            
+            newest = newest_posted(jobs_df)
+            self.succeeded_queries.append(((site, search_term, location), newest))
+            
+            # Raw results as the site returned them, before any enrichment (cached ones were archived when fetched)
+            if self.archive is not None and found and (site, search_term, location) not in cached_units:
+                with self.metrics.stage('archive', rows=found):
+                    self.archive.put(site, search_term, location, valid_country, jobs_df)
+            
+            if found:
+                print(f"[JOBSPY] Found {found} jobs for '{search_term}' in '{location}' on {site} ({completed}/{len(units)})")
+                
+                jobs = self.enrich_jobs(jobs_df)
+                jobs_found += len(jobs)
+                successful_searches += 1
+                enriched_count = len(jobs)
+                
+                # The same posting found on another site (or by another query) earlier in the run is dropped
+                if near_dupes is not None:
+                    with self.metrics.stage('dedup.near', rows=len(jobs)):
+                        unique_jobs = [
+                            job for job in jobs
+                            if near_dupes.match(
+                                job['title'], job['company'], job['city'] or job['location'], job['description'],
+                                label=job['external_id']
+                            ) is None
+                        ]
+                    if len(unique_jobs) < len(jobs):
+                        print(f"[JOBSPY] Dropped {len(jobs) - len(unique_jobs)} near-duplicate jobs for '{search_term}' in '{location}' on {site}")
+                    jobs = unique_jobs
+                
+                # Postings saved by earlier runs are dropped here unless the run refreshes existing rows
+                with self.metrics.stage('dedup.known', rows=len(jobs)):
+                    known = state.known_keys('scraped_jobs', (job['external_id'] for job in jobs)) if state is not None else set()
+                record_yield((site, search_term, location), found=enriched_count, new_jobs=sum(1 for job in jobs if job['external_id'] not in known))
+                if known and self.incremental and self.on_conflict != 'update':
+                    jobs = [job for job in jobs if job['external_id'] not in known]
+                    self.known_skipped += len(known)
+                    print(f"[JOBSPY] Skipped {len(known)} already saved jobs for '{search_term}' in '{location}' on {site}")
+                yield ((site, search_term, location), newest, jobs) if with_units else jobs
+            else:
+                print(f"[JOBSPY] No jobs found for '{search_term}' in '{location}' on {site} ({completed}/{len(units)})")
+                failed_searches += 1
+                record_yield((site, search_term, location))
+                if with_units:
+                    yield (site, search_term, location), newest, []
+        
+        self.execution_stats = executor.stats
         
-        print(f"[JOBSPY] Enhanced scraping completed: {len(all_jobs)} jobs found")
+        print(f"[JOBSPY] Enhanced scraping completed: {jobs_found} jobs found")
         print(f"[JOBSPY] Success rate: {successful_searches}/{successful_searches + failed_searches} searches")
-        return all_jobs
+        print(f"[JOBSPY] Wall clock: {executor.stats['wall_clock_seconds']}s, average concurrency: {executor.stats['average_concurrency']}")
+    
+    def build_job_data(self, job: pd.Series) -> Dict[str, Any]:
+        """Turn one raw JobSpy row into the scraped_jobs record"""
+        title = str(job.get('title', 'Unknown Position'))
+        description = str(job.get('description', 'No description available'))
+        raw_job_location = str(job.get('location', 'Remote')).strip()
+        job_location = raw_job_location if raw_job_location and raw_job_location.lower() != 'none' else 'Remote'
+        
+        # Enhanced data processing
+        country_code, region, city, normalized_location = self.parse_location(job_location)
+        skills = self.extract_skills(title, description)
+        classification = self.classify_job(title, description, skills)
+        
+        salary_range, salary_min, salary_max, currency = self.clean_salary(
+            job.get('min_amount'), 
+            job.get('max_amount'),
+            country_code
+        )
+        
+        work_mode = 'remote' if 'remote' in job_location.lower() else 'onsite'
+        site = str(job.get('site', 'unknown'))[:50]
+        company = str(job.get('company', 'Unknown Company'))[:255]
+        source_url = str(job.get('job_url', ''))[:500]
+        
+        return {
+            'title': title[:255],
+            'company': company,
+            'description': description[:3000],
+            'location': normalized_location[:255],
+            'work_mode': work_mode,
+            'job_type': 'full-time',
+            'experience_level': classification['experience_level'],
+            'salary_range': salary_range,
+            'skills': skills,
+            'country_code': country_code,
+            'region': region[:100],
+            'city': city[:100],
+            'salary_min': salary_min,
+            'salary_max': salary_max,
+            'currency': currency,
+            'salary_period': 'yearly',
+            'source_url': source_url,
+            'source_platform': site,
+            'external_id': stable_external_id(site, source_url, title[:255], company, normalized_location[:255]),
+            'language': 'en',
+            'category': classification['category'],
+            'subcategory': classification['subcategory'],
+            'tags': skills[:5],
+            'scraped_at': datetime.now()
+        }
+    
+    def enrich_jobs(self, jobs_df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Build records for a result frame, falling back to row-by-row if the columnar pass fails"""
+        with self.metrics.stage('enrich', rows=len(jobs_df)):
+            try:
+                return self.enrich_jobs_frame(jobs_df)
+            except Exception as e:
+                print(f"[JOBSPY] Columnar enrichment failed, processing rows individually: {str(e)}")
+                self.metrics.count('enrich_fallbacks')
+            
+            jobs = []
+            for _, job in jobs_df.iterrows():
+                try:
+                    jobs.append(self.build_job_data(job))
+                except Exception as job_error:
+                    print(f"[JOBSPY] Error processing job: {str(job_error)}")
+            return jobs
+    
+    def enrich_jobs_frame(self, jobs_df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Columnar build_job_data: same records, computed per column instead of per row"""
+        if jobs_df is None or jobs_df.empty:
+            return []
+        
+        title = text_column(jobs_df, 'title', 'Unknown Position')
+        description = text_column(jobs_df, 'description', 'No description available')
+        company = text_column(jobs_df, 'company', 'Unknown Company').str[:255]
+        site = text_column(jobs_df, 'site', 'unknown').str[:50]
+        source_url = text_column(jobs_df, 'job_url', '').str[:500]
+        
+        raw_location = text_column(jobs_df, 'location', 'Remote').str.strip()
+        job_location = raw_location.where((raw_location != '') & (raw_location.str.lower() != 'none'), 'Remote')
+        
+        rows = len(jobs_df)
+        
+        # Few distinct locations across many rows: parse each one once
+        with self.metrics.stage('enrich.location', rows=rows):
+            parsed = {location: self.parse_location(location) for location in job_location.unique()}
+            country_code = job_location.map(lambda location: parsed[location][0])
+            region = job_location.map(lambda location: parsed[location][1][:100])
+            city = job_location.map(lambda location: parsed[location][2][:100])
+            normalized_location = job_location.map(lambda location: parsed[location][3][:255])
+        
+        skills, classified = self.derive_fields_frame(title, description)
+        
+        empty = pd.Series([None] * len(jobs_df), index=jobs_df.index, dtype=object)
+        with self.metrics.stage('enrich.salary', rows=rows):
+            salary_range, salary_min, salary_max, currency = clean_salary_frame(
+                jobs_df['min_amount'] if 'min_amount' in jobs_df.columns else empty,
+                jobs_df['max_amount'] if 'max_amount' in jobs_df.columns else empty,
+                country_code
+            )
+        
+        work_mode = np.where(job_location.str.lower().str.contains('remote', regex=False), 'remote', 'onsite')
+        title = title.str[:255]
+        scraped_at = datetime.now()
+        
+        columns = zip(
+            title, company, description.str[:3000], normalized_location, work_mode, classified['experience_level'],
+            salary_range, skills, country_code, region, city, salary_min, salary_max, currency,
+            source_url, site, classified['category'], classified['subcategory']
+        )
+        with self.metrics.stage('enrich.records', rows=rows):
+            return [
+                {
+                    'title': t,
+                    'company': c,
+                    'description': d,
+                    'location': loc,
+                    'work_mode': str(mode),
+                    'job_type': 'full-time',
+                    'experience_level': str(level),
+                    'salary_range': s_range,
+                    'skills': sk,
+                    'country_code': cc,
+                    'region': reg,
+                    'city': ct,
+                    'salary_min': s_min,
+                    'salary_max': s_max,
+                    'currency': cur,
+                    'salary_period': 'yearly',
+                    'source_url': url,
+                    'source_platform': st,
+                    'external_id': stable_external_id(st, url, t, c, loc),
+                    'language': 'en',
+                    'category': str(cat),
+                    'subcategory': str(sub),
+                    'tags': sk[:5],
+                    'scraped_at': scraped_at
+                }
+                for (t, c, d, loc, mode, level, s_range, sk, cc, reg, ct, s_min, s_max, cur,
+                     url, st, cat, sub) in columns
+            ]
+    
+    def derive_fields_frame(self, title: pd.Series, description: pd.Series) -> Tuple[List[List[str]], pd.DataFrame]:
+        """Skills per row, and the category/subcategory/experience_level frame classified from them"""
+        rows = len(title)
+        with self.metrics.stage('enrich.skills', rows=rows):
+            skills = extract_skills_frame(title + ' ' + description)
+        with self.metrics.stage('enrich.classify', rows=rows):
+            classified = get_rule_classifier().classify_frame(title, description, skills)
+        return skills, classified
+    
+    def check_enrichment_parity(self, jobs_df: pd.DataFrame) -> Dict[str, Any]:
+        """Compare enrich_jobs_frame against build_job_data row by row (scraped_at excluded)"""
+        columnar = self.enrich_jobs_frame(jobs_df)
+        mismatches = []
+        
+        for position, (_, job) in enumerate(jobs_df.iterrows()):
+            expected = self.build_job_data(job)
+            actual = columnar[position]
+            for field, value in expected.items():
+                if field != 'scraped_at' and actual.get(field) != value:
+                    mismatches.append({'row': position, 'field': field, 'expected': value, 'actual': actual.get(field)})
+        
+        return {
+            'success': not mismatches,
+            'rows': len(jobs_df),
+            'mismatches': mismatches[:50],
+            'mismatch_count': len(mismatches)
+        }
+    
+    def job_rows(self, jobs: List[Dict[str, Any]]) -> List[tuple]:
+        """scraped_jobs row tuples, in SCRAPED_JOB_COLUMNS order, for enriched job dicts"""
+        now = datetime.now()
+        expires_at = now + timedelta(days=30)
+        return [
+            (
+                job['title'], job['company'], job['description'], job['location'],
+                job['work_mode'], job['job_type'], job['experience_level'], job['salary_range'],
+                job['skills'], job['country_code'], job['region'], job['city'],
+                job['salary_min'], job['salary_max'], job['currency'], job['salary_period'],
+                job['source_url'], job['source_platform'], job['external_id'], job['language'],
+                job['category'], job['subcategory'], job['tags'], job['scraped_at'],
+                expires_at, now, now, True
+            )
+            for job in jobs
+        ]
+    
+    def write_job_rows(self, conn, rows: List[tuple], on_conflict: Optional[str] = None) -> Dict[str, int]:
+        """Upsert scraped_jobs rows on an open connection, keyed on (source_platform, external_id)"""
+        # Existing postings are left alone unless the run asks to refresh them
+        update_columns = self.SCRAPED_JOB_UPDATE_COLUMNS if (on_conflict or self.on_conflict) == 'update' else None
+        return upsert_rows(
+            conn, 'scraped_jobs', self.SCRAPED_JOB_COLUMNS, rows,
+            conflict_columns=('source_platform', 'external_id'),
+            update_columns=update_columns,
+            batch_size=self.save_batch_size,
+            returning=('id', 'source_platform', 'description') if self.hydration else (),
+            on_inserted=self.queue_for_hydration if self.hydration else None
+        )
+    
+    def queue_for_hydration(self, cursor, inserted: List[tuple]):
+        """Queue the newly inserted rows that still need their description fetched"""
+        self.metrics.count('hydration_queued', enqueue_for_hydration(cursor, inserted))
     
-    def save_jobs_to_db(self, jobs: List[Dict[str, Any]]) -> int:
-        """Save scraped jobs to database with enhanced error handling"""
+    def job_writer(self, on_conflict: Optional[str] = None) -> StreamingWriter:
+        """Background writer that upserts job rows while the scrape is still running"""
+        return StreamingWriter(
+            self.get_db_connection, lambda conn, rows: self.write_job_rows(conn, rows, on_conflict),
+            key_positions=[self.SCRAPED_JOB_COLUMNS.index('source_platform'), self.SCRAPED_JOB_COLUMNS.index('external_id')],
+            batch_size=self.save_batch_size,
+            queue_size=self.pipeline_queue_size,
+            release=self.release_db_connection,
+            on_flush=self.remember_saved_rows,
+            on_stored=self.checkpoint_unit
+        )
+    
+    def remember_saved_rows(self, rows: List[tuple], batch_stats: Dict[str, int]):
+        """Record the external ids of a fully written batch in the scrape state"""
+        if self.scrape_state is None or batch_stats.get('failed'):
+            return
+        position = self.SCRAPED_JOB_COLUMNS.index('external_id')
+        self.scrape_state.remember_keys('scraped_jobs', (row[position] for row in rows))
+    
+    def checkpoint_unit(self, tag: tuple, saved: int, failed: bool):
+        """Record a query of the run as done once all its rows are stored, so a resumed run skips it"""
+        if failed or self.scrape_state is None or not self.checkpoint_runs:
+            return
+        unit, newest = tag
+        self.scrape_state.complete_unit(self.run_id, unit, saved, newest)
+    
+    def save_jobs_to_db(self, jobs: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Save scraped jobs in batched upserts keyed on (source_platform, external_id)"""
         if not jobs:
-            return 0
+            return empty_save_stats()
         
-        saved_count = 0
+        rows = self.job_rows(jobs)
         conn = self.get_db_connection()
+        try:
+            return self.write_job_rows(conn, rows)
+        except Exception as e:
+            print(f"[JOBSPY] Database connection error: {str(e)}")
+            conn.rollback()
+            stats = empty_save_stats()
+            stats['failed'] = len(rows)
+            return stats
+        finally:
+            self.release_db_connection(conn)
+    
+    def backfill_external_ids(self, batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, Any]:
+        """One-off migration of existing scraped_jobs rows to stable_external_id.
+
+        Rows are streamed with a server-side cursor in id order. When several old rows map to
+        the same posting, the row already holding the stable id (or else the oldest one) keeps
+        it and the others are deactivated rather than deleted, since user tables reference them.
+        """
+        # The named cursor gets its own connection so the writer's commits cannot close it
+        read_conn = self.db_pool.getconn()
+        write_conn = self.get_db_connection()
+        scanned = updated = deactivated = failed = 0
         
         try:
-            cursor = conn.cursor()
+            # Ids already in the stable format (24 hex chars) are claimed up front
+            claim_cursor = write_conn.cursor()
+            claim_cursor.execute(
+                "SELECT source_platform, external_id FROM scraped_jobs WHERE external_id ~ '_[0-9a-f]{24}$'"
+            )
+            claimed = set(claim_cursor.fetchall())
+            claim_cursor.close()
+            write_conn.commit()
             
-            for job in jobs:
-                try:
-                    # Check if job already exists
-                    cursor.execute(
-                        "SELECT id FROM scraped_jobs WHERE external_id = %s",
-                        (job['external_id'],)
-                    )
-                    
-                    if cursor.fetchone():
+            cursor = read_conn.cursor(name='jobspy_external_id_backfill')
+            cursor.itersize = batch_size
+            cursor.execute("""
+                SELECT id, source_platform, source_url, title, company, location, external_id, is_active
+                FROM scraped_jobs ORDER BY id
+            """)
+            
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                
+                changes = []
+                for row_id, platform, url, title, company, location, external_id, is_active in batch:
+                    scanned += 1
+                    new_id = stable_external_id(platform, url, title, company, location)
+                    if new_id == external_id:
                         continue
-                    
-                    # Enhanced insertion with all fields
-                    insert_query = """
-                    INSERT INTO scraped_jobs (
-                        title, company, description, location, work_mode, job_type,
-                        experience_level, salary_range, skills, 
-                        country_code, region, city, 
-                        salary_min, salary_max, currency, salary_period,
-                        source_url, source_platform, external_id, language,
-                        category, subcategory, tags, last_scraped, expires_at,
-                        created_at, updated_at, is_active
-                    ) VALUES (
-                        %s, %s, %s, %s, %s, %s, %s, %s, %s, 
-                        %s, %s, %s, 
-                        %s, %s, %s, %s,
-                        %s, %s, %s, %s,
-                        %s, %s, %s, %s, %s,
-                        %s, %s, %s
+                    if (platform, new_id) in claimed:
+                        if is_active:
+                            changes.append((row_id, external_id, False))
+                            deactivated += 1
+                        continue
+                    claimed.add((platform, new_id))
+                    changes.append((row_id, new_id, is_active))
+                    updated += 1
+                
+                if changes:
+                    stats = update_rows(
+                        write_conn, 'scraped_jobs', 'id', ['external_id', 'is_active'], changes,
+                        column_types={'id': 'integer', 'external_id': 'varchar', 'is_active': 'boolean'},
+                        batch_size=batch_size
                     )
-                    """
-                    
-                    expires_at = datetime.now() + timedelta(days=30)
-                    
-                    cursor.execute(insert_query, (
-                        job['title'], job['company'], job['description'], job['location'],
-                        job['work_mode'], job['job_type'], job['experience_level'], job['salary_range'],
-                        job['skills'], job['country_code'], job['region'], job['city'],
-                        job['salary_min'], job['salary_max'], job['currency'], job['salary_period'],
-                        job['source_url'], job['source_platform'], job['external_id'], job['language'],
-                        job['category'], job['subcategory'], job['tags'], job['scraped_at'],
-                        expires_at, datetime.now(), datetime.now(), True
-                    ))
-                    
-                    saved_count += 1
-                    
-                except psycopg2.Error as e:
-                    print(f"[JOBSPY] Database error for {job['title']}: {str(e)}")
-                    continue
+                    failed += stats['failed']
+                
+                print(f"[JOBSPY] Backfill progress: {scanned} scanned, {updated} re-keyed, {deactivated} duplicates deactivated")
             
-            conn.commit()
+            cursor.close()
             
-        except Exception as e:
-            print(f"[JOBSPY] Database connection error: {str(e)}")
-            conn.rollback()
         finally:
-            conn.close()
+            self.db_pool.putconn(read_conn)
+            self.release_db_connection(write_conn)
+        
+        return {
+            'success': failed == 0,
+            'scanned': scanned,
+            'updated': updated,
+            'deactivated': deactivated,
+            'failed': failed,
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def reclassify_jobs(self, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Re-derive skills, tags and categories of stored scraped_jobs rows, resuming from the last checkpointed id"""
+        config = config or {}
+        batch_size = int(config.get('batch_size', DEFAULT_BATCH_SIZE))
+        dry_run = config.get('dry_run', False)
+        state = ScrapeState(config.get('state_file', DEFAULT_STATE_FILE))
+        checkpoint_name = f"reclassify:{rules_fingerprint()}"
+        resume_after = 0 if config.get('restart') else int(state.checkpoint(checkpoint_name) or 0)
+        self.metrics = self.db_pool.metrics = ScrapeMetrics()
+        derived = ['skills', 'tags', 'category', 'subcategory', 'experience_level']
+        
+        # The named cursor gets its own connection so the writer's commits cannot close it
+        read_conn = self.db_pool.getconn()
+        write_conn = self.get_db_connection()
+        scanned = changed = failed = 0
+        last_id = checkpoint = resume_after
+        started = time.monotonic()
+        if resume_after:
+            print(f"[JOBSPY] Reclassification resuming after id {resume_after}")
+        
+        try:
+            cursor = read_conn.cursor(name='jobspy_reclassify')
+            cursor.itersize = batch_size
+            cursor.execute(f"""
+                SELECT id, title, description, {', '.join(derived)}
+                FROM scraped_jobs WHERE id > %s ORDER BY id
+            """, (resume_after,))
+            
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                
+                frame = pd.DataFrame(batch, columns=['id', 'title', 'description'] + derived)
+                frame = frame.fillna({'title': 'Unknown Position', 'description': 'No description available'})
+                skills, classified = self.derive_fields_frame(
+                    text_column(frame, 'title', 'Unknown Position'), text_column(frame, 'description', 'No description available')
+                )
+                
+                now = datetime.now()
+                changes = []
+                for row, new_skills, category, subcategory, level in zip(
+                    frame.itertuples(index=False), skills, classified['category'], classified['subcategory'], classified['experience_level']
+                ):
+                    new_fields = (new_skills, new_skills[:5], str(category), str(subcategory), str(level))
+                    old_fields = (list(row.skills or []), list(row.tags or []), row.category, row.subcategory, row.experience_level)
+                    if new_fields != old_fields:
+                        changes.append((row.id, *new_fields, now))
+                scanned += len(batch)
+                changed += len(changes)
+                last_id = batch[-1][0]
+                
+                if changes and not dry_run:
+                    stats = update_rows(
+                        write_conn, 'scraped_jobs', 'id', derived + ['updated_at'], changes,
+                        column_types={
+                            'id': 'integer', 'skills': 'text[]', 'tags': 'text[]', 'category': 'varchar',
+                            'subcategory': 'varchar', 'experience_level': 'varchar', 'updated_at': 'timestamp'
+                        },
+                        batch_size=batch_size
+                    )
+                    failed += stats['failed']
+                
+                # The checkpoint only moves while every batch so far was written in full
+                if not dry_run and not failed:
+                    checkpoint = last_id
+                    state.save_checkpoint(checkpoint_name, str(checkpoint))
+                
+                rate = scanned / max(time.monotonic() - started, 1e-9)
+                print(f"[JOBSPY] Reclassification progress: {scanned} scanned, {changed} changed, through id {last_id} ({rate:.0f} rows/s)")
+            
+            cursor.close()
+        
+        finally:
+            self.db_pool.putconn(read_conn)
+            self.release_db_connection(write_conn)
+        
+        # A finished backfill leaves no checkpoint behind, so the next one covers the whole table again
+        completed = failed == 0
+        if completed and not dry_run:
+            state.clear_checkpoint(checkpoint_name)
+        state.close()
         
-        return saved_count
+        return {
+            'success': completed,
+            'dry_run': dry_run,
+            'resumed_after': resume_after or None,
+            'scanned': scanned,
+            'changed': changed,
+            'failed': failed,
+            'checkpoint': None if completed or dry_run else checkpoint,
+            'wall_clock_seconds': round(time.monotonic() - started, 2),
+            'metrics': self.metrics.snapshot(),
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def replay_archive(self, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Re-run enrichment and saving over archived raw results, newest first, with no scraping"""
+        config = config or {}
+        if not PARQUET_AVAILABLE:
+            return {
+                'success': False,
+                'error': "pyarrow is required to read the archive. Please install: pip install pyarrow",
+                'timestamp': datetime.now().isoformat()
+            }
+        
+        archive = RawArchive(config.get('archive_dir', DEFAULT_ARCHIVE_DIR), retention_days=None)
+        since = date.fromisoformat(config['since']) if config.get('since') else None
+        until = date.fromisoformat(config['until']) if config.get('until') else None
+        dry_run = config.get('dry_run', False)
+        self.on_conflict = config.get('on_conflict', 'update')
+        self.save_batch_size = config.get('save_batch_size', self.save_batch_size)
+        # New rows are still queued for hydration; fetching is left to a scrape or --hydrate-descriptions
+        self.hydration = DescriptionHydrator.from_config(self, config)
+        self.metrics = self.db_pool.metrics = ScrapeMetrics()
+        
+        print(f"[JOBSPY] Replaying {len(archive.files(since, until, config.get('sites')))} archived files from {archive.directory}{' (dry run)' if dry_run else ''}")
+        counts = Counter()
+        near_dupes = None
+        current_day = None
+        # Rows without a description (LinkedIn) are only inserted, so a hydrated description is not overwritten
+        writers = None if dry_run else {'described': self.job_writer(), 'bare': self.job_writer('nothing')}
+        started = time.monotonic()
+        try:
+            for day, site, jobs_df in archive.frames(since, until, config.get('sites'), newest_first=True):
+                if config.get('near_dedup', True) and day != current_day:
+                    near_dupes = NearDuplicateIndex()
+                    current_day = day
+                counts['files'] += 1
+                counts['raw_rows'] += len(jobs_df)
+                
+                jobs = self.enrich_jobs(jobs_df)
+                counts['enriched'] += len(jobs)
+                if near_dupes is not None:
+                    with self.metrics.stage('dedup.near', rows=len(jobs)):
+                        unique_jobs = [
+                            job for job in jobs
+                            if near_dupes.match(
+                                job['title'], job['company'], job['city'] or job['location'], job['description'],
+                                label=job['external_id']
+                            ) is None
+                        ]
+                    counts['near_duplicates'] += len(jobs) - len(unique_jobs)
+                    jobs = unique_jobs
+                
+                if writers is not None:
+                    writers['described'].put(self.job_rows([job for job in jobs if not description_missing(job['description'])]))
+                    writers['bare'].put(self.job_rows([job for job in jobs if description_missing(job['description'])]))
+                if counts['files'] % 50 == 0:
+                    print(f"[JOBSPY] Replay progress: {counts['files']} files, {counts['enriched']} jobs enriched")
+        finally:
+            save_stats = Counter()
+            for writer in (writers or {}).values():
+                save_stats.update(writer.close())
+        
+        seconds = time.monotonic() - started
+        print(f"[JOBSPY] Replay completed: {counts['enriched']} jobs from {counts['files']} files in {seconds:.1f}s")
+        return {
+            'success': save_stats['failed'] == 0,
+            'dry_run': dry_run,
+            'files': counts['files'],
+            'raw_rows': counts['raw_rows'],
+            'enriched_count': counts['enriched'],
+            'near_duplicates': counts['near_duplicates'],
+            'saved_count': save_stats['inserted'],
+            'updated_count': save_stats['updated'],
+            'skipped_count': save_stats['skipped'],
+            'failed_count': save_stats['failed'],
+            'wall_clock_seconds': round(seconds, 2),
+            'rows_per_second': round(counts['raw_rows'] / seconds, 1) if seconds > 0 else None,
+            'metrics': self.metrics.snapshot(),
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def run_grid(self, config: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+        """Search terms and locations of a run: the configured ones, or the default international slice"""
+        # Enhanced default configuration for international markets
+        search_terms = config.get('search_terms', 
+            self.ENHANCED_SEARCH_TERMS['tech'][:8] + 
+            self.ENHANCED_SEARCH_TERMS['business'][:4] + 
+            self.ENHANCED_SEARCH_TERMS['entry_level'][:3]
+        )
+        
+        locations = config.get('locations',
+            self.ENHANCED_LOCATIONS['india'][:6] + 
+            self.ENHANCED_LOCATIONS['usa'][:6] + 
+            self.ENHANCED_LOCATIONS['europe'][:6]
+        )
+        return search_terms, locations
     
     def run_scraping(self, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Enhanced scraping process with international focus"""
         if config is None:
             config = {}
+        self.run_id = config.get('run_id') or new_run_id()
         
         try:
-            # Enhanced default configuration for international markets
-            search_terms = config.get('search_terms', 
-                self.ENHANCED_SEARCH_TERMS['tech'][:8] + 
-                self.ENHANCED_SEARCH_TERMS['business'][:4] + 
-                self.ENHANCED_SEARCH_TERMS['entry_level'][:3]
-            )
-            
-            locations = config.get('locations',
-                self.ENHANCED_LOCATIONS['india'][:6] + 
-                self.ENHANCED_LOCATIONS['usa'][:6] + 
-                self.ENHANCED_LOCATIONS['europe'][:6]
-            )
-            
+            search_terms, locations = self.run_grid(config)
             job_sites = config.get('job_sites', ['indeed', 'linkedin'])
             results_wanted = config.get('results_wanted', 150)  # Increased for better coverage
             country = config.get('country', 'USA')
+            self.max_workers = config.get('max_workers', self.max_workers)
+            self.site_rate_limits = config.get('site_rate_limits', self.site_rate_limits)
+            self.site_health = SiteHealthMonitor.from_config(config)
+            self.save_batch_size = config.get('save_batch_size', self.save_batch_size)
+            self.on_conflict = config.get('on_conflict', self.on_conflict)
+            self.pipeline_queue_size = config.get('pipeline_queue_size', self.pipeline_queue_size)
+            self.query_cache = ScrapeCache.from_config(config)
+            self.watermark_overlap_hours = config.get('watermark_overlap_hours', self.watermark_overlap_hours)
+            self.incremental = config.get('incremental', True)
+            self.adaptive_planning = config.get('adaptive_planning', True)
+            self.query_budget = config.get('query_budget')
+            self.planner_exploration = config.get('planner_exploration', DEFAULT_EXPLORATION)
+            self.near_dedup = config.get('near_dedup', True)
+            self.checkpoint_runs = config.get('checkpoint', True)
+            self.hydration = DescriptionHydrator.from_config(self, config)
+            self.archive = RawArchive.from_config(config)
+            if self.archive is not None:
+                self.archive.prune()
+            self.metrics = self.db_pool.metrics = ScrapeMetrics()
+            if self.scrape_state is not None:
+                self.scrape_state.close()
+                self.scrape_state = None
+            if self.incremental or self.adaptive_planning or self.checkpoint_runs:
+                self.scrape_state = ScrapeState(config.get('state_file', DEFAULT_STATE_FILE))
+                if config.get('reset_watermarks'):
+                    self.scrape_state.reset()
+                self.scrape_state.prune()
             
-            print(f"[JOBSPY] Enhanced international scraping: {len(search_terms)} terms, {len(locations)} locations")
+            # A run id seen before is a resume: the units it already saved are skipped
+            self.resumed_units = {}
+            checkpointing = self.scrape_state is not None and self.checkpoint_runs
+            if checkpointing:
+                if self.scrape_state.run(self.run_id) is not None:
+                    self.resumed_units = self.scrape_state.completed_units(self.run_id)
+                self.scrape_state.start_run(self.run_id, config)
             
-            # Enhanced scraping
-            scraped_jobs = self.scrape_jobs_enhanced(
-                search_terms=search_terms,
-                locations=locations,
-                job_sites=job_sites,
-                results_wanted=results_wanted,
-                country=country
-            )
+            print(f"[JOBSPY] Enhanced international scraping: {len(search_terms)} terms, {len(locations)} locations (run {self.run_id})")
+            
+            # Scrape and save as one stream: each query's jobs are written while the next ones are fetched
+            scraped_count = 0
+            countries = Counter()
+            writer = self.job_writer()
+            try:
+                for unit, newest, jobs in self.iter_job_batches(
+                    search_terms=search_terms,
+                    locations=locations,
+                    job_sites=job_sites,
+                    results_wanted=results_wanted,
+                    country=country,
+                    with_units=True,
+                    queries=[tuple(query) for query in config.get('queries') or []]
+                ):
+                    scraped_count += len(jobs)
+                    countries.update(job['country_code'] for job in jobs)
+                    # The unit is checkpointed by the writer once its last row is stored
+                    writer.put(self.job_rows(jobs), tag=(unit, newest) if checkpointing else None)
+            finally:
+                self.emit_event('progress', stage='save', jobs=scraped_count)
+                save_stats = writer.close()
+                if self.archive is not None:
+                    self.archive.close()
+            saved_count = save_stats['inserted']
             
-            # Save to database
-            saved_count = self.save_jobs_to_db(scraped_jobs)
+            # Watermarks only advance when every row of the run reached the database,
+            # otherwise the next run's narrower window could miss the lost postings
+            if self.scrape_state is not None and self.incremental:
+                if save_stats['failed'] == 0:
+                    # Queries saved before an interruption advance as of when they were scraped
+                    for unit, done in self.resumed_units.items():
+                        self.scrape_state.record_success(*unit, done['newest_posted'], done['completed_at'])
+                    for (site, search_term, location), newest in self.succeeded_queries:
+                        self.scrape_state.record_success(site, search_term, location, newest)
+                else:
+                    print(f"[JOBSPY] {save_stats['failed']} rows failed to save, watermarks left unchanged")
+            
+            # Units whose rows failed to save were not checkpointed, so resuming the run retries them
+            if checkpointing:
+                self.scrape_state.finish_run(self.run_id, 'completed' if save_stats['failed'] == 0 else 'incomplete')
+            
+            # Descriptions the search results lacked, fetched once per new posting within a time budget
+            hydration_stats = None
+            if self.hydration is not None and self.hydration.max_seconds > 0:
+                self.emit_event('progress', stage='hydrate')
+                try:
+                    hydration_stats = self.hydration.run()
+                except Exception as e:
+                    # The scraped rows are saved by now; a failed hydration only leaves the queue for later
+                    print(f"[JOBSPY] Description hydration failed: {str(e)}")
+                    hydration_stats = {'error': str(e)}
             
             result = {
                 'success': True,
-                'scraped_count': len(scraped_jobs),
+                'run_id': self.run_id,
+                'scraped_count': scraped_count,
                 'saved_count': saved_count,
+                'updated_count': save_stats['updated'],
+                'skipped_count': save_stats['skipped'],
+                'failed_count': save_stats['failed'],
                 'search_terms': search_terms,
                 'locations': locations,
                 'job_sites': job_sites,
+                'wall_clock_seconds': self.execution_stats.get('wall_clock_seconds'),
+                'concurrency': {
+                    'max_workers': self.execution_stats.get('max_workers'),
+                    'peak': self.execution_stats.get('peak_concurrency'),
+                    'average': self.execution_stats.get('average_concurrency')
+                },
                 'coverage': {
-                    'india_jobs': len([j for j in scraped_jobs if j.get('country_code') == 'IN']),
-                    'usa_jobs': len([j for j in scraped_jobs if j.get('country_code') == 'US']),
-                    'europe_jobs': len([j for j in scraped_jobs if j.get('country_code') in ['GB', 'DE', 'FR', 'ES', 'IT', 'NL']])
+                    'india_jobs': countries['IN'],
+                    'usa_jobs': countries['US'],
+                    'europe_jobs': sum(count for code, count in countries.items() if code in EUROPE_COUNTRY_CODES)
+                },
+                'location_cache': get_location_resolver().stats(),
+                'query_cache': self.query_cache.stats() if self.query_cache else None,
+                'db_pool': self.db_pool.stats(),
+                'incremental': {
+                    'enabled': self.scrape_state is not None and self.incremental,
+                    'known_skipped': self.known_skipped,
+                    'watermarks_advanced': len(self.succeeded_queries) if self.scrape_state and self.incremental and save_stats['failed'] == 0 else 0
                 },
+                'planner': self.plan_stats,
+                'resumed': {
+                    'units': len(self.resumed_units),
+                    'saved_count': sum(done['saved'] for done in self.resumed_units.values())
+                } if self.resumed_units else None,
+                'site_health': {
+                    'sites': self.site_health.stats(),
+                    'rerouted_units': self.execution_stats.get('rerouted_units'),
+                    'skipped_units': self.execution_stats.get('skipped_units')
+                } if self.site_health else None,
+                'near_duplicates': self.near_duplicates.stats() if self.near_duplicates else None,
+                'hydration': hydration_stats,
+                'archive': self.archive.stats() if self.archive else None,
+                'metrics': self.metrics.snapshot(),
                 'timestamp': datetime.now().isoformat()
             }
             
-            print(f"[JOBSPY] Enhanced scraping completed: {saved_count}/{len(scraped_jobs)} jobs saved")
+            # Prometheus text format for node_exporter's textfile collector (or anything else that scrapes files)
+            if config.get('metrics_file'):
+                try:
+                    self.metrics.write_prometheus(config['metrics_file'])
+                except OSError as e:
+                    print(f"[JOBSPY] Could not write metrics to {config['metrics_file']}: {str(e)}")
+            
+            print(f"[JOBSPY] Enhanced scraping completed: {saved_count}/{scraped_count} jobs saved")
+            # Sub-stages ('enrich.skills') only add up to a total where the stage has no entry of its own
+            stages = result['metrics']['stages']
+            stage_seconds = Counter()
+            for name, stage in stages.items():
+                if '.' not in name or name.split('.')[0] not in stages:
+                    stage_seconds[name.split('.')[0]] += stage['seconds']
+            print("[JOBSPY] Stage time: " + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in stage_seconds.most_common()))
             print(f"[JOBSPY] Geographic coverage: India: {result['coverage']['india_jobs']}, USA: {result['coverage']['usa_jobs']}, Europe: {result['coverage']['europe_jobs']}")
             return result
             
         except Exception as e:
             error_msg = f"Error during enhanced scraping: {str(e)}\n{traceback.format_exc()}"
             print(f"[JOBSPY] {error_msg}")
+            if self.scrape_state is not None and self.checkpoint_runs:
+                try:
+                    self.scrape_state.finish_run(self.run_id, 'failed')
+                except Exception:
+                    pass
             return {
                 'success': False,
+                'run_id': self.run_id,
                 'error': error_msg,
                 'timestamp': datetime.now().isoformat()
             }
+    
+    def resume_scraping(self, run_id: str, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Continue an interrupted run with its original config, skipping the queries it already saved"""
+        overrides = overrides or {}
+        state = ScrapeState(overrides.get('state_file', DEFAULT_STATE_FILE))
+        try:
+            run = state.run(run_id)
+        finally:
+            state.close()
+        if run is None or run['status'] == 'completed':
+            error = f"Unknown run id {run_id}" if run is None else f"Run {run_id} already completed"
+            return {'success': False, 'run_id': run_id, 'error': error, 'timestamp': datetime.now().isoformat()}
+        
+        config = {**run['config'], **overrides, 'run_id': run_id}
+        # Watermarks were reset when the run first started; doing it again would forget what it saved since
+        config.pop('reset_watermarks', None)
+        print(f"[JOBSPY] Resuming run {run_id} ({run['status']}, started {run['started_at']})")
+        return self.run_scraping(config)
+
+def ndjson_writer(stream: TextIO) -> Callable[[Dict[str, Any]], None]:
+    """Writer for the NDJSON protocol: one JSON object per line, flushed as soon as it is written"""
+    def write(message: Dict[str, Any]):
+        stream.write(json.dumps(message, default=str) + '\n')
+        stream.flush()
+    return write
+
+
+def queue_only_hydration(config: Dict[str, Any]) -> Dict[str, Any]:
+    """config with description hydration only queueing rows, unless it sets 'hydrate_descriptions' itself"""
+    return {'hydrate_descriptions': {'max_seconds': 0}, **config}
+
+
+def run_ndjson(config: Dict[str, Any], protocol: Optional[TextIO] = None) -> Dict[str, Any]:
+    """Run one scrape, writing typed NDJSON lines to stdout and logs to stderr"""
+    protocol = protocol or sys.stdout
+    write = ndjson_writer(protocol)
+    console = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        scraper = JobSpyIntegration()
+        scraper.event_sink = write
+        result = scraper.run_scraping(queue_only_hydration(config))
+    except Exception as e:
+        result = {
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }
+    finally:
+        sys.stdout = console
+    write({'type': 'result', 'result': result})
+    return result
+
+
+def run_worker(incoming: Optional[TextIO] = None, protocol: Optional[TextIO] = None):
+    """Serve {"id", "config"} scrape jobs read from stdin with run_ndjson's protocol until stdin closes"""
+    incoming = incoming or sys.stdin
+    write = ndjson_writer(protocol or sys.stdout)
+    console = sys.stdout
+    sys.stdout = sys.stderr
+    
+    scraper = JobSpyIntegration()
+    get_skill_matcher()
+    get_rule_classifier()
+    get_location_resolver()
+    try:
+        scraper.release_db_connection(scraper.get_db_connection())
+    except psycopg2.Error as e:
+        print(f"[JOBSPY] Worker could not open its database connection yet: {str(e)}")
+    
+    write({'type': 'ready', 'pid': os.getpid()})
+    print(f"[JOBSPY] Worker {os.getpid()} ready")
+    
+    try:
+        for line in incoming:
+            line = line.strip()
+            if not line:
+                continue
+            
+            job_id = None
+            try:
+                request = json.loads(line)
+                job_id = request.get('id')
+                scraper.event_sink = lambda event, job_id=job_id: write({**event, 'id': job_id})
+                result = scraper.run_scraping(queue_only_hydration(request.get('config') or {}))
+            except Exception as e:
+                result = {
+                    'success': False,
+                    'error': f"Invalid worker request: {str(e)}",
+                    'timestamp': datetime.now().isoformat()
+                }
+            write({'type': 'result', 'id': job_id, 'result': result})
+    finally:
+        scraper.close()
+        sys.stdout = console
+
 
 def main():
     """Enhanced CLI interface for international JobSpy scraping"""
     try:
         config = {}
         
+        if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+            # Long-running mode: one process serves many scrape jobs from stdin
+            run_worker()
+            sys.exit(0)
+        
+        if len(sys.argv) > 1 and sys.argv[1] == '--ndjson':
+            # Machine-readable mode: typed NDJSON events and result on stdout, logs on stderr
+            try:
+                config = json.loads(sys.argv[2]) if len(sys.argv) > 2 else {}
+            except json.JSONDecodeError:
+                print("Invalid JSON config provided, using enhanced defaults", file=sys.stderr)
+            result = run_ndjson(config)
+            sys.exit(0 if result['success'] else 1)
+        
+        if len(sys.argv) > 2 and sys.argv[1] == '--resume':
+            # Continue an interrupted run (e.g. killed by a restart or deploy) from its checkpoint
+            overrides = json.loads(sys.argv[3]) if len(sys.argv) > 3 else {}
+            scraper = JobSpyIntegration()
+            try:
+                result = scraper.resume_scraping(sys.argv[2], overrides)
+            finally:
+                scraper.close()
+            print(json.dumps(result, indent=2))
+            sys.exit(0 if result['success'] else 1)
+        
+        if len(sys.argv) > 1 and sys.argv[1] == '--backfill-external-ids':
+            # One-off: re-key existing rows with stable external ids
+            batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_BATCH_SIZE
+            result = JobSpyIntegration().backfill_external_ids(batch_size)
+            print(json.dumps(result, indent=2))
+            sys.exit(0 if result['success'] else 1)
+        
+        if len(sys.argv) > 1 and sys.argv[1] == '--reclassify':
+            # Re-derive skills/category/experience of stored rows after the rule tables change
+            config = json.loads(sys.argv[2]) if len(sys.argv) > 2 else {}
+            result = JobSpyIntegration().reclassify_jobs(config)
+            print(json.dumps(result, indent=2))
+            sys.exit(0 if result['success'] else 1)
+        
+        if len(sys.argv) > 1 and sys.argv[1] == '--hydrate-descriptions':
+            # Work through the description queue outside a scrape, e.g. from cron after a large run
+            limit = int(sys.argv[2]) if len(sys.argv) > 2 else None
+            scraper = JobSpyIntegration()
+            hydrator = DescriptionHydrator(scraper, max_seconds=float('inf'))
+            try:
+                result = {'success': True, **hydrator.run(limit)}
+            finally:
+                scraper.close()
+            print(json.dumps(result, indent=2))
+            sys.exit(0 if result['success'] else 1)
+        
+        if len(sys.argv) > 1 and sys.argv[1] == '--replay':
+            # Offline: enrich and save archived raw results again, e.g. after the classification rules changed
+            replay_config = json.loads(sys.argv[2]) if len(sys.argv) > 2 else {}
+            scraper = JobSpyIntegration()
+            try:
+                result = scraper.replay_archive(replay_config)
+            finally:
+                scraper.close()
+            print(json.dumps(result, indent=2, default=str))
+            sys.exit(0 if result['success'] else 1)
+        
+        if len(sys.argv) > 2 and sys.argv[1] == '--check-enrichment-parity':
+            # Parity check of the columnar enrichment against the per-row helpers on a saved frame
+            path = sys.argv[2]
+            if path.endswith('.csv'):
+                jobs_df = pd.read_csv(path)
+            elif path.endswith('.json'):
+                jobs_df = pd.read_json(path)
+            else:
+                jobs_df = pd.read_pickle(path)
+            result = JobSpyIntegration().check_enrichment_parity(jobs_df)
+            print(json.dumps(result, indent=2, default=str))
+            sys.exit(0 if result['success'] else 1)
+        
         if len(sys.argv) > 1:
             try:
                 config = json.loads(sys.argv[1])
@@ -0,0 +1,425 @@
+"""
+Sharded JobSpy runs
+The query grid of a run is split into shards by country (and optionally by site), each
+scraped with its own Indeed/Glassdoor country. Shards run in a local process pool, or are
+queued in Postgres and claimed by workers on any number of nodes with FOR UPDATE SKIP LOCKED.
+Either way the shard results are merged into one run report.
+"""
+
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional
+
+import psycopg2
+from psycopg2.extras import Json, execute_values
+
+from jobspy_db import DatabasePool
+from jobspy_enrichment import EUROPE_COUNTRY_CODES, get_location_resolver
+from jobspy_metrics import ScrapeMetrics
+from jobspy_scraper import JobSpyIntegration
+from jobspy_state import new_run_id
+from jobspy_throttle import SiteRateLimiter
+
+SHARD_MODES = ('region', 'site')
+DEFAULT_PROCESSES = 4
+QUEUE_TABLE = 'jobspy_shard_queue'
+# A claimed shard whose worker stops heartbeating for this long is handed to another worker
+DEFAULT_LEASE_SECONDS = 600
+DEFAULT_MAX_ATTEMPTS = 3
+# Locations whose country cannot be told apart ('Remote Europe') share one shard on the run's own country
+UNPLACED_SHARD = 'other'
+
+COUNT_FIELDS = ('scraped_count', 'saved_count', 'updated_count', 'skipped_count', 'failed_count')
+
+
+def region_for(country_code: Optional[str]) -> str:
+    """Key of JobSpyIntegration.COUNTRY_JOB_SITES for an ISO country code"""
+    if country_code == 'IN':
+        return 'india'
+    if country_code == 'US':
+        return 'usa'
+    if country_code in EUROPE_COUNTRY_CODES:
+        return 'europe'
+    return 'global'
+
+
+def plan_shards(scraper: JobSpyIntegration, config: Dict[str, Any], shard_by: str = 'region') -> List[Dict[str, Any]]:
+    """Split a run's config into independent shard configs.
+
+    Locations are grouped by the country they name and each group becomes a shard scraped
+    with that country and, unless job_sites is configured, the sites of its region.
+    shard_by='site' splits every country shard further into one shard per site. The
+    query budget is shared out by shard size and each site's rate budget is divided
+    between the shards that use it, so the shards together stay within the run's limits.
+    """
+    if shard_by not in SHARD_MODES:
+        raise ValueError(f"shard_by must be one of {', '.join(SHARD_MODES)}, not {shard_by!r}")
+
+    search_terms, locations = scraper.run_grid(config)
+    resolver = get_location_resolver()
+    groups: Dict[str, List[str]] = OrderedDict()
+    for location in locations:
+        groups.setdefault(resolver.detect_country(location) or UNPLACED_SHARD, []).append(location)
+
+    shards = []
+    for code, group in groups.items():
+        placed = code != UNPLACED_SHARD
+        job_sites = config.get('job_sites') or scraper.COUNTRY_JOB_SITES[region_for(code if placed else None)]
+        site_groups = [[site] for site in job_sites] if shard_by == 'site' else [list(job_sites)]
+        for sites in site_groups:
+            shards.append({
+                'shard_id': code if shard_by == 'region' else f"{code}:{sites[0]}",
+                'country': code if placed else config.get('country', 'USA'),
+                'locations': group,
+                'job_sites': sites,
+            })
+
+    units = {shard['shard_id']: len(shard['locations']) * len(shard['job_sites']) for shard in shards}
+    total_units = sum(units.values()) or 1
+    site_shares = Counter(site for shard in shards for site in shard['job_sites'])
+    budgets = SiteRateLimiter(config.get('site_rate_limits')).budgets
+
+    for shard in shards:
+        shard_config = {key: value for key, value in config.items() if key not in ('shard_by', 'processes', 'metrics_file')}
+        shard_config.update(
+            search_terms=search_terms,
+            locations=shard['locations'],
+            job_sites=shard['job_sites'],
+            country=shard['country'],
+            site_rate_limits={
+                site: {
+                    'rate': budgets[site]['rate'] / site_shares[site],
+                    'burst': max(1, budgets[site]['burst'] / site_shares[site]),
+                }
+                for site in shard['job_sites'] if site in budgets
+            },
+        )
+        if config.get('query_budget'):
+            shard_config['query_budget'] = max(1, round(config['query_budget'] * units[shard['shard_id']] / total_units))
+        shard['config'] = shard_config
+    return shards
+
+
+def run_shard(shard_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Scrape one shard in this process (the process pool's task, so it stays a module-level function)"""
+    try:
+        scraper = JobSpyIntegration()
+    except Exception as e:
+        return {'success': False, 'error': str(e), 'timestamp': datetime.now().isoformat()}
+    try:
+        return scraper.run_scraping(shard_config)
+    finally:
+        scraper.close()
+
+
+def _ordered_union(lists) -> List[Any]:
+    return list(OrderedDict.fromkeys(item for items in lists for item in (items or [])))
+
+
+def _shard_summary(shard: Dict[str, Any], result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    result = result or {'success': False, 'error': 'not finished'}
+    return {
+        'shard_id': shard['shard_id'],
+        'country': shard['country'],
+        'locations': len(shard['locations']),
+        'job_sites': shard['job_sites'],
+        'success': bool(result.get('success')),
+        'scraped_count': result.get('scraped_count'),
+        'saved_count': result.get('saved_count'),
+        'wall_clock_seconds': result.get('wall_clock_seconds'),
+        'error': result.get('error'),
+    }
+
+
+def merge_shard_results(
+    shards: List[Dict[str, Any]],
+    results: Dict[str, Dict[str, Any]],
+    wall_clock_seconds: Optional[float] = None,
+) -> Dict[str, Any]:
+    """One run report from the results of a run's shards, keyed by shard_id"""
+    finished = [results[shard['shard_id']] for shard in shards if shard['shard_id'] in results]
+    succeeded = [result for result in finished if result.get('success')]
+
+    merged: Dict[str, Any] = {
+        'success': len(succeeded) == len(shards),
+        **{field: sum(result.get(field) or 0 for result in succeeded) for field in COUNT_FIELDS},
+        'search_terms': _ordered_union(result.get('search_terms') for result in succeeded),
+        'locations': _ordered_union(shard['locations'] for shard in shards),
+        'job_sites': _ordered_union(shard['job_sites'] for shard in shards),
+        'wall_clock_seconds': wall_clock_seconds if wall_clock_seconds is not None else max(
+            (result.get('wall_clock_seconds') or 0 for result in succeeded), default=None
+        ),
+        'coverage': dict(sum((Counter(result.get('coverage') or {}) for result in succeeded), Counter())),
+        'metrics': ScrapeMetrics.merged(result['metrics'] for result in succeeded if result.get('metrics')).snapshot(),
+        'shards': [_shard_summary(shard, results.get(shard['shard_id'])) for shard in shards],
+        'timestamp': datetime.now().isoformat(),
+    }
+    for coverage in ('india_jobs', 'usa_jobs', 'europe_jobs'):
+        merged['coverage'].setdefault(coverage, 0)
+    if wall_clock_seconds is not None:
+        merged['metrics']['elapsed_seconds'] = wall_clock_seconds
+    return merged
+
+
+def run_sharded(config: Dict[str, Any], processes: Optional[int] = None) -> Dict[str, Any]:
+    """Scrape a run's shards side by side in a local process pool and merge their results"""
+    scraper = JobSpyIntegration()
+    try:
+        shards = plan_shards(scraper, config, config.get('shard_by', 'region'))
+    finally:
+        scraper.close()
+    processes = max(1, min(len(shards), processes or config.get('processes') or DEFAULT_PROCESSES))
+    print(f"[JOBSPY] Sharded run: {len(shards)} shards ({', '.join(shard['shard_id'] for shard in shards)}) on {processes} processes")
+
+    started = time.monotonic()
+    results: Dict[str, Dict[str, Any]] = {}
+    # spawn, not fork: the parent holds database connections and jobspy's HTTP sessions
+    with ProcessPoolExecutor(max_workers=processes, mp_context=get_context('spawn')) as pool:
+        futures = {pool.submit(run_shard, shard['config']): shard['shard_id'] for shard in shards}
+        for future in as_completed(futures):
+            shard_id = futures[future]
+            try:
+                results[shard_id] = future.result()
+            except Exception as e:
+                results[shard_id] = {'success': False, 'error': f"Shard process failed: {str(e)}"}
+            print(f"[JOBSPY] Shard {shard_id} finished: {'ok' if results[shard_id].get('success') else results[shard_id].get('error')}")
+
+    merged = merge_shard_results(shards, results, round(time.monotonic() - started, 2))
+    if config.get('metrics_file'):
+        try:
+            ScrapeMetrics.merged([merged['metrics']]).write_prometheus(config['metrics_file'])
+        except OSError as e:
+            print(f"[JOBSPY] Could not write metrics to {config['metrics_file']}: {str(e)}")
+    print(f"[JOBSPY] Sharded run completed: {merged['saved_count']}/{merged['scraped_count']} jobs saved, "
+          f"{sum(not shard['success'] for shard in merged['shards'])} of {len(shards)} shards failed")
+    return merged
+
+
+class ShardQueue:
+    """Shards of queued runs in the jobspy_shard_queue table (migration 0013).
+
+    enqueue() plans a run and inserts one pending row per shard. claim() hands the
+    oldest claimable shard to a worker: the row is picked with FOR UPDATE SKIP LOCKED,
+    so concurrent workers never wait on or double-claim a shard. A claimed shard holds a
+    lease that its worker renews while scraping; a shard whose lease ran out (the worker
+    died) is claimable again until it has been attempted max_attempts times.
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        lease_seconds: int = DEFAULT_LEASE_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        self.pool = DatabasePool(db_url, max_connections=2)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    def _run(self, work):
+        session = self.pool.session()
+        try:
+            return session.run_batch(work)
+        finally:
+            session.close()
+
+    def enqueue(self, scraper: JobSpyIntegration, config: Dict[str, Any]) -> Dict[str, Any]:
+        run_id = config.get('run_id') or new_run_id()
+        shards = plan_shards(scraper, config, config.get('shard_by', 'region'))
+        rows = [
+            (run_id, shard['shard_id'], Json(shard))
+            for shard in shards
+        ]
+
+        def insert(cursor):
+            execute_values(cursor, f"""
+                INSERT INTO {QUEUE_TABLE} (run_id, shard_id, config)
+                VALUES %s
+                ON CONFLICT (run_id, shard_id) DO NOTHING
+            """, rows)
+
+        self._run(insert)
+        print(f"[JOBSPY] Queued run {run_id}: {len(shards)} shards")
+        return {'success': True, 'run_id': run_id, 'shards': [shard['shard_id'] for shard in shards]}
+
+    def claim(self, run_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Lease the next claimable shard (of run_id, if given) to this worker, or None when there is none"""
+        def claim_row(cursor):
+            # Shards whose last attempt's lease ran out are failed once they have no attempts left
+            cursor.execute(f"""
+                UPDATE {QUEUE_TABLE}
+                SET status = 'failed', error = 'lease expired', finished_at = NOW()
+                WHERE status = 'running' AND claimed_at < NOW() - make_interval(secs => %s) AND attempts >= %s
+            """, (self.lease_seconds, self.max_attempts))
+            cursor.execute(f"""
+                UPDATE {QUEUE_TABLE}
+                SET status = 'running', attempts = attempts + 1, worker = %s, claimed_at = NOW(), error = NULL
+                WHERE id = (
+                    SELECT id FROM {QUEUE_TABLE}
+                    WHERE (status = 'pending'
+                           OR (status = 'running' AND claimed_at < NOW() - make_interval(secs => %s)))
+                      AND attempts < %s
+                      AND (%s::varchar IS NULL OR run_id = %s)
+                    ORDER BY id
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, run_id, shard_id, config, attempts
+            """, (self.worker_id, self.lease_seconds, self.max_attempts, run_id, run_id))
+            return cursor.fetchone()
+
+        row = self._run(claim_row)
+        if row is None:
+            return None
+        queue_id, run_id, shard_id, shard, attempts = row
+        return {'id': queue_id, 'run_id': run_id, 'shard_id': shard_id, 'shard': shard, 'attempts': attempts}
+
+    def heartbeat(self, queue_id: int):
+        self._run(lambda cursor: cursor.execute(
+            f"UPDATE {QUEUE_TABLE} SET claimed_at = NOW() WHERE id = %s AND status = 'running' AND worker = %s",
+            (queue_id, self.worker_id)
+        ))
+
+    def finish(self, claimed: Dict[str, Any], result: Dict[str, Any]):
+        """Store a shard's result; a failed shard goes back to pending while it has attempts left"""
+        if result.get('success'):
+            status = 'done'
+        else:
+            status = 'pending' if claimed['attempts'] < self.max_attempts else 'failed'
+        self._run(lambda cursor: cursor.execute(f"""
+            UPDATE {QUEUE_TABLE}
+            SET status = %s, result = %s, error = %s, finished_at = NOW()
+            WHERE id = %s AND worker = %s
+        """, (status, Json(result, dumps=lambda value: json.dumps(value, default=str)), result.get('error'),
+              claimed['id'], self.worker_id)))
+
+    def report(self, run_id: str) -> Dict[str, Any]:
+        """Merged report of a queued run, complete once no shard is pending or running"""
+        def load(cursor):
+            cursor.execute(f"""
+                SELECT shard_id, config, status, result, error, attempts, worker
+                FROM {QUEUE_TABLE} WHERE run_id = %s ORDER BY id
+            """, (run_id,))
+            return cursor.fetchall()
+
+        rows = self._run(load)
+        if not rows:
+            return {'success': False, 'run_id': run_id, 'error': f"No shards queued for run {run_id}"}
+        shards = [shard for _, shard, _, _, _, _, _ in rows]
+        results = {
+            shard_id: result or {'success': False, 'error': error}
+            for shard_id, _, status, result, error, _, _ in rows if status in ('done', 'failed')
+        }
+        statuses = Counter(status for _, _, status, _, _, _, _ in rows)
+        report = merge_shard_results(shards, results)
+        report.update(
+            run_id=run_id,
+            complete=statuses['pending'] + statuses['running'] == 0,
+            queue=dict(statuses),
+        )
+        return report
+
+    def close(self):
+        self.pool.closeall()
+
+
+def run_shard_worker(run_id: Optional[str] = None, queue: Optional[ShardQueue] = None) -> Dict[str, Any]:
+    """Claim and scrape queued shards until none is left, keeping one scraper warm between them"""
+    queue = queue or ShardQueue(os.environ['DATABASE_URL'])
+    scraper = JobSpyIntegration()
+    processed = Counter()
+    try:
+        while True:
+            claimed = queue.claim(run_id)
+            if claimed is None:
+                break
+            print(f"[JOBSPY] Worker {queue.worker_id} scraping shard {claimed['shard_id']} of run {claimed['run_id']} (attempt {claimed['attempts']})")
+
+            # The lease is renewed while the shard runs, so only a dead worker's shards are reclaimed
+            stop = threading.Event()
+
+            def renew(queue_id=claimed['id']):
+                while not stop.wait(queue.lease_seconds / 4):
+                    try:
+                        queue.heartbeat(queue_id)
+                    except psycopg2.Error as e:
+                        print(f"[JOBSPY] Could not renew the lease of shard {claimed['shard_id']}: {str(e)}")
+
+            renewer = threading.Thread(target=renew, daemon=True)
+            renewer.start()
+            try:
+                # A shard retried after its worker died resumes from that attempt's checkpoint when it lands on the same host
+                result = scraper.run_scraping({
+                    **claimed['shard']['config'], 'run_id': f"{claimed['run_id']}-shard{claimed['shard_id']}"
+                })
+            except Exception as e:
+                result = {'success': False, 'error': f"{str(e)}\n{traceback.format_exc()}"}
+            finally:
+                stop.set()
+                renewer.join()
+            queue.finish(claimed, result)
+            processed['done' if result.get('success') else 'failed'] += 1
+    finally:
+        scraper.close()
+        queue.close()
+    return {
+        'success': processed['failed'] == 0,
+        'worker': queue.worker_id,
+        'shards_done': processed['done'],
+        'shards_failed': processed['failed'],
+        'timestamp': datetime.now().isoformat(),
+    }
+
+
+def main():
+    """CLI: --run/--enqueue '<config json>', --worker [run_id], --report <run_id>"""
+    try:
+        command = sys.argv[1] if len(sys.argv) > 1 else '--run'
+        argument = sys.argv[2] if len(sys.argv) > 2 else None
+
+        if command == '--run':
+            # All shards on this machine, one process each (up to config 'processes')
+            result = run_sharded(json.loads(argument) if argument else {})
+        elif command == '--enqueue':
+            queue = ShardQueue(os.environ['DATABASE_URL'])
+            scraper = JobSpyIntegration()
+            try:
+                result = queue.enqueue(scraper, json.loads(argument) if argument else {})
+            finally:
+                scraper.close()
+                queue.close()
+        elif command == '--worker':
+            # Any number of these, on any node, share the queued shards
+            result = run_shard_worker(argument)
+        elif command == '--report' and argument:
+            queue = ShardQueue(os.environ['DATABASE_URL'])
+            try:
+                result = queue.report(argument)
+            finally:
+                queue.close()
+        else:
+            raise ValueError(f"Unknown command {command!r}; use --run, --enqueue, --worker or --report <run_id>")
+
+        print(json.dumps(result, indent=2, default=str))
+        sys.exit(0 if result['success'] else 1)
+
+    except Exception as e:
+        print(json.dumps({
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }, indent=2))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
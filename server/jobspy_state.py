@@ -0,0 +1,395 @@
+"""
+Scrape state for the JobSpy scrapers
+Per-query high-water marks, yield history, recently saved job keys and run checkpoints, kept in a local SQLite file
+"""
+
+import hashlib
+import json
+import math
+import uuid
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from jobspy_cache import normalize_query_text
+
+DEFAULT_STATE_FILE = os.environ.get(
+    'JOBSPY_STATE_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.jobspy_state.sqlite3')
+)
+DEFAULT_OVERLAP_HOURS = 12
+SEEN_RETENTION_DAYS = 30
+# Weight kept by a query's yield history on each new run, so old runs fade out
+YIELD_DECAY = 0.9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_watermarks (
+    site TEXT NOT NULL,
+    search_term TEXT NOT NULL,
+    location TEXT NOT NULL,
+    last_success_at TEXT NOT NULL,
+    newest_posted TEXT,
+    PRIMARY KEY (site, search_term, location)
+);
+CREATE TABLE IF NOT EXISTS seen_jobs (
+    scope TEXT NOT NULL,
+    job_key TEXT NOT NULL,
+    seen_at TEXT NOT NULL,
+    PRIMARY KEY (scope, job_key)
+);
+CREATE INDEX IF NOT EXISTS seen_jobs_seen_at_idx ON seen_jobs (seen_at);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scrape_runs (
+    run_id TEXT PRIMARY KEY,
+    config TEXT NOT NULL,
+    plan TEXT,
+    status TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scrape_run_units (
+    run_id TEXT NOT NULL,
+    site TEXT NOT NULL,
+    search_term TEXT NOT NULL,
+    location TEXT NOT NULL,
+    saved INTEGER NOT NULL,
+    newest_posted TEXT,
+    completed_at TEXT NOT NULL,
+    PRIMARY KEY (run_id, site, search_term, location)
+);
+CREATE TABLE IF NOT EXISTS query_yields (
+    site TEXT NOT NULL,
+    search_term TEXT NOT NULL,
+    location TEXT NOT NULL,
+    runs REAL NOT NULL,
+    errors REAL NOT NULL,
+    found REAL NOT NULL,
+    new_jobs REAL NOT NULL,
+    duplicates REAL NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (site, search_term, location)
+);
+"""
+
+
+def job_key(*parts: str) -> str:
+    """Compact key for a job identified by several fields, e.g. (title, company, location)"""
+    return hashlib.blake2b('\x1f'.join(str(part) for part in parts).encode('utf-8'), digest_size=12).hexdigest()
+
+
+def new_run_id() -> str:
+    """Run id that sorts by start time, e.g. 20260101T120000-3f9a1c"""
+    return f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def newest_posted(jobs_df: Optional[pd.DataFrame]) -> Optional[datetime]:
+    """Latest date_posted in a JobSpy frame, if the site reported any"""
+    if jobs_df is None or jobs_df.empty or 'date_posted' not in jobs_df.columns:
+        return None
+    newest = pd.to_datetime(jobs_df['date_posted'], errors='coerce').max()
+    return None if pd.isna(newest) else newest.to_pydatetime()
+
+
+class ScrapeState:
+    """High-water marks and yield history per (site, search_term, location), and the job keys already saved.
+
+    A watermark holds the last successful scrape time and the newest date_posted seen.
+    delta_hours() turns it into the hours_old window for the next request, with an overlap
+    because job boards only report posting dates to the day. Job keys are remembered once
+    they have been written, so later runs can drop postings they already have before
+    enriching them. Yield history feeds the adaptive query planner. Checkpoints let long
+    maintenance jobs resume where they stopped; a scrape run keeps its config, its query
+    plan and the (site, search_term, location) units already saved under its run id, so an
+    interrupted run can be resumed. Safe to share between threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_STATE_FILE):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _query(site: str, search_term: str, location: str):
+        return normalize_query_text(site), normalize_query_text(search_term), normalize_query_text(location)
+
+    def watermark(self, site: str, search_term: str, location: str) -> Optional[Dict[str, Optional[datetime]]]:
+        """{'last_success_at', 'newest_posted'} for a query, or None if it never succeeded"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT last_success_at, newest_posted FROM query_watermarks '
+                'WHERE site = ? AND search_term = ? AND location = ?',
+                self._query(site, search_term, location)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'last_success_at': datetime.fromisoformat(row[0]),
+            'newest_posted': datetime.fromisoformat(row[1]) if row[1] else None,
+        }
+
+    def watermarks(self, queries: Iterable[Tuple[str, str, str]]) -> Dict[Tuple[str, str, str], Dict[str, Optional[datetime]]]:
+        """watermark() for many queries in one read, keyed as given; queries that never succeeded are left out"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT site, search_term, location, last_success_at, newest_posted FROM query_watermarks'
+            ).fetchall()
+        marks = {
+            (site, term, location): {
+                'last_success_at': datetime.fromisoformat(last_success_at),
+                'newest_posted': datetime.fromisoformat(posted) if posted else None,
+            }
+            for site, term, location, last_success_at, posted in rows
+        }
+        found = {}
+        for query in queries:
+            mark = marks.get(self._query(*query))
+            if mark is not None:
+                found[query] = mark
+        return found
+
+    def delta_hours(
+        self,
+        site: str,
+        search_term: str,
+        location: str,
+        default_hours: int,
+        overlap_hours: float = DEFAULT_OVERLAP_HOURS,
+        now: Optional[datetime] = None,
+    ) -> int:
+        """hours_old covering everything since the last success plus the overlap, capped at default_hours"""
+        mark = self.watermark(site, search_term, location)
+        if mark is None:
+            return default_hours
+        elapsed = ((now or datetime.now()) - mark['last_success_at']).total_seconds() / 3600
+        return max(1, min(default_hours, math.ceil(elapsed + overlap_hours)))
+
+    def record_success(
+        self,
+        site: str,
+        search_term: str,
+        location: str,
+        newest_posted: Optional[datetime] = None,
+        succeeded_at: Optional[datetime] = None,
+    ):
+        """Advance a query's watermark; newest_posted never moves backwards"""
+        posted = newest_posted.isoformat() if newest_posted else None
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO query_watermarks (site, search_term, location, last_success_at, newest_posted)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (site, search_term, location) DO UPDATE SET
+                    last_success_at = excluded.last_success_at,
+                    newest_posted = CASE
+                        WHEN query_watermarks.newest_posted IS NULL THEN excluded.newest_posted
+                        WHEN excluded.newest_posted IS NULL THEN query_watermarks.newest_posted
+                        ELSE max(query_watermarks.newest_posted, excluded.newest_posted)
+                    END
+                """,
+                (*self._query(site, search_term, location), (succeeded_at or datetime.now()).isoformat(), posted)
+            )
+
+    def known_keys(self, scope: str, keys: Iterable[str]) -> Set[str]:
+        """The subset of keys already remembered for a scope"""
+        keys = list(dict.fromkeys(keys))
+        known = set()
+        with self._lock:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ', '.join('?' * len(chunk))
+                known.update(
+                    key for (key,) in self._conn.execute(
+                        f'SELECT job_key FROM seen_jobs WHERE scope = ? AND job_key IN ({placeholders})',
+                        (scope, *chunk)
+                    )
+                )
+        return known
+
+    def remember_keys(self, scope: str, keys: Iterable[str], seen_at: Optional[datetime] = None):
+        """Remember job keys that are now stored in the database"""
+        stamp = (seen_at or datetime.now()).isoformat()
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(
+                    'INSERT INTO seen_jobs (scope, job_key, seen_at) VALUES (?, ?, ?) '
+                    'ON CONFLICT (scope, job_key) DO UPDATE SET seen_at = excluded.seen_at',
+                    ((scope, key, stamp) for key in keys)
+                )
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def record_yield(
+        self,
+        site: str,
+        search_term: str,
+        location: str,
+        found: int,
+        new_jobs: int,
+        duplicates: int,
+        error: bool = False,
+        decay: float = YIELD_DECAY,
+    ):
+        """Fold one run of a query into its decayed totals of runs, errors, found, new and duplicate jobs"""
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO query_yields (site, search_term, location, runs, errors, found, new_jobs, duplicates, updated_at)
+                VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?)
+                ON CONFLICT (site, search_term, location) DO UPDATE SET
+                    runs = query_yields.runs * ? + 1,
+                    errors = query_yields.errors * ? + excluded.errors,
+                    found = query_yields.found * ? + excluded.found,
+                    new_jobs = query_yields.new_jobs * ? + excluded.new_jobs,
+                    duplicates = query_yields.duplicates * ? + excluded.duplicates,
+                    updated_at = excluded.updated_at
+                """,
+                (
+                    *self._query(site, search_term, location),
+                    1 if error else 0, found, new_jobs, duplicates, datetime.now().isoformat(),
+                    *([decay] * 5),
+                )
+            )
+
+    def yield_stats(self, queries: Iterable[Tuple[str, str, str]]) -> Dict[Tuple[str, str, str], Dict[str, float]]:
+        """Decayed yield totals for the queries that have any, keyed as given"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT site, search_term, location, runs, errors, found, new_jobs, duplicates FROM query_yields'
+            ).fetchall()
+        history = {
+            (site, term, location): {
+                'runs': runs, 'errors': errors, 'found': found, 'new_jobs': new_jobs, 'duplicates': duplicates,
+            }
+            for site, term, location, runs, errors, found, new_jobs, duplicates in rows
+        }
+        stats = {}
+        for query in queries:
+            entry = history.get(self._query(*query))
+            if entry is not None:
+                stats[query] = entry
+        return stats
+
+    def checkpoint(self, name: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM checkpoints WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+    def save_checkpoint(self, name: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO checkpoints (name, value, updated_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (name) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at',
+                (name, value, datetime.now().isoformat())
+            )
+
+    def clear_checkpoint(self, name: str):
+        with self._lock:
+            self._conn.execute('DELETE FROM checkpoints WHERE name = ?', (name,))
+
+    def start_run(self, run_id: str, config: Dict[str, Any]):
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO scrape_runs (run_id, config, status, started_at, updated_at) VALUES (?, ?, 'running', ?, ?) "
+                "ON CONFLICT (run_id) DO UPDATE SET status = 'running', updated_at = excluded.updated_at",
+                (run_id, json.dumps(config, default=str), now, now)
+            )
+
+    def run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """A run's config, plan and status, or None for an unknown run id"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT config, plan, status, started_at, updated_at FROM scrape_runs WHERE run_id = ?', (run_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        config, plan, status, started_at, updated_at = row
+        return {
+            'run_id': run_id,
+            'config': json.loads(config),
+            # JSON turns the unit tuples into lists
+            'plan': [(tuple(unit), results) for unit, results in json.loads(plan)] if plan else None,
+            'status': status,
+            'started_at': started_at,
+            'updated_at': updated_at
+        }
+
+    def save_run_plan(self, run_id: str, plan: List[Tuple[Tuple[str, str, str], int]]):
+        """The (unit, results_wanted) list a run dispatches, kept so a resumed run repeats it"""
+        with self._lock:
+            self._conn.execute(
+                'UPDATE scrape_runs SET plan = ?, updated_at = ? WHERE run_id = ?',
+                (json.dumps(plan), datetime.now().isoformat(), run_id)
+            )
+
+    def complete_unit(
+        self, run_id: str, unit: Tuple[str, str, str], saved: int, newest_posted: Optional[datetime] = None
+    ):
+        """Mark a unit of a run as done once every row it produced is stored"""
+        posted = newest_posted.isoformat() if newest_posted else None
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO scrape_run_units '
+                '(run_id, site, search_term, location, saved, newest_posted, completed_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (run_id, *unit, saved, posted, datetime.now().isoformat())
+            )
+
+    def completed_units(self, run_id: str) -> Dict[Tuple[str, str, str], Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT site, search_term, location, saved, newest_posted, completed_at FROM scrape_run_units WHERE run_id = ?',
+                (run_id,)
+            ).fetchall()
+        return {
+            (site, search_term, location): {
+                'saved': saved,
+                'newest_posted': datetime.fromisoformat(posted) if posted else None,
+                'completed_at': datetime.fromisoformat(completed_at)
+            }
+            for site, search_term, location, saved, posted, completed_at in rows
+        }
+
+    def finish_run(self, run_id: str, status: str):
+        with self._lock:
+            self._conn.execute(
+                'UPDATE scrape_runs SET status = ?, updated_at = ? WHERE run_id = ?',
+                (status, datetime.now().isoformat(), run_id)
+            )
+
+    def prune(self, retention_days: int = SEEN_RETENTION_DAYS) -> int:
+        """Forget job keys not seen for retention_days (scraped_jobs rows expire after 30 days), and runs as old"""
+        cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+        with self._lock:
+            self._conn.execute(
+                'DELETE FROM scrape_run_units WHERE run_id IN (SELECT run_id FROM scrape_runs WHERE updated_at < ?)',
+                (cutoff,)
+            )
+            self._conn.execute('DELETE FROM scrape_runs WHERE updated_at < ?', (cutoff,))
+            return self._conn.execute('DELETE FROM seen_jobs WHERE seen_at < ?', (cutoff,)).rowcount
+
+    def reset(self):
+        """Drop every watermark, remembered key and yield history, so the next run starts from scratch"""
+        with self._lock:
+            self._conn.execute('DELETE FROM query_watermarks')
+            self._conn.execute('DELETE FROM seen_jobs')
+            self._conn.execute('DELETE FROM query_yields')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,423 @@
+"""
+Rate limiting helpers for the JobSpy scrapers
+Per-site token buckets, circuit breakers with adaptive pacing, and a concurrent executor
+that keeps every healthy site busy within its own budget
+"""
+
+import math
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Sustained requests per second and burst size allowed per job site
+DEFAULT_SITE_BUDGETS = {
+    'indeed': {'rate': 0.5, 'burst': 2},
+    'linkedin': {'rate': 0.2, 'burst': 1},
+    'naukri': {'rate': 0.33, 'burst': 1},
+    'zip_recruiter': {'rate': 0.33, 'burst': 1},
+}
+DEFAULT_BUDGET = {'rate': 0.25, 'burst': 1}
+
+# Circuit breaker defaults: consecutive 403/429 responses before a site is cut off, and how long it rests
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_COOLDOWN_SECONDS = 60
+DEFAULT_MAX_COOLDOWN_SECONDS = 600
+# Weight of the newest observation in the latency and error-rate moving averages
+HEALTH_SMOOTHING = 0.3
+MAX_DELAY_FACTOR = 8.0
+# Latencies below this are treated as equal, so jitter on fast responses does not read as a slowdown
+LATENCY_FLOOR_SECONDS = 0.5
+
+# A bare 403/429 can be a job id or a count; only trust it next to status-code wording
+# ("status code 429", "HTTP 403", "HTTP Error 429", "403 Client Error", "429 Too Many Requests")
+_STATUS_RE = re.compile(
+    r'(?:\bstatus(?:[ _]?code)?|\bhttp(?:/[\d.]+)?(?: error)?)\s*[:=]?\s*(403|429)\b'
+    r'|\b(403|429)\s+(?:client error|forbidden|too many requests)\b'
+)
+
+
+def classify_error(error: Exception) -> str:
+    """'rate_limited' (429), 'blocked' (403), 'transient' (timeouts, connection errors) or 'other'"""
+    response = getattr(error, 'response', None)
+    status = getattr(error, 'status_code', None) or getattr(response, 'status_code', None)
+    message = str(error).lower()
+    if status is None:
+        # JobSpy mostly reports HTTP failures as plain exceptions, so the message is all there is
+        match = _STATUS_RE.search(message)
+        status = int(match.group(1) or match.group(2)) if match else None
+    if status == 429 or 'rate limit' in message or 'too many requests' in message:
+        return 'rate_limited'
+    if status == 403 or 'blocked' in message or 'forbidden' in message:
+        return 'blocked'
+    if isinstance(error, (TimeoutError, ConnectionError)) or 'timeout' in message or 'timed out' in message or 'connection' in message:
+        return 'transient'
+    return 'other'
+
+
+class CircuitOpenError(Exception):
+    """A unit was not requested because its site's circuit breaker is open"""
+
+    def __init__(self, site: str):
+        super().__init__(f"{site} is unavailable (circuit open)")
+        self.site = site
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate` tokens per second"""
+
+    def __init__(self, rate: float, burst: float = 1):
+        self.rate = max(float(rate), 1e-6)
+        self.capacity = max(float(burst), 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self) -> bool:
+        """Take a token if one is available without blocking"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def time_until_available(self) -> float:
+        """Seconds until the next token can be taken"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(float(rate), 1e-6)
+
+    def acquire(self) -> float:
+        """Block until a token is available, returns the seconds spent waiting"""
+        waited = 0.0
+        while not self.try_acquire():
+            delay = self.time_until_available()
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+
+class SiteRateLimiter:
+    """One token bucket per job site, created lazily from the configured budgets"""
+
+    def __init__(self, overrides: Optional[Dict[str, Dict[str, float]]] = None):
+        self.budgets = {site: dict(budget) for site, budget in DEFAULT_SITE_BUDGETS.items()}
+        for site, budget in (overrides or {}).items():
+            self.budgets[site] = {**self.budgets.get(site, DEFAULT_BUDGET), **budget}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, site: str) -> TokenBucket:
+        with self._lock:
+            if site not in self._buckets:
+                budget = self.budgets.get(site, DEFAULT_BUDGET)
+                self._buckets[site] = TokenBucket(budget['rate'], budget['burst'])
+            return self._buckets[site]
+
+    def slow_down(self, site: str, factor: float):
+        """Run a site's bucket at its configured rate divided by factor (1 restores it)"""
+        self.bucket(site).set_rate(self.budgets.get(site, DEFAULT_BUDGET)['rate'] / max(factor, 1.0))
+
+
+class SiteHealth:
+    """Circuit breaker and pacing state of one job site.
+
+    closed: requests flow. After failure_threshold consecutive 403/429 errors the
+    breaker opens and no requests are made for the cooldown. Then it is half-open and
+    lets a single probe through: success closes it, failure reopens it with the
+    cooldown doubled (up to max_cooldown). delay_factor() grows with the error rate
+    and with latency above the best seen, and is used to stretch the site's pacing.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown: float, max_cooldown: float):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.base_cooldown = float(cooldown)
+        self.max_cooldown = float(max_cooldown)
+        self.cooldown = self.base_cooldown
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.consecutive_failures = 0
+        self.trips = 0
+        self.requests = 0
+        self.errors = 0
+        self.error_rate = 0.0
+        self.latency: Optional[float] = None
+        self.best_latency: Optional[float] = None
+
+    def retry_after(self, now: float) -> float:
+        """Seconds until a request may be sent: 0 when closed or ready to probe, inf while a probe is out"""
+        if self.state == 'closed':
+            return 0.0
+        if self.probe_in_flight:
+            return math.inf
+        return max(0.0, self.opened_at + self.cooldown - now)
+
+    def on_dispatch(self, now: float):
+        self.requests += 1
+        if self.state != 'closed' and self.retry_after(now) == 0:
+            self.state = 'half_open'
+            self.probe_in_flight = True
+
+    def record(self, kind: Optional[str], elapsed: float, now: float):
+        failed = kind is not None
+        self.errors += failed
+        self.error_rate += HEALTH_SMOOTHING * (float(failed) - self.error_rate)
+        if not failed and elapsed > 0:
+            self.latency = elapsed if self.latency is None else self.latency + HEALTH_SMOOTHING * (elapsed - self.latency)
+            self.best_latency = self.latency if self.best_latency is None else min(self.best_latency, self.latency)
+
+        was_probe = self.probe_in_flight
+        self.probe_in_flight = False
+        if kind in ('rate_limited', 'blocked'):
+            self.consecutive_failures += 1
+            if was_probe:
+                self._open(now, min(self.max_cooldown, self.cooldown * 2))
+            elif self.state == 'closed' and self.consecutive_failures >= self.failure_threshold:
+                self._open(now, self.base_cooldown)
+        elif not failed:
+            self.consecutive_failures = 0
+            if self.state != 'closed':
+                self.state = 'closed'
+                self.cooldown = self.base_cooldown
+        elif was_probe:
+            # Any other failure of a probe tells us nothing about the block, so try again after the cooldown
+            self._open(now, self.cooldown)
+
+    def _open(self, now: float, cooldown: float):
+        self.state = 'open'
+        self.opened_at = now
+        self.cooldown = cooldown
+        self.trips += 1
+
+    def delay_factor(self) -> float:
+        slowdown = 1.0
+        if self.latency and self.best_latency:
+            slowdown = min(4.0, max(1.0, self.latency / max(self.best_latency, LATENCY_FLOOR_SECONDS)))
+        return min(MAX_DELAY_FACTOR, slowdown * (1.0 + 4.0 * self.error_rate))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'trips': self.trips,
+            'requests': self.requests,
+            'errors': self.errors,
+            'error_rate': round(self.error_rate, 3),
+            'latency_seconds': round(self.latency, 2) if self.latency is not None else None,
+            'delay_factor': round(self.delay_factor(), 2),
+        }
+
+
+class SiteHealthMonitor:
+    """Per-site SiteHealth shared by everything that scrapes during one run; thread-safe"""
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        cooldown_seconds: float = DEFAULT_COOLDOWN_SECONDS,
+        max_cooldown_seconds: float = DEFAULT_MAX_COOLDOWN_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+        self.clock = clock
+        self._sites: Dict[str, SiteHealth] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional['SiteHealthMonitor']:
+        """Monitor configured by a run's 'circuit_breaker' option, or None when it is false"""
+        options = config.get('circuit_breaker', {})
+        if options is False:
+            return None
+        options = options or {}
+        return cls(
+            failure_threshold=options.get('failure_threshold', DEFAULT_FAILURE_THRESHOLD),
+            cooldown_seconds=options.get('cooldown_seconds', DEFAULT_COOLDOWN_SECONDS),
+            max_cooldown_seconds=options.get('max_cooldown_seconds', DEFAULT_MAX_COOLDOWN_SECONDS),
+        )
+
+    def _site(self, site: str) -> SiteHealth:
+        if site not in self._sites:
+            self._sites[site] = SiteHealth(self.failure_threshold, self.cooldown_seconds, self.max_cooldown_seconds)
+        return self._sites[site]
+
+    def retry_after(self, site: str) -> float:
+        with self._lock:
+            return self._site(site).retry_after(self.clock())
+
+    def can_dispatch(self, site: str) -> bool:
+        return self.retry_after(site) == 0
+
+    def is_open(self, site: str) -> bool:
+        with self._lock:
+            return self._site(site).state != 'closed'
+
+    def on_dispatch(self, site: str):
+        with self._lock:
+            self._site(site).on_dispatch(self.clock())
+
+    def record(self, site: str, error: Optional[Exception], elapsed: float = 0.0) -> Optional[str]:
+        """Record a request's outcome; returns the error kind, or None on success"""
+        kind = None if error is None else classify_error(error)
+        with self._lock:
+            health = self._site(site)
+            was_open = health.state == 'open'
+            health.record(kind, elapsed, self.clock())
+            if health.state == 'open' and not was_open:
+                print(f"[JOBSPY] Circuit opened for {site} after {kind} errors, resting {health.cooldown:.0f}s")
+        return kind
+
+    def delay_factor(self, sites: Iterable[str]) -> float:
+        with self._lock:
+            return max([self._site(site).delay_factor() for site in sites] or [1.0])
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {site: health.stats() for site, health in self._sites.items()}
+
+
+def _call_unit(fetch: Callable[..., Any], unit: Tuple[str, str, str]) -> Tuple[Any, Optional[Exception], float]:
+    started = time.monotonic()
+    try:
+        return fetch(*unit), None, time.monotonic() - started
+    except Exception as e:
+        return None, e, time.monotonic() - started
+
+
+class SiteScrapeExecutor:
+    """Runs (site, search_term, location) units on a thread pool.
+
+    A unit is only dispatched once its site's bucket grants a token, so while one
+    site is waiting for budget the free workers are handed units for the others.
+
+    With a SiteHealthMonitor, every outcome feeds the site's circuit breaker and its
+    bucket is slowed by the site's delay factor. While a site's breaker is open, all
+    but one of its queued units are handed to reroute(unit), which may return a
+    replacement unit for a healthy site; the one left over is the half-open probe.
+    Units that cannot be rerouted, or whose site is still open once nothing else is
+    left to run, are yielded with a CircuitOpenError instead of being requested.
+    """
+
+    def __init__(
+        self,
+        limiter: SiteRateLimiter,
+        max_workers: int = 6,
+        health: Optional[SiteHealthMonitor] = None,
+        reroute: Optional[Callable[[Tuple[str, str, str]], Optional[Tuple[str, str, str]]]] = None,
+    ):
+        self.limiter = limiter
+        self.max_workers = max(1, int(max_workers))
+        self.health = health
+        self.reroute = reroute
+        self.stats: Dict[str, Any] = {}
+
+    def _ready(self, site: str) -> bool:
+        return (self.health is None or self.health.can_dispatch(site)) and self.limiter.bucket(site).try_acquire()
+
+    def _wait_time(self, site: str) -> float:
+        breaker_wait = self.health.retry_after(site) if self.health is not None else 0.0
+        return max(breaker_wait, self.limiter.bucket(site).time_until_available())
+
+    def run(
+        self,
+        units: List[Tuple[str, str, str]],
+        fetch: Callable[[str, str, str], Any]
+    ) -> Iterator[Tuple[Tuple[str, str, str], Any, Optional[Exception], float]]:
+        """Yield (unit, result, error, elapsed_seconds) as units complete, in completion order"""
+        pending: 'OrderedDict[str, deque]' = OrderedDict()
+        for unit in units:
+            pending.setdefault(unit[0], deque()).append(unit)
+
+        started = time.monotonic()
+        busy_seconds = 0.0
+        peak = 0
+        rerouted = 0
+        skipped = 0
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or in_flight:
+                # Queued work of a site that is cut off goes to healthy sites, keeping one unit to probe with
+                if self.health is not None:
+                    for site in [site for site in pending if self.health.is_open(site)]:
+                        while len(pending.get(site, ())) > 1:
+                            unit = pending[site].pop()
+                            replacement = self.reroute(unit) if self.reroute is not None else None
+                            if replacement is None:
+                                skipped += 1
+                                yield unit, None, CircuitOpenError(site), 0.0
+                                continue
+                            rerouted += 1
+                            pending.setdefault(replacement[0], deque()).append(replacement)
+
+                # Round-robin over sites, one unit per site per pass, while budget and workers allow
+                dispatched = True
+                while dispatched and pending and len(in_flight) < self.max_workers:
+                    dispatched = False
+                    for site in list(pending):
+                        if len(in_flight) >= self.max_workers:
+                            break
+                        if not self._ready(site):
+                            continue
+                        unit = pending[site].popleft()
+                        if not pending[site]:
+                            del pending[site]
+                        if self.health is not None:
+                            self.health.on_dispatch(site)
+                        in_flight[pool.submit(_call_unit, fetch, unit)] = unit
+                        dispatched = True
+                    peak = max(peak, len(in_flight))
+
+                if pending and len(in_flight) < self.max_workers:
+                    timeout = min(self._wait_time(site) for site in pending)
+                else:
+                    timeout = None
+
+                if not in_flight:
+                    if timeout is not None and timeout > 0 and self.health is not None and all(self.health.is_open(site) for site in pending):
+                        # Only sites that are cut off are left: skip them rather than sit out their cooldown
+                        for site in list(pending):
+                            for unit in pending.pop(site):
+                                skipped += 1
+                                yield unit, None, CircuitOpenError(site), 0.0
+                        continue
+                    time.sleep(timeout or 0)
+                    continue
+
+                done, _ = wait(list(in_flight), timeout=None if timeout == math.inf else timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    unit = in_flight.pop(future)
+                    result, error, elapsed = future.result()
+                    busy_seconds += elapsed
+                    if self.health is not None:
+                        self.health.record(unit[0], error, elapsed)
+                        self.limiter.slow_down(unit[0], self.health.delay_factor([unit[0]]))
+                    yield unit, result, error, elapsed
+
+        wall_clock = time.monotonic() - started
+        self.stats = {
+            'units': len(units),
+            'max_workers': self.max_workers,
+            'wall_clock_seconds': round(wall_clock, 2),
+            'busy_seconds': round(busy_seconds, 2),
+            'peak_concurrency': peak,
+            'average_concurrency': round(busy_seconds / wall_clock, 2) if wall_clock > 0 else 0.0,
+            'rerouted_units': rerouted,
+            'skipped_units': skipped,
+        }
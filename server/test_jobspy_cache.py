@@ -0,0 +1,34 @@
+"""
+Tests for the JobSpy query cache options
+Run with `python -m pytest server/test_jobspy_cache.py` or directly as a script.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from jobspy_cache import ScrapeCache
+
+
+def test_cache_false_disables_cache():
+    assert ScrapeCache.from_config({'cache': False}) is None
+
+
+def test_cache_enabled_false_disables_cache():
+    assert ScrapeCache.from_config({'cache': {'enabled': False}}) is None
+
+
+def test_cache_is_on_by_default():
+    with tempfile.TemporaryDirectory() as directory:
+        assert isinstance(ScrapeCache.from_config({}), ScrapeCache)
+        cache = ScrapeCache.from_config({'cache': {'dir': directory, 'ttl_seconds': 60}, 'bypass_cache': True})
+        assert cache.directory == directory and cache.ttl_seconds == 60 and cache.bypass
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"{name}: ok")
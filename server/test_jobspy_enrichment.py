@@ -0,0 +1,147 @@
+"""
+Parity tests for the JobSpy enrichment paths
+The column-wise helpers and enrich_jobs_frame must reproduce the per-job extract_skills, classify_job and
+build_job_data results exactly.
+Run with `python -m pytest server/test_jobspy_enrichment.py` or directly as a script.
+"""
+
+import os
+import random
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# JobSpyIntegration insists on a database URL; these tests never connect
+os.environ.setdefault('DATABASE_URL', 'postgresql://localhost/jobspy_parity_test')
+
+from jobspy_enrichment import (
+    MAX_SALARY_AMOUNT, clean_salary_frame, extract_skills_frame, get_rule_classifier, salary_amount, text_column
+)
+from jobspy_scraper import JobSpyIntegration
+
+WORDS = [
+    'senior', 'Sr.', 'junior', 'lead', 'intern', 'mid-level', 'engineer', 'developer', 'Data Scientist',
+    'data engineer', 'data analyst', 'machine learning', 'UX', 'UI designer', 'product manager', 'PM',
+    'marketing', 'growth', 'sales', 'account manager', 'business development', 'frontend', 'backend',
+    'full stack', 'devops', 'mobile', 'iOS', 'Android', 'React', 'Vue', 'Angular', 'Python', 'JavaScript',
+    'Java', 'Go', 'good', 'maintain', 'AWS', 'SQL', 'NoSQL', 'Excel', 'SEO', 'QuickBooks', 'design',
+    'user experience', 'content', 'social media', 'product design', 'Flutter', 'react native', 'staff',
+    'architect', 'trainee', 'fresher', 'accountant', 'nurse', 'driver', 'C++', 'C#', 'Node.js'
+]
+LOCATIONS = [
+    'New York, NY', 'San Francisco, CA', 'London, UK', 'Bangalore, India', 'Remote', 'remote - US',
+    'Toronto, ON, Canada', 'Berlin, Germany', None, np.nan, 'None', '', '  Paris, France  ',
+    'Seattle Metropolitan Area', 'Chennai', 'Sydney, AU', 'Indianapolis, IN', 'Calgary, Alberta',
+    'Milan, Italy', 'Amsterdam Area, Netherlands'
+]
+SALARIES = [
+    None, np.nan, 0, 50000.0, 120000.5, -5, 0.5, 1e6, float('inf'), float('-inf'), 1e30,
+    MAX_SALARY_AMOUNT, MAX_SALARY_AMOUNT + 1, 'abc', '1e5', ' 75000 ', 'nan', '-3'
+]
+
+
+def synthetic_jobs(rows: int, seed: int = 7, salaries=SALARIES) -> pd.DataFrame:
+    """Seeded frame shaped like JobSpy output, heavy on the edge cases"""
+    rng = random.Random(seed)
+    jobs = []
+    for i in range(rows):
+        jobs.append({
+            'title': ' '.join(rng.sample(WORDS, rng.randint(1, 3))) if rng.random() > .02 else None,
+            'company': rng.choice(['Acme', 'Globex', None]),
+            'description': ' '.join(rng.choices(WORDS, k=rng.randint(0, 30))) if rng.random() > .05 else np.nan,
+            'location': rng.choice(LOCATIONS),
+            'job_url': rng.choice([f'https://www.indeed.com/viewjob?jk={i}&from=serp', None, '']),
+            'site': rng.choice(['indeed', 'linkedin', 'naukri']),
+            'min_amount': rng.choice(salaries),
+            'max_amount': rng.choice(salaries)
+        })
+    return pd.DataFrame(jobs)
+
+
+def assert_parity(jobs_df: pd.DataFrame):
+    report = JobSpyIntegration().check_enrichment_parity(jobs_df)
+    assert report['success'], report['mismatches'][:5]
+    assert report['rows'] == len(jobs_df)
+
+
+def test_skills_match_per_job_extraction():
+    jobs_df = synthetic_jobs(2000, seed=3)
+    scraper = JobSpyIntegration()
+    title = text_column(jobs_df, 'title', 'Unknown Position')
+    description = text_column(jobs_df, 'description', 'No description available')
+    expected = [scraper.extract_skills(t, d) for t, d in zip(title, description)]
+    assert extract_skills_frame(title + ' ' + description) == expected
+
+
+def test_classification_matches_per_job_classify():
+    jobs_df = synthetic_jobs(2000, seed=5)
+    scraper = JobSpyIntegration()
+    title = text_column(jobs_df, 'title', 'Unknown Position')
+    description = text_column(jobs_df, 'description', 'No description available')
+    skills = [scraper.extract_skills(t, d) for t, d in zip(title, description)]
+    classified = get_rule_classifier().classify_frame(title, description, skills)
+    assert list(classified.index) == list(jobs_df.index)
+    for position, (t, d, s) in enumerate(zip(title, description, skills)):
+        assert classified.iloc[position].to_dict() == scraper.classify_job(t, d, s), (t, d)
+
+
+def test_classification_over_rule_vocabulary():
+    # Text drawn from the rule table itself, plurals included, so every rule tier gets exercised
+    classifier = get_rule_classifier()
+    keywords = sorted(classifier._keyword_columns)
+    vocabulary = keywords + [k + 's' for k in keywords[::3]] + [k + 'es' for k in keywords[1::5]] + WORDS
+    skills_vocabulary = sorted(classifier._skill_columns) + ['Python', 'Excel']
+    rng = random.Random(13)
+    title = pd.Series([' '.join(rng.sample(vocabulary, rng.randint(0, 4))) for _ in range(3000)])
+    description = pd.Series([' '.join(rng.choices(vocabulary, k=rng.randint(0, 25))) for _ in range(3000)])
+    skills = [rng.sample(skills_vocabulary, rng.randint(0, 4)) for _ in range(3000)]
+    classified = classifier.classify_frame(title, description, skills)
+    expected = pd.DataFrame([classifier.classify(t, d, s) for t, d, s in zip(title, description, skills)])
+    pd.testing.assert_frame_equal(classified, expected[classified.columns])
+
+
+def test_empty_frame():
+    empty = pd.Series([], dtype=object)
+    assert extract_skills_frame(empty) == []
+    assert get_rule_classifier().classify_frame(empty, empty, []).empty
+
+
+def test_mixed_frame_parity():
+    assert_parity(synthetic_jobs(2000))
+
+
+def test_numeric_salary_frame_parity():
+    # A float column takes the vectorised salary branch rather than the per-value one
+    numeric = [value for value in SALARIES if not isinstance(value, str) and value is not None]
+    jobs_df = synthetic_jobs(500, seed=11, salaries=numeric)
+    assert jobs_df['min_amount'].dtype == float
+    assert_parity(jobs_df)
+
+
+def test_salary_amount_edges():
+    assert salary_amount('1e5') == 100000
+    assert salary_amount(120000.9) == 120000
+    assert salary_amount(-5) is None
+    assert salary_amount('nan') is None
+    for bad in (1e30, float('inf'), MAX_SALARY_AMOUNT + 1, 'abc'):
+        try:
+            salary_amount(bad)
+        except (ValueError, OverflowError):
+            continue
+        raise AssertionError(f"{bad!r} should void the salary")
+
+
+def test_out_of_range_salary_does_not_wrap():
+    salary_range, salary_min, salary_max, _ = clean_salary_frame(
+        pd.Series([1e30, 50000.0]), pd.Series([np.nan, 1e30]), pd.Series(['US', 'US'])
+    )
+    assert salary_min == [None, None] and salary_max == [None, None] and salary_range == [None, None]
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"{name}: ok")
@@ -677,7 +677,11 @@ export const jobPostings = pgTable("job_postings", {
   viewsCount: integer("views_count").default(0),
   createdAt: timestamp("created_at").defaultNow(),
   updatedAt: timestamp("updated_at").defaultNow(),
-});
+}, (table) => [
+  // Duplicate checks of the JobSpy scraper: the posting key and the window its key index is loaded from
+  index("idx_job_postings_dedup_key").on(table.title, table.companyName, table.location),
+  index("idx_job_postings_created_at").on(table.createdAt),
+]);
 
 // Enhanced job postings with targeting features
 export const jobTargeting = pgTable("job_targeting", {
@@ -775,6 +779,38 @@ export const scrapedJobs = pgTable("scraped_jobs", {
   unique("scraped_jobs_source_external_unique").on(table.sourcePlatform, table.externalId),
 ]);
 
+// Shards of sharded JobSpy runs, claimed by scraper workers on any node (server/jobspy_shard.py)
+export const jobspyShardQueue = pgTable("jobspy_shard_queue", {
+  id: serial("id").primaryKey(),
+  runId: varchar("run_id").notNull(),
+  shardId: varchar("shard_id").notNull(), // ISO country code, or country:site when sharded by site
+  config: jsonb("config").notNull(),
+  status: varchar("status").notNull().default("pending"), // pending, running, done, failed
+  attempts: integer("attempts").notNull().default(0),
+  worker: varchar("worker"), // hostname:pid of the claiming worker
+  result: jsonb("result"),
+  error: text("error"),
+  createdAt: timestamp("created_at").defaultNow(),
+  claimedAt: timestamp("claimed_at"), // Lease start, renewed while the worker runs the shard
+  finishedAt: timestamp("finished_at"),
+}, (table) => [
+  index("idx_jobspy_shard_queue_claim").on(table.status, table.id),
+  unique("jobspy_shard_queue_run_shard_unique").on(table.runId, table.shardId),
+]);
+
+// New scraped jobs waiting for the description their search result lacked (server/jobspy_hydration.py)
+export const jobspyHydrationQueue = pgTable("jobspy_hydration_queue", {
+  jobId: integer("job_id").primaryKey().references(() => scrapedJobs.id, { onDelete: "cascade" }),
+  sourcePlatform: varchar("source_platform").notNull(),
+  status: varchar("status").notNull().default("pending"), // pending, running, failed
+  attempts: integer("attempts").notNull().default(0),
+  error: text("error"),
+  enqueuedAt: timestamp("enqueued_at").defaultNow(),
+  claimedAt: timestamp("claimed_at"),
+}, (table) => [
+  index("idx_jobspy_hydration_queue_claim").on(table.status, table.enqueuedAt),
+]);
+
 // Job playlists (Spotify-like collections)
 export const jobPlaylists = pgTable("job_playlists", {
   id: serial("id").primaryKey(),